@@ -0,0 +1,7 @@
+"""
+Benchmarks: `python -m bot.bench.<name> --help`
+
+Each module measures one hot path against the code it replaced or at the
+scale it was built for, offline. `snapshot` runs players on fake Lavalink
+nodes from `bot.harness`, the others are pure CPU or disk.
+"""
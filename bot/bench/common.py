@@ -0,0 +1,56 @@
+import gc
+import asyncio
+import tracemalloc
+from time import perf_counter
+from typing import Callable, List, Optional, Tuple
+
+def best_of(func: Callable[[], object], number: int, repeat: int = 5) -> float:
+    """Best mean µs per call of `func` over `repeat` runs of `number` calls"""
+
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        for _ in range(number):
+            func()
+        times.append((perf_counter() - start) / number * 1e6)
+    return min(times)
+
+def allocated(func: Callable[[], object]) -> Tuple[int, int]:
+    """Bytes still held by the result of `func` and peak bytes allocated during the call"""
+
+    gc.collect()
+    tracemalloc.start()
+    result = func()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current, peak
+
+class LoopLag:
+    """Measures how late a 1 ms timer fires, i.e. how long the event loop is blocked"""
+
+    def __init__(self, tick: float = 0.001) -> None:
+        self.tick = tick
+        self.lags: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def __aenter__(self) -> 'LoopLag':
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        await asyncio.sleep(0)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self._task.cancel()
+
+    @property
+    def max_ms(self) -> float:
+        return max(self.lags, default=0.0) * 1000
+
+    def over(self, ms: float) -> int:
+        return sum(lag * 1000 > ms for lag in self.lags)
+
+    async def _run(self) -> None:
+        while True:
+            start = perf_counter()
+            await asyncio.sleep(self.tick)
+            self.lags.append(perf_counter() - start - self.tick)
@@ -0,0 +1,101 @@
+"""
+Autocomplete decoding of LavaSearch results: `python -m bot.bench.lavasearch`
+
+Parses a realistic 100-item `/v4/loadsearch` payload (25 tracks, albums,
+artists and playlists) and builds the five choices per type autocomplete
+shows, once with the eager result type it replaced (every item decoded,
+the whole payload kept as `raw`) and once with `LavasearchResult`.
+Reports decoding CPU per autocomplete, and with the JSON parse included,
+bytes allocated at peak and bytes the result keeps alive.
+"""
+import json
+import argparse
+from typing import Any, List, Optional
+
+from lavalink import AudioTrack
+
+from bot.bench.common import best_of, allocated
+from bot.harness.fake_lavalink import make_track
+from bot.library.classes.lavasearch import LavasearchResult
+
+class EagerItem:
+    """`SearchResultItem` as it was, a dict backed instance"""
+
+    def __init__(self, title=None, author=None, uri=None, artwork_url=None, item_type=None) -> None:
+        self.title, self.author, self.uri, self.artwork_url, self.item_type = \
+            title, author, uri, artwork_url, item_type
+
+    @classmethod
+    def from_dict(cls, mapping: dict) -> 'EagerItem':
+        plugin_info = mapping.get('pluginInfo', {})
+        return cls(mapping.get('info', {}).get('name'), plugin_info.get('author'), plugin_info.get('url'),
+            plugin_info.get('artworkUrl'), plugin_info.get('type'))
+
+class EagerResult:
+    """`LavasearchResult` as it was, every item decoded up front"""
+
+    def __init__(self, raw: Any, tracks: Optional[List[dict]] = None, albums: Optional[List[dict]] = None,
+            artists: Optional[List[dict]] = None, playlists: Optional[List[dict]] = None) -> None:
+        self.raw = raw
+        self.tracks = [AudioTrack.from_dict(track) for track in tracks or []]
+        self.albums = [EagerItem.from_dict(item) for item in albums or []]
+        self.artists = [EagerItem.from_dict(item) for item in artists or []]
+        self.playlists = [EagerItem.from_dict(item) for item in playlists or []]
+
+    @classmethod
+    def from_dict(cls, mapping: dict) -> 'EagerResult':
+        return cls(mapping, mapping.get('tracks'), mapping.get('albums'), mapping.get('artists'),
+            mapping.get('playlists'))
+
+def payload(per_type: int) -> str:
+
+    def item(kind: str, i: int) -> dict:
+        return {'info': {'name': f'Search {kind} {i}', 'selectedTrack': -1}, 'pluginInfo': {'type': kind,
+            'url': f'https://open.spotify.com/{kind}/{i:022d}', 'artworkUrl': f'https://i.scdn.co/image/{i:040d}',
+            'author': f'Artist {i}', 'totalTracks': 12}, 'tracks': []}
+
+    return json.dumps({
+        'tracks': [make_track(f'{i:011d}', f'Search track {i}', f'Artist {i}', 200_000, 'spotify') for i in range(per_type)],
+        'albums': [item('album', i) for i in range(per_type)],
+        'artists': [item('artist', i) for i in range(per_type)],
+        'playlists': [item('playlist', i) for i in range(per_type)],
+        'texts': [], 'plugin': {},
+    })
+
+def choices(result, count: int) -> List[str]:
+    """The choice names `get_choices` builds for all types"""
+
+    names = [f'{track.title} - {track.author}' for track in result.tracks[:count]]
+    names += [item.author for item in result.artists[:count]]
+    names += [f'{item.title} - {item.author}' for item in result.playlists[:count]]
+    names += [f'{item.title} - {item.author}' for item in result.albums[:count]]
+    return names
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(prog='python -m bot.bench.lavasearch',
+        description='Compares eager and lazy decoding of LavaSearch results for autocomplete')
+    parser.add_argument('--per-type', type=int, default=25, help='items per result type, 4 types')
+    parser.add_argument('--choices', type=int, default=5, help='choices shown per type')
+    parser.add_argument('--number', type=int, default=2000, help='autocompletes per timing run')
+    args = parser.parse_args()
+
+    text = payload(args.per_type)
+    assert choices(EagerResult.from_dict(json.loads(text)), args.choices) == \
+        choices(LavasearchResult.from_dict(json.loads(text), args.choices), args.choices)
+
+    decoders = {
+        'eager': lambda mapping: EagerResult.from_dict(mapping),
+        'lazy': lambda mapping: LavasearchResult.from_dict(mapping, args.choices),
+    }
+    mapping = json.loads(text)
+    print(f'payload: {4 * args.per_type} items, {len(text) / 1024:.1f} KiB, '
+        f'json.loads {best_of(lambda: json.loads(text), args.number):.1f} µs in either case')
+    for name, decode in decoders.items():
+        cpu = best_of(lambda: choices(decode(mapping), args.choices), args.number)
+        held, peak = allocated(lambda: choices(result := decode(json.loads(text)), args.choices) and result)
+        print('{:<6} {:>7.1f} µs decoding per autocomplete  peak {:>7.1f} KiB  result keeps {:>7.1f} KiB alive'.format(
+            name, cpu, peak / 1024, held / 1024))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Event loop stall from log writes: `python -m bot.bench.logs --disk-latency 0.005`
+
+Logs `--records` track and command lines from the event loop at `--rate`
+per second, once through plain `logging.FileHandler`s (a write and flush
+per record, like before) and once through `log_pipeline` with batched
+handlers. Every flush sleeps `--disk-latency` seconds to stand in for a
+slow container volume. Reports the time spent in each logging call and
+how late a 1 ms timer on the loop fired meanwhile.
+"""
+import os
+import asyncio
+import logging
+import argparse
+import tempfile
+from time import sleep, perf_counter
+from typing import List
+
+from bot.flame import percentile
+from bot.bench.common import LoopLag
+from bot.logger.pipeline import LogPipeline, Batched, JsonFormatter
+
+class SlowDisk:
+    """Handler mixin whose every flush takes `latency` seconds longer"""
+
+    latency = 0.0
+
+    def flush(self) -> None:
+        super().flush()
+        if self.latency:
+            sleep(self.latency)
+
+class SlowFileHandler(SlowDisk, logging.FileHandler):
+    pass
+
+class SlowBatchedFileHandler(Batched, SlowDisk, logging.FileHandler):
+    pass
+
+def make_logger(name: str, handler: logging.Handler, json: bool) -> logging.Logger:
+
+    handler.setFormatter(JsonFormatter() if json else logging.Formatter('%(asctime)s: %(message)s'))
+    logger = logging.getLogger(name)
+    logger.handlers[:] = [handler]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger
+
+async def drive(loggers: List[logging.Logger], records: int, rate: float) -> tuple:
+    """Logs `records` lines spread over `loggers`, returns µs per call and the loop lag seen"""
+
+    calls = []
+    async with LoopLag() as lag:
+        for i in range(records):
+            logger = loggers[i % len(loggers)]
+            start = perf_counter()
+            logger.info('%s - %s - %s', f'Track {i}', f'Artist {i % 97}', f'https://www.youtube.com/watch?v={i:011d}')
+            calls.append((perf_counter() - start) * 1e6)
+            await asyncio.sleep(1 / rate)
+    return sorted(calls), sorted(lag * 1000 for lag in lag.lags)
+
+def report(name: str, calls: List[float], lags: List[float]) -> str:
+    return '{:<9} log call p50 {:>7.1f} µs  p99 {:>8.1f} µs  max {:>8.1f} µs   loop lag p99 {:>6.2f} ms  max {:>6.2f} ms'.format(
+        name, percentile(calls, 0.5), percentile(calls, 0.99), calls[-1], percentile(lags, 0.99), lags[-1])
+
+async def run(args: argparse.Namespace) -> None:
+
+    SlowDisk.latency = args.disk_latency
+    directory = tempfile.mkdtemp(prefix='musiccat-bench-')
+
+    before = [make_logger(f'bench.before.{name}', SlowFileHandler(os.path.join(directory, f'before-{name}.log'),
+        encoding='utf-8'), args.json) for name in ('track', 'command')]
+    print(report('before', *await drive(before, args.records, args.rate)))
+
+    pipeline = LogPipeline(flush_interval=args.flush_interval)
+    after = [make_logger(f'bench.after.{name}', SlowBatchedFileHandler(os.path.join(directory, f'after-{name}.log'),
+        encoding='utf-8'), args.json) for name in ('track', 'command')]
+    for logger in after:
+        pipeline.wrap(logger)
+    print(report('after', *await drive(after, args.records, args.rate)))
+    pipeline.close()
+
+    stats = pipeline.stats()
+    print(f'pipeline: {stats["written"]} records in {stats["batches"]} batches, {stats["dropped"]} dropped')
+    for name in ('track', 'command'):
+        with open(os.path.join(directory, f'after-{name}.log'), encoding='utf-8') as file:
+            assert sum(1 for _ in file) == args.records // 2, 'records were lost'
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(prog='python -m bot.bench.logs',
+        description='Compares event loop stalls of direct and pipelined log writes')
+    parser.add_argument('--records', type=int, default=2000)
+    parser.add_argument('--rate', type=float, default=500, help='records per second')
+    parser.add_argument('--disk-latency', type=float, default=0.005, help='extra seconds per flush')
+    parser.add_argument('--flush-interval', type=float, default=0.05, help='seconds per pipeline batch')
+    parser.add_argument('--json', action='store_true', help='use the JSON lines formatter')
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == '__main__':
+    main()
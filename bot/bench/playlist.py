@@ -0,0 +1,67 @@
+"""
+Enqueueing a large playlist: `python -m bot.bench.playlist --tracks 10000`
+
+Adds a `--tracks` playlist to a fresh player's queue, once the way `_play`
+used to (popping a random track off the result list and `player.add` per
+track into a plain list, a new `user_data` dict each) and once through
+`MusicCatPlayer.add_tracks`, with and without shuffle. Reports the time the
+event loop is blocked per playlist and the memory the metadata keeps alive.
+"""
+import argparse
+from random import randrange
+from time import perf_counter
+from types import SimpleNamespace
+from typing import Callable, List
+
+from lavalink import AudioTrack, DefaultPlayer
+
+from bot.bench.common import allocated
+from bot.harness.fake_lavalink import make_track
+from bot.library.player import MusicCatPlayer
+
+NODE = SimpleNamespace(manager=SimpleNamespace(client=None))
+META = {'playlist_name': 'Bench', 'playlist_url': 'https://www.youtube.com/playlist?list=bench'}
+
+def before(player: DefaultPlayer, tracks: List[AudioTrack], shuffle: bool) -> None:
+    while tracks:
+        track = tracks.pop(randrange(len(tracks)) if shuffle else 0)
+        track.user_data = dict(META)
+        player.add(requester=1, track=track)
+
+def after(player: MusicCatPlayer, tracks: List[AudioTrack], shuffle: bool) -> None:
+    player.add_tracks(tracks, requester=1, user_data=dict(META), shuffle_tracks=shuffle)
+
+def timed(enqueue: Callable, player_type: type, tracks: List[AudioTrack], shuffle: bool, repeat: int) -> float:
+    """Best ms per playlist, the player and the result list are set up outside the timing"""
+
+    times = []
+    for _ in range(repeat):
+        player, result = player_type(1, NODE), list(tracks)
+        start = perf_counter()
+        enqueue(player, result, shuffle)
+        times.append((perf_counter() - start) * 1000)
+        assert len(player.queue) == len(tracks)
+    return min(times)
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(prog='python -m bot.bench.playlist',
+        description='Compares per-track and bulk enqueueing of a large playlist')
+    parser.add_argument('--tracks', type=int, default=10_000, help='tracks in the playlist')
+    parser.add_argument('--repeat', type=int, default=10, help='playlists per measurement')
+    args = parser.parse_args()
+
+    tracks = [AudioTrack(make_track(f'{i:011d}', f'Track {i}', f'Artist {i % 97}', 200_000), 0)
+        for i in range(args.tracks)]
+    runs = {'before': (before, DefaultPlayer), 'after': (after, MusicCatPlayer)}
+    print(f'playlist: {args.tracks} tracks')
+    for shuffle in (False, True):
+        for name, (enqueue, player_type) in runs.items():
+            ms = timed(enqueue, player_type, tracks, shuffle, args.repeat)
+            player = player_type(1, NODE)
+            held, _ = allocated(lambda: enqueue(player, list(tracks), shuffle))
+            print('{:<6} shuffle={:<5}  {:>7.2f} ms blocked per playlist  metadata and queue keep {:>7.1f} KiB'.format(
+                name, str(shuffle), ms, held / 1024))
+
+if __name__ == '__main__':
+    main()
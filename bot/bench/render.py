@@ -0,0 +1,117 @@
+"""
+Embed rendering: `python -m bot.bench.render`
+
+Times the helpers `bot.utils` used to provide (`format_time`,
+`progress_bar`, `player_bar`) and the `/queue` description built from them
+against `bot.library.render`. The player position moves through the track
+between calls, like successive refreshes of a playing track.
+"""
+import argparse
+from itertools import cycle
+from types import SimpleNamespace
+
+from lavalink import AudioTrack
+
+from bot.bench.common import best_of
+from bot.constants import EMOJI_RADIO_BUTTON, EMOJI_RESUME_PLAYER, EMOJI_PAUSE_PLAYER
+from bot.harness.fake_lavalink import make_track
+from bot.library import render
+from bot.library.classes.queue import TrackQueue
+from bot.utils import parse_time
+
+AUTHOR_SOURCES = ('deezer', 'spotify')
+
+def format_time(time: int, option: str = None) -> str:
+
+    days, hours, minutes, seconds = parse_time(time)
+
+    if days and (option == 'd' or not option):
+        return '%d:%02d:%02d:%02d' % (days, hours, minutes, seconds)
+    elif hours and (option == 'h' or not option):
+        return '%d:%02d:%02d' % (days * 24 + hours, minutes, seconds)
+    return '%d:%02d' % ((days * 24 + hours) * 60 + minutes, seconds)
+
+def progress_bar(percent: float) -> str:
+
+    bar = [EMOJI_RADIO_BUTTON if i == (int)(percent*12) else '▬' for i in range(12)]
+    return ''.join(bar)
+
+def player_bar(player) -> str:
+
+    play_pause = EMOJI_RESUME_PLAYER if player.paused else EMOJI_PAUSE_PLAYER
+    if player.current.stream:
+        playtime = 'LIVE'
+        player_bar = progress_bar(0.99)
+    else:
+        playtime = f'{format_time(player.position)} | {format_time(player.current.duration)}'
+        player_bar = progress_bar(player.position/player.current.duration)
+
+    return f'{play_pause} {player_bar} `{playtime}`'
+
+def queue_description(player) -> str:
+    """`/queue` description as the command built it"""
+
+    current = player.current
+    if current.user_data:
+        playlist_info = 'Playlist [{}]({})\n'.format(current.user_data.get('playlist_name', 'Unknown Playlist'),
+            current.user_data.get('playlist_url', '#'))
+    else:
+        playlist_info = ''
+    desc = '[{}]({})\n{}\n{}\n\n{}Requested <@!{}>\n'.format(current.title, current.uri, current.author,
+        player_bar(player), playlist_info, current.requester)
+
+    for i, track in enumerate(player.queue):
+        if i == 0:
+            desc += '\n**Up next:**'
+        if i >= 10:
+            break
+        desc += '\n{}. [{}]({}) `{}`'.format(i + 1, track.title, track.uri,
+            'LIVE' if track.stream else format_time(track.duration))
+        if track.source_name in AUTHOR_SOURCES:
+            desc += f' {track.author}'
+    return desc
+
+def make_player(queue: int) -> SimpleNamespace:
+
+    tracks = [AudioTrack(make_track(f'{i:011d}', f'Track {i}', f'Artist {i}', 180_000 + i * 1000,
+        'spotify' if i % 2 else 'youtube'), 1) for i in range(queue + 1)]
+    tracks[0].user_data = {'playlist_name': 'Bench', 'playlist_url': 'https://www.youtube.com/playlist?list=bench'}
+    return SimpleNamespace(current=tracks[0], queue=TrackQueue(tracks[1:]), position=0, paused=False,
+        render_cache={})
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(prog='python -m bot.bench.render',
+        description='Compares the old bot.utils embed helpers with bot.library.render')
+    parser.add_argument('--queue', type=int, default=100, help='queued tracks')
+    parser.add_argument('--number', type=int, default=20_000, help='calls per timing run')
+    args = parser.parse_args()
+
+    player = make_player(args.queue)
+    duration = player.current.duration
+    positions = cycle(range(0, duration, 997))
+    times = cycle(range(0, 4 * 3600 * 1000, 1009))
+
+    def move() -> SimpleNamespace:
+        player.position = next(positions)
+        return player
+
+    player.position = 61_000
+    assert player_bar(player) == render.player_bar(player)
+    assert queue_description(player) == render.now_description(player) + render.queue_page(player, 0)
+    assert all(format_time(t) == render.format_time(t) for t in range(0, 4 * 3600 * 1000, 1009))
+
+    cases = {
+        'format_time': (lambda: format_time(next(times)), lambda: render.format_time(next(times))),
+        'progress_bar': (lambda: progress_bar(next(positions) / duration),
+            lambda: render.progress_bar(next(positions) / duration)),
+        'player_bar': (lambda: player_bar(move()), lambda: render.player_bar(move())),
+        '/queue description': (lambda: queue_description(move()),
+            lambda: render.now_description(move()) + render.queue_page(player, 0)),
+    }
+    for name, (before, after) in cases.items():
+        old, new = best_of(before, args.number), best_of(after, args.number)
+        print(f'{name:<19} before {old:>6.2f} µs  after {new:>6.2f} µs  {old / new:>5.1f}x')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+Player snapshot restore at scale: `python -m bot.bench.snapshot --guilds 1000`
+
+Writes a journal of `--guilds` players with `--queue` tracks each, restores
+them on fake Lavalink nodes through a stand-in gateway that answers voice
+joins after `--voice-latency`, and reports where the time went. Voice joins
+are paced per shard by `--join-interval`, 0 by default to measure the bot's
+own overhead, the pacing floor at the configured interval is printed.
+Then it times a compacting and an incremental save of the restored players.
+"""
+import os
+import json
+import asyncio
+import argparse
+import tempfile
+from time import time, perf_counter
+
+import lavalink
+
+from bot.config import SNAPSHOT_JOIN_INTERVAL, SNAPSHOT_RESTORE_CONCURRENCY
+from bot.bench.common import LoopLag
+from bot.harness.fake_lavalink import FakeLavalink
+from bot.library.failover import HealthNodeManager
+from bot.library.player import MusicCatPlayer
+from bot.library.snapshot import SnapshotManager, JoinPacer
+
+USER_ID = 1
+
+class Gateway:
+    """Stands in for the bot, answers voice joins with the state and server updates Discord would send"""
+
+    def __init__(self, client: lavalink.Client, shard_count: int, latency: float) -> None:
+        self.client = client
+        self.shard_count = shard_count
+        self.latency = latency
+        self.joins = 0
+
+    async def update_voice_state(self, guild_id: int, channel_id: int, self_deaf: bool = False) -> None:
+        self.joins += 1
+        asyncio.get_running_loop().create_task(self._answer(guild_id, channel_id))
+
+    async def _answer(self, guild_id: int, channel_id: int) -> None:
+        await asyncio.sleep(self.latency)
+        await self.client.voice_update_handler({'t': 'VOICE_STATE_UPDATE', 'd': {'guild_id': guild_id,
+            'user_id': USER_ID, 'channel_id': channel_id, 'session_id': f'session-{guild_id}'}})
+        await self.client.voice_update_handler({'t': 'VOICE_SERVER_UPDATE', 'd': {'guild_id': guild_id,
+            'endpoint': 'voice.example', 'token': 'token'}})
+
+def write_journal(path: str, node: FakeLavalink, guilds: int, queue: int) -> int:
+    """One full line per guild, like a compacted journal, returns the number of distinct tracks"""
+
+    tracks = node.tracks('bench', 2000)     # guilds share popular tracks, like real queues
+    now = round(time(), 3)
+    with open(path, 'w', encoding='utf-8') as file:
+        for i in range(guilds):
+            guild_id = (1 << 22) * (1000 + i)
+            entries = [[tracks[(i * 7 + j) % len(tracks)]['encoded'], 1, 0] for j in range(queue + 1)]
+            state = {'channel': guild_id + 1, 'send_channel': guild_id + 2, 'current': entries[0],
+                'position': 30_000, 'paused': False, 'loop': 0, 'shuffle': False, 'volume': 80,
+                'filters': [], 'queue': entries[1:], 'meta': [{'playlist_name': 'Bench', 'playlist_url': None}]}
+            file.write(json.dumps({'guild': guild_id, 'ts': now, 'state': state}, separators=(',', ':')) + '\n')
+    return min(len(tracks), guilds * 7 + queue + 1)
+
+async def run(args: argparse.Namespace) -> None:
+
+    nodes = [FakeLavalink(f'fake-{i + 1}', args.lavalink_latency, track_seconds=3600) for i in range(args.nodes)]
+    for node in nodes:
+        await node.start()
+
+    client = lavalink.Client(user_id=USER_ID, player=MusicCatPlayer)
+    client.node_manager = HealthNodeManager(client, None, False)
+    ready = set()
+
+    async def node_ready(event: lavalink.NodeReadyEvent) -> None:
+        ready.add(event.session_id)
+
+    client.add_event_hook(node_ready, event=lavalink.NodeReadyEvent)
+    for node in nodes:
+        client.add_node('127.0.0.1', node.port, 'youshallnotpass', 'us', node.name)
+    while len(ready) < len(nodes):
+        await asyncio.sleep(0.01)
+
+    path = os.path.join(tempfile.mkdtemp(prefix='musiccat-bench-'), 'players.jsonl')
+    distinct = write_journal(path, nodes[0], args.guilds, args.queue)
+    snapshots = SnapshotManager(path)
+    gateway = Gateway(client, args.shards, args.voice_latency)
+
+    start = perf_counter()
+    states = snapshots.load()
+    load_ms = (perf_counter() - start) * 1000
+
+    async with LoopLag() as lag:
+        start = perf_counter()
+        await snapshots.restore(gateway, client, args.concurrency, JoinPacer(args.join_interval))
+        restore_s = perf_counter() - start
+        players = client.player_manager.players.values()
+        while sum(player.is_playing for player in players) < len(states) and perf_counter() - start < 30:
+            await asyncio.sleep(0.01)
+        playing_s = perf_counter() - start
+
+    playing = sum(player.is_playing for player in players)
+    placed = sum(abs(player.position - 30_000) < 5000 for player in players if player.is_playing)
+    decodes = sum(node.requests['decodetracks'] for node in nodes)
+    updates = sum(node.requests['update_player'] for node in nodes)
+    floor = args.guilds / args.shards * SNAPSHOT_JOIN_INTERVAL
+    print(f'journal: {args.guilds} guilds, {args.queue + 1} tracks each, {distinct} distinct, '
+        f'{os.path.getsize(path) / 1024:.0f} KiB, load {load_ms:.1f} ms')
+    print(f'restore: {restore_s:.2f}s, all playing after {playing_s:.2f}s, {playing}/{len(states)} playing, '
+        f'{placed} at the saved position')
+    print(f'lavalink: decodetracks {decodes}, update_player {updates}, voice joins {gateway.joins}')
+    print(f'event loop: max stall {lag.max_ms:.1f} ms, {lag.over(10)} stalls over 10 ms')
+    print(f'pacing floor at {SNAPSHOT_JOIN_INTERVAL}s per join and {args.shards} shard(s): {floor:.0f}s')
+
+    for label, compact in (('compacting', True), ('incremental', False)):
+        async with LoopLag() as lag:
+            start = perf_counter()
+            await snapshots.save(compact=compact)
+            elapsed = (perf_counter() - start) * 1000
+        print(f'save, {label}: {elapsed:.1f} ms, max event loop stall {lag.max_ms:.1f} ms, '
+            f'journal {os.path.getsize(path) / 1024:.0f} KiB')
+
+    client.player_manager.players.clear()
+    for node in client.node_manager:
+        node._transport._destroyed = True
+    await client.close()
+    for node in nodes:
+        await node.close()
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(prog='python -m bot.bench.snapshot',
+        description='Restores saved players on fake Lavalink nodes and times it')
+    parser.add_argument('--guilds', type=int, default=1000)
+    parser.add_argument('--queue', type=int, default=50, help='queued tracks per guild')
+    parser.add_argument('--nodes', type=int, default=2, help='fake Lavalink nodes')
+    parser.add_argument('--shards', type=int, default=1)
+    parser.add_argument('--concurrency', type=int, default=SNAPSHOT_RESTORE_CONCURRENCY)
+    parser.add_argument('--join-interval', type=float, default=0, help='seconds between voice joins per shard')
+    parser.add_argument('--lavalink-latency', type=float, default=0.02, help='seconds per Lavalink REST call')
+    parser.add_argument('--voice-latency', type=float, default=0.05, help='seconds until a join is answered')
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == '__main__':
+    main()
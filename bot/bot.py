@@ -1,5 +1,7 @@
 import os
 import logging
+from bisect import bisect_left
+from itertools import accumulate
 
 import hikari
 import lavalink
@@ -9,8 +11,28 @@ import miru
 from bot.config import *
 from .library.handler import EventHandler
 from bot.library.player import MusicCatPlayer
+from bot.library.index import track_index
+from bot.library.store import track_store
+from bot.library.snapshot import player_snapshots
+from bot.library.classes.history import history_spill
+from bot.library.dispatch import dispatcher, respond
+from bot.library.progress import live_progress
+from bot.library.health import node_health
+from bot.library.failover import HealthNodeManager
+from bot.library.coordinator import coordinator
+from bot.library.cache import track_cache
+from bot.library.nowplaying import now_playing
+from bot.library.autocomplete import autocomplete_engine
+from bot.library.tracing import tracer
+from bot.library.analytics import play_analytics
+from bot.library.metrics import metrics, command_started, command_responded, \
+    AUTOCOMPLETE, CACHE, PLAYERS, QUEUE_LENGTH, QUEUE_BUCKETS
+from bot.library.classes.lavasearch import LavasearchClient
 from bot.logger.bot_logger import bot_logging_config
-from bot.logger.custom_logger import command_logger
+from bot.logger.custom_logger import command_logger, log_paths
+from bot.logger.pipeline import log_pipeline
+
+WORKER_ID = os.environ.get('WORKER_ID')   # set by the launcher, None when running standalone
 
 bot = lightbulb.BotApp(
     os.environ['TOKEN'],
@@ -18,6 +40,7 @@ bot = lightbulb.BotApp(
     help_slash_command=True, banner=None,
     logs=bot_logging_config,
 )
+log_pipeline.wrap(logging.getLogger())  # root handlers configured by the bot above
 
 bot.load_extensions_from('./bot/extensions', must_exist=True)
 
@@ -25,26 +48,106 @@ def setup_lavalink(client: lavalink.Client, event_handler: EventHandler, nodes=[
     
     assert isinstance(client, lavalink.Client)
 
+    client.node_manager = HealthNodeManager(client, None, False)   # places and moves players by node health
     client.add_event_hooks(event_handler)
+    lavasearch = LavasearchClient(LAVALINK_PASSWORD)
     for node in nodes:
+        host, port = node.get('host', LAVALINK_HOST), node.get('port', LAVALINK_PORT)
+        password, ssl = node.get('password', LAVALINK_PASSWORD), node.get('ssl', False)
         client.add_node(
-            host=LAVALINK_HOST, port=LAVALINK_PORT,
-            password=LAVALINK_PASSWORD,
-            region=node.get('region'), name=node['name'])
+            host=host, port=port, password=password,
+            region=node.get('region'), name=node['name'], ssl=ssl)
+        lavasearch.add_node(node['name'], host, port, ssl, password)
     bot.d.lavalink = client
+    bot.d.lavasearch = lavasearch
+
+def worker_stats() -> dict:
+    """Counters of this worker, summed over all workers by the coordinator"""
+
+    players = bot.d.lavalink.player_manager.players.values()
+    cache = track_cache.stats()
+    return {
+        'guilds': len(bot.cache.get_guilds_view()), 'players': len(players),
+        'playing': sum(player.is_playing for player in players),
+        'cache_hits': cache['hits'], 'cache_misses': cache['misses'],
+        'tracks': now_playing.tracks, 'rest_calls': dispatcher.executed,
+    }
+
+def collect_metrics() -> None:
+    """Copies counters kept by other modules into the metrics, run on every scrape"""
+
+    autocomplete = autocomplete_engine.stats()
+    for outcome in ('requests', 'hits', 'lookups', 'budget_misses', 'stale_served'):
+        AUTOCOMPLETE.labels(outcome).value = autocomplete[outcome]
+    cache = track_cache.stats()
+    for outcome in ('hits', 'misses', 'evictions'):
+        CACHE.labels(outcome).value = cache[outcome]
+
+    # current distribution of queue lengths, as gauges since it goes down as well as up
+    PLAYERS.clear()
+    queued = [0] * (len(QUEUE_BUCKETS) + 1)
+    for player in bot.d.lavalink.player_manager.players.values():
+        PLAYERS.labels(player.node.name, 'playing' if player.is_playing else 'idle').inc()
+        if player.is_connected:
+            queued[bisect_left(QUEUE_BUCKETS, len(player.queue))] += 1
+    for bound, total in zip((*QUEUE_BUCKETS, '+Inf'), accumulate(queued)):
+        QUEUE_LENGTH.labels(bound).set(total)
 
 @bot.listen(hikari.StartedEvent)
 async def on_started_event(event: hikari.StartedEvent) -> None:
     
     client = lavalink.Client(user_id=bot.get_me().id, player=MusicCatPlayer)
     setup_lavalink(client, EventHandler(event.app), LAVALINK_NODES)
+    if WORKER_ID is not None:
+        root, ext = os.path.splitext(SNAPSHOT_PATH)
+        player_snapshots.path = f'{root}.{WORKER_ID}{ext}'     # one journal per worker
+        root, ext = os.path.splitext(TRACE_PATH)
+        tracer.path = f'{root}.{WORKER_ID}{ext}'
+        root, ext = os.path.splitext(PLAY_LOG_PATH)
+        play_analytics.path = f'{root}.{WORKER_ID}{ext}'
+        try:
+            await coordinator.connect(os.environ.get('COORDINATOR_PATH', COORDINATOR_PATH), WORKER_ID, worker_stats)
+        except OSError as e:
+            logging.error('Failed to connect to coordinator, worker %s runs standalone: %s', WORKER_ID, e)
+    await track_index.load(log_paths['track'])
+    track_store.open()
+    history_spill.start()
+    await play_analytics.open()
+    dispatcher.start(bot.rest)
+    live_progress.start(client.player_manager.get)
+    node_health.start(client.node_manager.nodes)
+    tracer.start()
+    if METRICS_PORT:
+        metrics.collectors.append(collect_metrics)
+        await metrics.start(METRICS_HOST, METRICS_PORT + int(WORKER_ID or 0))
+    player_snapshots.start(client)
+    await player_snapshots.restore(bot, client)
+
+@bot.listen(hikari.StoppingEvent)
+async def on_stopping_event(event: hikari.StoppingEvent) -> None:
+    await player_snapshots.close()
+    await live_progress.close()
+    await node_health.close()
+    await dispatcher.close()
+    await bot.d.lavasearch.close()
+    await history_spill.close()
+    await track_store.close()
+    await play_analytics.close()
+    await coordinator.close()
+    await metrics.close()
+    await tracer.close()
 
 @bot.listen(lightbulb.CommandInvocationEvent)
 async def on_command(event: lightbulb.CommandInvocationEvent) -> None:
+    command_started(event.context)
     command_logger.info('\'/%s\' invocated by \'%s\' on guild: %d', 
         event.command.name, event.context.author.username,event.context.guild_id)
     
 
+@bot.listen(lightbulb.CommandCompletionEvent)
+async def on_command_completion(event: lightbulb.CommandCompletionEvent) -> None:
+    command_responded(event.context)    # commands that never responded
+
 @bot.listen(lightbulb.CommandErrorEvent)
 async def on_error(event: lightbulb.CommandErrorEvent) -> None:
 
@@ -57,10 +160,14 @@ async def on_error(event: lightbulb.CommandErrorEvent) -> None:
     # elif isinstance(exception, lightbulb.CommandInvocationError):
     #     raise exception
     else:
+        command_responded(event.context)
         raise exception
-    await event.context.respond(error_msg, flags=hikari.MessageFlag.EPHEMERAL)
+    await respond(event.context, error_msg, flags=hikari.MessageFlag.EPHEMERAL)
     
 
 def run() -> None:
     miru.install(bot)
-    bot.run()
+    if shard_ids := os.environ.get('SHARD_IDS'):     # worker of the launcher
+        bot.run(shard_ids=[int(shard) for shard in shard_ids.split(',')], shard_count=int(os.environ['SHARD_COUNT']))
+    else:
+        bot.run()
@@ -1,8 +1,103 @@
 """LAVALINK CONFIG"""
-LAVALINK_HOST: str = 'lavalink'
+LAVALINK_HOST: str = 'lavalink'           # defaults for nodes without their own host/port/password
 LAVALINK_PORT: int = 2333
 LAVALINK_PASSWORD: str = 'youshallnotpass'
-LAVALINK_NODES: list = [
-    {'name': 'default-node'},
-    {'name': 'backup-node'},
-]
\ No newline at end of file
+LAVALINK_NODES: list = [    # region is a key of lavalink's regions ('asia', 'eu', 'us') or None
+    {'name': 'default-node', 'host': 'lavalink', 'port': 2333, 'region': None},
+    {'name': 'backup-node', 'host': 'lavalink', 'port': 2333, 'region': None},
+]
+
+"""NODE HEALTH CONFIG"""
+NODE_LATENCY_ALPHA: float = 0.2         # weight of the newest sample in the latency and error rate averages
+NODE_LATENCY_WEIGHT: float = 1.0        # score points per ms of REST latency, one playing player is 1 point
+NODE_ERROR_WEIGHT: float = 1000         # score points at a 100% error rate
+NODE_PROBE_INTERVAL: float = 30         # seconds between version probes of every node
+NODE_MIGRATE_CONCURRENCY: int = 20      # players moved at once when a node is lost or drained
+
+"""TRACK CACHE CONFIG"""
+CACHE_MAX_ENTRIES: int = 2048
+CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+CACHE_TTL: dict = {     # seconds per load type, 0 disables caching
+    'SEARCH': 60,
+    'TRACK': 1800,
+    'PLAYLIST': 900,
+    'EMPTY': 0,
+    'ERROR': 0,
+}
+
+"""AUTOCOMPLETE CONFIG"""
+AUTOCOMPLETE_DEBOUNCE: float = 0.2     # seconds to wait for the next keystroke while an earlier one is pending
+AUTOCOMPLETE_BUDGET: float = 2.5        # seconds before stale choices are served, Discord drops responses after 3s
+AUTOCOMPLETE_TTL: float = 60            # seconds a result is served without a new lookup
+AUTOCOMPLETE_CACHE_SIZE: int = 4096     # results kept for fresh hits and stale/prefix fallback
+
+"""TRACK INDEX CONFIG"""
+TRACK_INDEX_SIZE: int = 20000           # tracks kept for local autocomplete
+
+"""LAVASEARCH CONFIG"""
+LAVASEARCH_TIMEOUT: float = 2.0         # seconds per request
+LAVASEARCH_CONCURRENCY: int = 8         # in-flight requests per node
+LAVASEARCH_RETRIES: int = 1
+
+"""PLAYER CONFIG"""
+HISTORY_SIZE: int = 50                  # tracks kept in memory per guild, older ones are spilled to disk
+HISTORY_FLUSH: float = 5                # seconds between batched history spills
+HISTORY_PATH: str = 'logs/history'      # one append-only file of spilled tracks per guild
+
+"""TRACK STORE CONFIG"""
+TRACK_STORE_PATH: str = 'data/tracks.db'
+TRACK_STORE_CACHE: int = 10000          # tracks kept in memory in front of SQLite
+TRACK_STORE_FLUSH: float = 5            # seconds between batched writes
+
+"""SNAPSHOT CONFIG"""
+SNAPSHOT_PATH: str = 'data/players.jsonl'
+SNAPSHOT_INTERVAL: float = 10           # seconds between incremental snapshots
+SNAPSHOT_COMPACT: int = 4               # journal is rewritten once it is this many times the size of the live states
+SNAPSHOT_MAX_AGE: float = 3600          # seconds after which saved players are not restored
+SNAPSHOT_RESTORE_CONCURRENCY: int = 50  # guilds restored at once
+SNAPSHOT_JOIN_INTERVAL: float = 0.6     # seconds between voice joins per shard, gateway allows 120 sends/min
+
+"""NOW PLAYING CONFIG"""
+NOW_PLAYING_DELETE_DELAY: float = 15    # seconds the message stays after the queue ends, reused if playback resumes
+
+"""DISPATCH CONFIG"""
+DISPATCH_CONCURRENCY: int = 16          # REST calls in flight at once
+DISPATCH_ROUTE_LIMIT: tuple = (5, 5.0)  # requests per seconds for each channel route, paced locally
+
+"""LIVE PROGRESS CONFIG"""
+LIVE_PROGRESS: bool = False             # default for new players, toggled per guild with /progress
+LIVE_PROGRESS_TICK: float = 1.0         # timer wheel resolution in seconds
+LIVE_PROGRESS_RATE: float = 20          # max progress edits per second across all guilds
+LIVE_PROGRESS_CONCURRENCY: int = 4      # progress edits in flight at once
+LIVE_PROGRESS_PAUSED: float = 5         # seconds between checks of a paused player
+
+"""SHARDING CONFIG"""
+SHARD_COUNT: int = 0                    # gateway shards, 0 uses the count recommended by Discord
+WORKERS: int = 0                        # worker processes of the launcher, 0 is one per CPU core
+COORDINATOR_PATH: str = 'data/coordinator.sock'
+COORDINATOR_CACHE_SIZE: int = 8192      # search results shared by all workers
+COORDINATOR_TIMEOUT: float = 0.5        # seconds before a worker falls back to local data
+COORDINATOR_REPORT_INTERVAL: float = 5  # seconds between stats and node health reports
+
+"""METRICS CONFIG"""
+METRICS_HOST: str = '127.0.0.1'
+METRICS_PORT: int = 9100                # Prometheus endpoint at /metrics, workers add their id, 0 disables
+
+"""TRACING CONFIG"""
+TRACE_PATH: str = 'logs/traces.jsonl'
+TRACE_SAMPLE_RATE: float = 0.05         # share of traces written, read with `python -m bot.flame`
+TRACE_SLOW: float = 1.0                 # seconds after which a trace is always written
+TRACE_FLUSH_INTERVAL: float = 5         # seconds between appends to the trace file
+TRACE_BUFFER_SIZE: int = 10000          # traces kept between appends, newer ones are dropped
+
+"""LOGGING CONFIG"""
+LOG_FORMAT: str = 'text'                # 'json' writes log files as compact JSON lines
+LOG_QUEUE_SIZE: int = 10000             # records waiting for the writer thread, newer ones are dropped when full
+LOG_FLUSH_INTERVAL: float = 0.2         # seconds the writer thread collects records before writing a batch
+
+"""PLAY ANALYTICS CONFIG"""
+PLAY_LOG_PATH: str = 'data/plays.jsonl'
+PLAY_LOG_ROLLOVER: int = 16 * 1024 * 1024   # bytes before the log is compressed into a segment and checkpointed
+PLAY_LOG_FLUSH: float = 5               # seconds between appends to the play log
+PLAY_TOP_CAPACITY: int = 50             # tracks and artists counted per guild for the top lists
+PLAY_TOP_TOTAL_CAPACITY: int = 1000     # tracks and artists counted over all guilds
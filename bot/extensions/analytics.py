@@ -0,0 +1,39 @@
+import hikari
+import lightbulb
+
+from bot.library.analytics import play_analytics
+from bot.library.dispatch import respond
+from bot.utils import trim
+
+DELETE_AFTER = 60
+TOP_TRACKS = 10
+TOP_ARTISTS = 5
+plugin = lightbulb.Plugin('Analytics', 'Play statistics')
+
+@plugin.command()
+@lightbulb.add_checks(lightbulb.guild_only)
+@lightbulb.command('top', 'Most played tracks and artists on this server')
+@lightbulb.implements(lightbulb.SlashCommand)
+async def top(ctx: lightbulb.Context) -> None:
+    """Answered from the running aggregates, no history is read"""
+
+    stats = play_analytics.guild(ctx.guild_id)
+    if not stats.plays:
+        await respond(ctx, 'Nothing played yet!', flags=hikari.MessageFlag.EPHEMERAL)
+        return
+
+    body = 'Plays: `{}`\nListened: `{:.1f} hours`\nSkip rate: `{:.0%}`\n'.format(
+        stats.plays, stats.hours, stats.skip_rate)
+    body += '\n**Top tracks:**\n' + '\n'.join(f'`{i}.` [{trim(label, 60)}]({uri}) `{count}x`'
+        for i, (uri, label, count) in enumerate(stats.tracks.top(TOP_TRACKS), 1))
+    body += '\n\n**Top artists:**\n' + '\n'.join(f'`{i}.` {trim(artist, 60)} `{count}x`'
+        for i, (artist, _, count) in enumerate(stats.artists.top(TOP_ARTISTS), 1))
+
+    await respond(ctx, embed=hikari.Embed(title='🏆 Top Plays', description=body[:4096]),
+        delete_after=DELETE_AFTER)
+
+def load(bot: lightbulb.BotApp) -> None:
+    bot.add_plugin(plugin)
+
+def unload(bot: lightbulb.BotApp) -> None:
+    bot.remove_plugin(plugin)
@@ -3,6 +3,8 @@ import lightbulb
 
 from bot.library.base import _join
 from bot.library.checks import valid_user_voice, player_connected
+from bot.library.voice import voice_index
+from bot.library.dispatch import respond
 from bot.library.classes.events import VoiceServerUpdate, VoiceStateUpdate
 
 DELETE_AFTER = 60
@@ -13,7 +15,7 @@ plugin = lightbulb.Plugin('Bot', 'Bot commands')
 @lightbulb.command('ping', 'Test command')
 @lightbulb.implements(lightbulb.SlashCommand)
 async def ping(ctx: lightbulb.Context) -> None:
-    await ctx.respond('pong!', flags=hikari.MessageFlag.EPHEMERAL)
+    await respond(ctx, 'pong!', flags=hikari.MessageFlag.EPHEMERAL)
 """
 
 @plugin.command()
@@ -26,9 +28,9 @@ async def join(ctx: lightbulb.Context) -> None:
     try:
         player = await _join(plugin.bot, ctx.guild_id, ctx.author.id)
     except RuntimeError as e:
-        await ctx.respond(e, flags=hikari.MessageFlag.EPHEMERAL)
+        await respond(ctx, e, flags=hikari.MessageFlag.EPHEMERAL)
     else:
-        await ctx.respond(f'Joined <#{player.channel_id}>', delete_after=DELETE_AFTER)
+        await respond(ctx, f'Joined <#{player.channel_id}>', delete_after=DELETE_AFTER)
 
 
 @plugin.command()
@@ -41,7 +43,7 @@ async def leave(ctx: lightbulb.Context) -> None:
     """Leave voice channel, clear guild player"""
 
     await plugin.bot.update_voice_state(ctx.guild_id, None)
-    await ctx.respond('Left voice channel!', delete_after=DELETE_AFTER)
+    await respond(ctx, 'Left voice channel!', delete_after=DELETE_AFTER)
 
 
 @plugin.listener(hikari.VoiceServerUpdateEvent)
@@ -50,8 +52,20 @@ async def voice_server_update(event: hikari.VoiceServerUpdateEvent) -> None:
 
 @plugin.listener(hikari.VoiceStateUpdateEvent)
 async def voice_state_update(event: hikari.VoiceStateUpdateEvent) -> None:
+    voice_index.update(event.guild_id, event.state.user_id, event.state.channel_id)
     await plugin.bot.d.lavalink._dispatch_event(VoiceStateUpdate(event))
 
+@plugin.listener(hikari.GuildAvailableEvent)
+@plugin.listener(hikari.GuildJoinEvent)
+async def guild_available(event: hikari.GuildVisibilityEvent) -> None:
+    voice_index.load(event.guild_id,
+        ((user_id, state.channel_id) for user_id, state in event.voice_states.items()))
+
+@plugin.listener(hikari.GuildLeaveEvent)
+@plugin.listener(hikari.GuildUnavailableEvent)
+async def guild_unavailable(event: hikari.GuildVisibilityEvent) -> None:
+    voice_index.remove_guild(event.guild_id)
+
 
 def load(bot: lightbulb.BotApp) -> None:
     bot.add_plugin(plugin)
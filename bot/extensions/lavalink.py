@@ -1,7 +1,22 @@
 import hikari
 import lightbulb
 
-from bot.utils import format_time
+from bot.config import LAVALINK_NODES
+from bot.library.render import format_time
+from bot.library.cache import track_cache
+from bot.library.autocomplete import autocomplete_engine
+from bot.library.store import track_store
+from bot.library.snapshot import player_snapshots
+from bot.library.classes.history import history_spill
+from bot.library.nowplaying import now_playing
+from bot.library.progress import live_progress
+from bot.library.dispatch import dispatcher, respond
+from bot.library.health import node_health
+from bot.library.failover import node_failover
+from bot.library.coordinator import coordinator
+from bot.library.tracing import tracer
+from bot.library.analytics import play_analytics
+from bot.logger.pipeline import log_pipeline
 
 plugin = lightbulb.Plugin('Lavalink', 'Lavalink commands')
 
@@ -13,23 +28,83 @@ async def stats(ctx: lightbulb.Context) -> None:
     """Display lavalink stats."""
 
     node_manager = plugin.bot.d.lavalink.node_manager
+    health = node_health.stats()
     body = '**Nodes:**' + '\n'
     for i, node in enumerate(node_manager.nodes):
-        body += '{}. `{} []`\n'.format(i + 1, node.name, node.region)
-    body += '\n**Lavalink Stats:**\n'
+        scores = health.get(node.name) or {'score': round(node_health.score(node), 1), 'latency_ms': 0, 'error_rate': 0}
+        body += '{}. `{} [{}]` score `{}`, REST `{} ms`, errors `{}%`, players `{}`\n'.format(
+            i + 1, node.name, node.region or 'any', scores['score'], scores['latency_ms'],
+            round(100 * scores['error_rate'], 1), len(node.players))
 
-    if node_manager.nodes and (stats := node_manager.nodes[0].stats) and not stats.is_fake:
-        body += 'Uptime: `{}`\nPlayers: `{} ({} playing)`\nMemory: `{} MB ({}%)`\n \
-            Lavalink load: `{}%`\nSystem load: `{}%`\nFrames sent: `{}`\n'.format(
-                format_time(stats.uptime, "d"), 
-                stats.players, stats.playing_players,
-                round(stats.memory_used/1e6), round(100*stats.memory_used/stats.memory_allocated),
-                round(stats.lavalink_load*100, 2), round(stats.system_load*100, 2), stats.frames_sent)
-    else:
-        body += 'No stats available' + '\n'
+    for node in node_manager.nodes:
+        body += '\n**Lavalink Stats ({}):**\n'.format(node.name)
+        if (stats := node.stats) and not stats.is_fake:
+            body += 'Uptime: `{}`\nPlayers: `{} ({} playing)`\nMemory: `{} MB ({}%)`\n \
+                Lavalink load: `{}%`\nSystem load: `{}%`\nFrames sent: `{}`\n'.format(
+                    format_time(stats.uptime, "d"), 
+                    stats.players, stats.playing_players,
+                    round(stats.memory_used/1e6), round(100*stats.memory_used/stats.memory_allocated),
+                    round(stats.lavalink_load*100, 2), round(stats.system_load*100, 2), stats.frames_sent)
+        else:
+            body += 'No stats available' + '\n'
 
-    await ctx.respond(embed=hikari.Embed(
-        title = '📊 Lavalink Stats', description = body))
+    cache = track_cache.stats()
+    body += '\n**Track Cache:**\nEntries: `{} ({} KB)`\nHits: `{}`\nMisses: `{}`\nEvictions: `{}`\n'.format(
+        cache['entries'], round(cache['bytes']/1e3), cache['hits'], cache['misses'], cache['evictions'])
+
+    autocomplete = autocomplete_engine.stats()
+    body += '\n**Autocomplete:**\nRequests: `{} ({} lookups, {} hits)`\nBudget misses: `{} ({} served stale)`\n'.format(
+        autocomplete['requests'], autocomplete['lookups'], autocomplete['hits'],
+        autocomplete['budget_misses'], autocomplete['stale_served'])
+
+    store = track_store.stats()
+    body += '\n**Track Store:**\nCached: `{} ({} pending writes)`\nHits: `{}`\nMisses: `{}`\n'.format(
+        store['cached'], store['pending'], store['hits'], store['misses'])
+
+    playing = now_playing.stats()
+    body += '\n**Now Playing:**\nTracks: `{}`\nREST calls: `{} ({} per track)`\n'.format(
+        playing['tracks'], playing['rest_calls'], playing['rest_per_track'])
+
+    progress = live_progress.stats()
+    body += '\n**Live Progress:**\nPlayers: `{} ({} due)`\nEdits: `{} ({} skipped)`\n'.format(
+        progress['players'], progress['due'], progress['edits'], progress['skipped'])
+
+    dispatch = dispatcher.stats()
+    body += '\n**Dispatcher:**\nQueued: `{} ({} running)`\nSent: `{} ({} coalesced, {} superseded)`\nWait: `{} ms interaction, {} ms edit`\n'.format(
+        dispatch['depth'], dispatch['running'], dispatch['executed'], dispatch['coalesced'], dispatch['superseded'],
+        dispatch['wait_ms']['interaction'], dispatch['wait_ms']['edit'])
+
+    snapshots = player_snapshots.stats()
+    body += '\n**Snapshots:**\nGuilds: `{}`\nWrites: `{}`\nRestored: `{} ({} failed)`\n'.format(
+        snapshots['guilds'], snapshots['writes'], snapshots['restored'], snapshots['failed'])
+
+    history = history_spill.stats()
+    body += '\n**History:**\nSpilled: `{} ({} pending)`\nRead back: `{}`\n'.format(
+        history['spilled'], history['pending'], history['read_back'])
+
+    failover = node_failover.stats()
+    body += '\n**Failover:**\nMoved: `{} ({} failed, last move {} ms)`\nDraining: `{}`\n'.format(
+        failover['moved'], failover['failed'], failover['last_ms'], ', '.join(failover['draining']) or 'none')
+
+    plays = play_analytics.stats()
+    body += '\n**Plays:**\nPlays: `{} ({} guilds, {} playing)`\nListened: `{} hours ({:.0%} skipped)`\n'.format(
+        plays['plays'], plays['guilds'], plays['playing'], plays['hours'], plays['skip_rate'])
+
+    tracing = tracer.stats()
+    body += '\n**Tracing:**\nTraces: `{} ({} sampled, {} dropped)`\n'.format(
+        tracing['traces'], tracing['sampled'], tracing['dropped'])
+
+    logs = log_pipeline.stats()
+    body += '\n**Logging:**\nRecords: `{} ({} batches, {} dropped)`\n'.format(
+        logs['written'], logs['batches'], logs['dropped'])
+
+    if totals := await coordinator.totals():
+        body += '\n**Workers:**\nWorkers: `{}`\nGuilds: `{}`\nPlayers: `{} ({} playing)`\nSearch cache: `{} hits, {} misses`\n'.format(
+            totals['workers'], totals.get('guilds', 0), totals.get('players', 0), totals.get('playing', 0),
+            totals.get('cache_hits', 0), totals.get('cache_misses', 0))
+
+    await respond(ctx, embed=hikari.Embed(
+        title = '📊 Lavalink Stats', description = body[:4096]))
 
 
 @plugin.command()
@@ -40,16 +115,42 @@ async def info(ctx: lightbulb.Context) -> None:
     """Display lavalink info."""
 
     node_manager = plugin.bot.d.lavalink.node_manager
-    if nodes := node_manager.nodes:
-        body = ''
-        info = await nodes[0].get_info()
+    body = ''
+    for node in node_manager.nodes:
+        body += '**{}:**\n'.format(node.name)
+        try:
+            info = await node_health.timed(node, node.get_info(), 'info')
+        except Exception as e:
+            body += 'Unreachable: `{}`\n'.format(e.__class__.__name__)
+            continue
         for item in info:
             body += '- {}: `{}`\n'.format(item, info[item])
-    else:
+    if not body:
         body = 'No info available\n' 
 
-    await ctx.respond(embed=hikari.Embed(
-        title = '📊 Lavalink Info',description = body))
+    await respond(ctx, embed=hikari.Embed(
+        title = '📊 Lavalink Info',description = body[:4096]))
+
+@plugin.command()
+@lightbulb.add_checks(lightbulb.owner_only)
+@lightbulb.option('undo', 'Accept players on the node again', type=bool, default=False)
+@lightbulb.option('node', 'Node to drain', choices=[node['name'] for node in LAVALINK_NODES], required=True)
+@lightbulb.command('drain', 'Move all players off a lavalink node')
+@lightbulb.implements(lightbulb.SlashCommand)
+async def drain(ctx: lightbulb.Context) -> None:
+    """Move all players off a lavalink node, e.g. before upgrading it."""
+
+    node_manager = plugin.bot.d.lavalink.node_manager
+    node = next(node for node in node_manager.nodes if node.name == ctx.options.node)
+    if ctx.options.undo:
+        node_failover.undrain(node)
+        await respond(ctx, f'Node `{node.name}` accepts players again', flags=hikari.MessageFlag.EPHEMERAL)
+        return
+
+    players = len(node.players)
+    await respond(ctx, hikari.ResponseType.DEFERRED_MESSAGE_CREATE, flags=hikari.MessageFlag.EPHEMERAL)
+    moved = await node_failover.drain(node_manager, node)
+    await ctx.edit_last_response(f'Node `{node.name}` drained: moved `{moved}/{players}` players')
 
 def load(bot: lightbulb.BotApp) -> None:
     bot.add_plugin(plugin)
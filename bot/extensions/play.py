@@ -4,14 +4,21 @@ import lightbulb
 
 from bot.library.checks import valid_user_voice
 from bot.library.base import _play, _get_tracks
+from bot.library.dispatch import respond
+from bot.library.autocomplete import autocomplete_engine
+from bot.library.index import track_index, SEARCH_WEIGHT
+from bot.library.store import track_store
+from bot.library.health import node_health
+from bot.library.tracing import span, traced
 from bot.library.classes.choice import AutocompleteChoice
-from bot.library.classes.lavasearch import LavasearchResult
 from bot.library.classes.sources import Source, Spotify, Deezer, YouTube
 from bot.utils import trim
 
 DELETE_AFTER = 60
 SOURCES = [Spotify, Deezer, YouTube]
 QUERY_TYPES = ['track', 'artist', 'playlist', 'album']
+LOCAL_CHOICES = 5
+MAX_CHOICES = 25    # Discord limit
 
 plugin = lightbulb.Plugin('Play', 'Commands to play music')
 
@@ -22,12 +29,36 @@ def play_checks_options(func: lightbulb.decorators.CommandCallbackT) -> lightbul
     func = lightbulb.option('shuffle', 'Disable playlist shuffle', choices=['False'], default='True')(func)
     return func
 
+def local_choices(query: str, types: str = None, source: Source = YouTube):
+    """Track choices from the local index, no Lavalink round-trip"""
+
+    if types not in (None, 'track'):
+        return []
+    template = '🎬 {} [{}]' if source == YouTube else '🎵 {} - {}'
+    return [AutocompleteChoice(template.format(trim(track.title, 60), trim(track.author, 20)), track.uri)
+        for track in track_index.search(query, source.source_name, LOCAL_CHOICES)]
+
+def merge_choices(*choice_lists):
+
+    seen, merged = set(), []
+    for choices in choice_lists:
+        for choice in choices:
+            if choice.value not in seen:
+                seen.add(choice.value)
+                merged.append(choice)
+    return merged[:MAX_CHOICES]
+
+@traced('get_choices')
 async def get_choices(lavalink: lavalink.Client, query: str = None, types: str = None, source: Source = YouTube):
 
         if source == YouTube:
             result: lavalink.LoadResult = await _get_tracks(lavalink, query, YouTube)
-            return [AutocompleteChoice('🎬 {} [{}]'.format(trim(track.title, 60), trim(track.author, 20)), track.uri) for track in result.tracks[:20]]
+            for track in result.tracks[:20]:
+                track_index.add(track.title, track.author, track.uri, track.source_name, SEARCH_WEIGHT)
+            return merge_choices(local_choices(query, types, source),
+                [AutocompleteChoice('🎬 {} [{}]'.format(trim(track.title, 60), trim(track.author, 20)), track.uri) for track in result.tracks[:20]])
 
+        local = local_choices(query, types, source)
         if types:
             num_choices = 20
         else:
@@ -36,15 +67,13 @@ async def get_choices(lavalink: lavalink.Client, query: str = None, types: str =
 
         query = f'{source.search_prefix}:{query}'
         node = lavalink.node_manager.find_ideal_node()
-        json = await node._transport._request(
-            method='GET',
-            path='loadsearch',
-            params={'query': query, 'types': types or 'track,artist,playlist,album'}
-        )
-        result = LavasearchResult.from_dict(json if isinstance(json, dict) else None)
+        result = await node_health.timed(node,
+            plugin.bot.d.lavasearch.search(node.name, query, types, limit=num_choices), 'loadsearch')
         choices = []
 
+        track_store.put_many(result.tracks[:num_choices])
         for track in result.tracks[:num_choices]:
+            track_index.add(track.title, track.author, track.uri, track.source_name, SEARCH_WEIGHT)
             option = f'🎵 {trim(track.title, 60)} - {trim(track.author, 20)}'
             choices.append(AutocompleteChoice(name=option, value=track.uri))
 
@@ -60,7 +89,7 @@ async def get_choices(lavalink: lavalink.Client, query: str = None, types: str =
             option = f'💿 {trim(item.title, 60)} - {trim(item.author, 20)} 🎤'
             choices.append(AutocompleteChoice(name=option, value=item.uri))
 
-        return choices
+        return merge_choices(local, choices)
 
 async def query_autocomplete(option, interaction):
    
@@ -70,34 +99,41 @@ async def query_autocomplete(option, interaction):
     
     type_option = next(filter(lambda opt: opt.name == 'type', interaction.options), None)
     query_type = type_option.value if type_option else None
-    
-    for opt in interaction.options:
-        name, value = opt.name, opt.value
-        if name != 'source' and not query_type:
-            continue
-        if query_type or value in (Deezer.display_name, Spotify.display_name):
-            source = Deezer if value == Deezer.display_name else Spotify
-            return await get_choices(plugin.bot.d.lavalink, query, query_type, source)
+    source_option = next(filter(lambda opt: opt.name == 'source', interaction.options), None)
+    source_name = source_option.value if source_option else None
 
-    return await get_choices(plugin.bot.d.lavalink, query, YouTube)
+    if source_name == Deezer.display_name:
+        source = Deezer
+    elif source_name == Spotify.display_name or query_type:
+        source = Spotify
+    else:
+        source = YouTube
+
+    # one pending lookup per user, shared between users typing the same query
+    user_key = (interaction.user.id, interaction.command_name, option.name)
+    query_key = (source.source_name, query_type, ' '.join(query.split()).casefold())
+    return await autocomplete_engine.complete(user_key, query_key,
+        lambda: get_choices(plugin.bot.d.lavalink, query, query_type, source),
+        lambda: local_choices(query, query_type, source))
 
 async def handle_play(ctx: lightbulb.Context) -> None:
     
-    result = await _get_tracks(lavalink=plugin.bot.d.lavalink, query=ctx.options.query)
-    embed: hikari.Embed = await _play(
-        bot=plugin.bot, 
-        result=result, 
-        guild_id=ctx.guild_id,
-        author_id=ctx.author.id, 
-        text_channel=ctx.channel_id,
-        play_next=eval(ctx.options.next), 
-        loop=eval(ctx.options.loop),
-        shuffle=eval(ctx.options.shuffle)
-    )
-    if embed:
-        await ctx.respond(embed=embed, delete_after=DELETE_AFTER)
-    else:
-        await ctx.respond('No result for query!', flags=hikari.MessageFlag.EPHEMERAL)
+    with span(f'/{ctx.command.name}', guild=ctx.guild_id):
+        result = await _get_tracks(lavalink=plugin.bot.d.lavalink, query=ctx.options.query)
+        embed: hikari.Embed = await _play(
+            bot=plugin.bot, 
+            result=result, 
+            guild_id=ctx.guild_id,
+            author_id=ctx.author.id, 
+            text_channel=ctx.channel_id,
+            play_next=eval(ctx.options.next), 
+            loop=eval(ctx.options.loop),
+            shuffle=eval(ctx.options.shuffle)
+        )
+        if embed:
+            await respond(ctx, embed=embed, delete_after=DELETE_AFTER)
+        else:
+            await respond(ctx, 'No result for query!', flags=hikari.MessageFlag.EPHEMERAL)
 
 @plugin.command()
 @play_checks_options
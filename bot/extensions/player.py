@@ -6,6 +6,8 @@ import lavalink
 import lightbulb
 
 from bot.library.checks import valid_user_voice, player_playing, player_connected
+from bot.library.dispatch import respond
+from bot.library.progress import live_progress
 from bot.constants import EFFECT_NIGHTCORE, EFFECT_BASS_BOOST
 
 DELETE_AFTER = 60
@@ -23,7 +25,7 @@ async def skip(ctx: lightbulb.Context) -> None:
     player = plugin.bot.d.lavalink.player_manager.get(ctx.guild_id)
     prev_track = await player.skip()
 
-    await ctx.respond(embed=hikari.Embed(
+    await respond(ctx, embed=hikari.Embed(
             description = f'⏭️ Track skipped: [{prev_track.title}]({prev_track.uri})'),
         delete_after=DELETE_AFTER)
     logging.info('Track skipped on guild: %s', ctx.guild_id)
@@ -41,7 +43,7 @@ async def pause(ctx: lightbulb.Context) -> None:
     player = plugin.bot.d.lavalink.player_manager.get(ctx.guild_id)
     await player.set_pause(True)
 
-    await ctx.respond(embed=hikari.Embed(
+    await respond(ctx, embed=hikari.Embed(
         description = '⏸️ Paused player'), delete_after=DELETE_AFTER)
     logging.info('Track paused on guild: %s', ctx.guild_id)
 
@@ -58,7 +60,7 @@ async def resume(ctx: lightbulb.Context) -> None:
     player = plugin.bot.d.lavalink.player_manager.get(ctx.guild_id)
     await player.set_pause(False)
 
-    await ctx.respond(embed=hikari.Embed(
+    await respond(ctx, embed=hikari.Embed(
         description = '▶️ Resumed player'), delete_after=DELETE_AFTER)
     logging.info('Track resumed on guild: %s', ctx.guild_id)
 
@@ -75,7 +77,7 @@ async def stop(ctx: lightbulb.Context) -> None:
     player = plugin.bot.d.lavalink.player_manager.get(ctx.guild_id)
     await player.stop()
 
-    await ctx.respond(embed=hikari.Embed(
+    await respond(ctx, embed=hikari.Embed(
         description = '⏹️ Stopped playing'), delete_after=DELETE_AFTER)
     logging.info('Player stopped on guild: %s', ctx.guild_id)
 
@@ -91,10 +93,10 @@ async def restart(ctx : lightbulb.Context) -> None:
 
     player = plugin.bot.d.lavalink.player_manager.get(ctx.guild_id)
     if not player.current.is_seekable:
-        await ctx.respond('Current track is not seekable!', flags=hikari.MessageFlag.EPHEMERAL)
+        await respond(ctx, 'Current track is not seekable!', flags=hikari.MessageFlag.EPHEMERAL)
         return
     await player.seek(0)
-    await ctx.respond(embed=hikari.Embed(
+    await respond(ctx, embed=hikari.Embed(
         description = '⏪ Track restarted!'), delete_after=DELETE_AFTER)
 
 
@@ -110,7 +112,7 @@ async def seek(ctx : lightbulb.Context) -> None:
 
     player = plugin.bot.d.lavalink.player_manager.get(ctx.guild_id)
     if not player.current.is_seekable:
-        await ctx.respond('Current track is not seekable!', flags=hikari.MessageFlag.EPHEMERAL)
+        await respond(ctx, 'Current track is not seekable!', flags=hikari.MessageFlag.EPHEMERAL)
         return
     
     def parse_duration(position: str):
@@ -122,11 +124,11 @@ async def seek(ctx : lightbulb.Context) -> None:
         return list(int(x) for x in position.split(':'))
     
     if not (parsed := parse_duration(ctx.options.position)):
-        await ctx.respond('Invalid position!', flags=hikari.MessageFlag.EPHEMERAL)
+        await respond(ctx, 'Invalid position!', flags=hikari.MessageFlag.EPHEMERAL)
         return
     
     await player.seek(parsed[0] * 60 * 1000 + parsed[1] * 1000)
-    await ctx.respond(embed=hikari.Embed(
+    await respond(ctx, embed=hikari.Embed(
         description = f'⏩ Player moved to `{parsed[0]}:{parsed[1]:02}`',
     ), delete_after=DELETE_AFTER)
 
@@ -154,7 +156,7 @@ async def loop(ctx:lightbulb.Context) -> None:
         player.set_loop(0)
         body = '⏭️ Disable loop!'
     
-    await ctx.respond(embed=hikari.Embed(
+    await respond(ctx, embed=hikari.Embed(
         description=body), delete_after=DELETE_AFTER)
 
 
@@ -170,7 +172,7 @@ async def shuffle(ctx:lightbulb.Context) -> None:
     player = plugin.bot.d.lavalink.player_manager.get(ctx.guild_id)
     player.set_shuffle(not player.shuffle)
    
-    await ctx.respond(embed=hikari.Embed(
+    await respond(ctx, embed=hikari.Embed(
         description = '🔀 Shuffle on' if player.shuffle else '🔀 Shuffle off'
         ), delete_after=DELETE_AFTER)
 
@@ -201,15 +203,32 @@ async def effects(ctx : lightbulb.Context) -> None:
             rate=EFFECT_NIGHTCORE['timescale']['rate'],)
     if effect == 'None':
         await player.clear_filters()
-        await ctx.respond(f'Effect cleared')
+        await respond(ctx, f'Effect cleared')
         return
     
     await player.set_filter(equalizer)
     await player.set_filter(timescale)
-    await ctx.respond(embed=hikari.Embed(
+    await respond(ctx, embed=hikari.Embed(
         description = f'Effect added: `{effect}`'), delete_after=DELETE_AFTER)
     logging.info('`%s` added to player on guild: %s', effect, ctx.guild_id)
 
+@plugin.command()
+@lightbulb.add_checks(
+    lightbulb.guild_only, valid_user_voice, player_playing,
+)
+@lightbulb.command('progress', 'Toggle the live progress bar on the player message')
+@lightbulb.implements(lightbulb.SlashCommand)
+async def progress(ctx: lightbulb.Context) -> None:
+    """Toggle live progress updates of the player message"""
+
+    player = plugin.bot.d.lavalink.player_manager.get(ctx.guild_id)
+    player.live_progress = not player.live_progress
+    live_progress.arm(player)
+
+    await respond(ctx, embed=hikari.Embed(
+        description = 'Live progress {}'.format('on' if player.live_progress else 'off')), delete_after=DELETE_AFTER)
+    logging.info('Live progress %s on guild: %s', 'enabled' if player.live_progress else 'disabled', ctx.guild_id)
+
 def load(bot: lightbulb.BotApp) -> None:
     bot.add_plugin(plugin)
 
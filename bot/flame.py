@@ -0,0 +1,107 @@
+"""
+Offline breakdown of sampled traces: `python -m bot.flame logs/traces*.jsonl`
+
+For every root span (`/play`, `get_choices`, ...) prints a tree of its
+span paths with the time spent in each, averaged over the traces around
+the median and over the slowest percent. `--folded` prints the self time
+of every path in microseconds as folded stacks for flamegraph tools.
+"""
+import sys
+import json
+import argparse
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+BAR_WIDTH = 30
+MEDIAN_BAND = (0.4, 0.6)    # share of traces, by duration, averaged for the p50 column
+TAIL = 0.99                 # traces from this percentile on are averaged for the p99 column
+
+def read_traces(paths: Iterable[str]) -> List[dict]:
+
+    traces = []
+    for path in paths:
+        with open(path, encoding='utf-8') as file:
+            for number, line in enumerate(file, 1):
+                try:
+                    traces.append(json.loads(line))
+                except ValueError:
+                    print(f'{path}:{number}: skipped malformed line', file=sys.stderr)
+    return traces
+
+def span_times(trace: dict) -> Tuple[Dict[str, float], Dict[str, float]]:
+    """Total and self ms per span path (`root;child;...`), repeated spans on a path are summed"""
+
+    spans = trace['spans']
+    paths, total, own = [], defaultdict(float), defaultdict(float)
+    for span in spans:
+        parent = span['parent']
+        paths.append(span['name'] if parent is None else f'{paths[parent]};{span["name"]}')
+        ms = span['ms'] if span['ms'] is not None else trace['ms'] - span['start']     # outlived its trace
+        total[paths[-1]] += ms
+        own[paths[-1]] += ms
+        if parent is not None:
+            own[paths[parent]] -= ms
+    return total, own
+
+def percentile(values: List[float], q: float) -> float:
+    return values[min(int(q * len(values)), len(values) - 1)] if values else 0.0
+
+def average(traces: List[dict], index: int = 0) -> Dict[str, float]:
+    """Mean time per span path over `traces`, paths missing from a trace count as 0"""
+
+    sums = defaultdict(float)
+    for trace in traces:
+        for path, ms in span_times(trace)[index].items():
+            sums[path] += ms
+    return {path: ms / len(traces) for path, ms in sums.items()} if traces else {}
+
+def breakdown(name: str, traces: List[dict]) -> List[str]:
+
+    traces = sorted(traces, key=lambda trace: trace['ms'])
+    durations = [trace['ms'] for trace in traces]
+    count = len(traces)
+    median = traces[int(MEDIAN_BAND[0] * count):max(int(MEDIAN_BAND[1] * count), int(MEDIAN_BAND[0] * count) + 1)]
+    tail = traces[min(int(TAIL * count), count - 1):]
+    p50, p99 = average(median), average(tail)
+    scale = max(p99.get(name, 0.0), 1e-9)
+
+    lines = [f'{name}  n={count}  p50 {percentile(durations, 0.5):.1f} ms  p99 {percentile(durations, TAIL):.1f} ms',
+        f'  {"p50 ms":>9} {"p99 ms":>9}  {"":{BAR_WIDTH}}  span']
+    order = {path: index for index, path in enumerate({**p50, **p99})}    # first seen, roughly start order
+    prefixes = lambda path: [order.get(';'.join(path.split(';')[:end]), 0) for end in range(1, path.count(';') + 2)]
+    for path in sorted(order, key=prefixes):
+        depth = path.count(';')
+        bar = '█' * round(BAR_WIDTH * p99.get(path, 0.0) / scale)
+        lines.append(f'  {p50.get(path, 0.0):9.1f} {p99.get(path, 0.0):9.1f}  {bar:{BAR_WIDTH}}  '
+            f'{"  " * depth}{path.rsplit(";", 1)[-1]}')
+    return lines
+
+def folded(traces: List[dict]) -> List[str]:
+
+    own = defaultdict(float)
+    for trace in traces:
+        for path, ms in span_times(trace)[1].items():
+            own[path] += ms
+    return [f'{path} {round(ms * 1000)}' for path, ms in sorted(own.items()) if ms > 0]
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(prog='python -m bot.flame', description='Where sampled trace time goes')
+    parser.add_argument('paths', nargs='+', help='trace files written by the bot')
+    parser.add_argument('--root', help='only traces of this root span, e.g. /play')
+    parser.add_argument('--folded', action='store_true', help='print folded stacks instead of the tree')
+    args = parser.parse_args()
+
+    roots = defaultdict(list)
+    for trace in read_traces(args.paths):
+        if args.root is None or trace['name'] == args.root:
+            roots[trace['name']].append(trace)
+
+    if args.folded:
+        print('\n'.join(line for traces in roots.values() for line in folded(traces)))
+        return
+    for name, traces in sorted(roots.items(), key=lambda root: -len(root[1])):
+        print('\n'.join(breakdown(name, traces)), end='\n\n')
+
+if __name__ == '__main__':
+    main()
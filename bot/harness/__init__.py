@@ -0,0 +1,8 @@
+"""
+Offline harness: `python -m bot.harness`
+
+Runs the bot in-process against a fake Discord gateway and REST API
+(`fake_discord`) and fake Lavalink v4 nodes (`fake_lavalink`), drives slash
+commands through it and reports throughput and latency. No token, network
+or Lavalink JVM is needed.
+"""
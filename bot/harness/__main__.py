@@ -0,0 +1,174 @@
+import os
+import sys
+import asyncio
+import logging
+import argparse
+import tempfile
+from time import perf_counter
+from collections import Counter
+from typing import List, Optional
+
+import hikari
+import miru
+
+from bot.flame import percentile
+from bot.library.metrics import EVENT_SECONDS
+from bot.harness.fake_discord import FakeDiscord
+from bot.harness.fake_lavalink import FakeLavalink
+
+def workdir(path: Optional[str]) -> str:
+    """Runs the bot from a scratch directory, its logs/ and data/ land there instead of the checkout"""
+
+    path = path or tempfile.mkdtemp(prefix='musiccat-harness-')
+    os.makedirs(path, exist_ok=True)
+    # extensions are found by file name under ./bot/extensions, the directory itself must not be a link
+    extensions = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'extensions')
+    os.makedirs(os.path.join(path, 'bot', 'extensions'), exist_ok=True)
+    for name in os.listdir(extensions):
+        if name.endswith('.py') and not os.path.exists(link := os.path.join(path, 'bot', 'extensions', name)):
+            os.symlink(os.path.join(extensions, name), link)
+    os.chdir(path)
+    return path
+
+def quiet_console() -> None:
+    """Keeps the console to warnings, log files still get every record"""
+
+    loggers = [logging.getLogger(), *logging.root.manager.loggerDict.values()]
+    for handler in (handler for logger in loggers for handler in getattr(logger, 'handlers', ())):
+        target = getattr(handler, 'target', handler)
+        if isinstance(target, logging.StreamHandler) and not isinstance(target, logging.FileHandler):
+            handler.setLevel(logging.WARNING)
+
+def report(name: str, latencies: List[Optional[float]], elapsed: float) -> str:
+
+    done = sorted(latency * 1000 for latency in latencies if latency is not None)
+    return '{:<13} {:>6} done {:>4} timed out {:>8.1f}/s   p50 {:>7.1f} ms  p99 {:>7.1f} ms  max {:>7.1f} ms'.format(
+        name, len(done), len(latencies) - len(done), len(done) / elapsed if elapsed else 0.0,
+        percentile(done, 0.5), percentile(done, 0.99), done[-1] if done else 0.0)
+
+async def drive(count: int, concurrency: int, invoke) -> tuple:
+    """Runs `invoke(i)` for `i` in `range(count)` with at most `concurrency` in flight"""
+
+    latencies: List[Optional[float]] = [None] * count
+    indexes = iter(range(count))
+
+    async def worker() -> None:
+        for i in indexes:
+            latencies[i] = await invoke(i)
+
+    start = perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, perf_counter() - start
+
+async def settle(nodes: List[FakeLavalink], timeout: float) -> Optional[float]:
+    """Seconds until the bot handled every track event the nodes sent, `None` if it fell behind for good"""
+
+    histograms = [EVENT_SECONDS.labels(event) for event in ('track_start', 'track_end')]
+    start = perf_counter()
+    while sum(sum(histogram.counts) for histogram in histograms) < sum(sum(node.events.values()) for node in nodes):
+        if perf_counter() - start > timeout:
+            return None
+        await asyncio.sleep(0.01)
+    return perf_counter() - start
+
+async def run(args: argparse.Namespace) -> bool:
+    """Drives the bot and prints the results, `False` if players were left idle with tracks queued"""
+
+    nodes = [FakeLavalink(f'fake-{i + 1}', args.lavalink_latency, args.results, args.playlist_size,
+        args.track_seconds, args.padding) for i in range(args.nodes)]
+    discord = FakeDiscord(args.guilds, args.shards, args.rest_latency, args.voice_latency)
+    for fake in (*nodes, discord):
+        await fake.start()
+
+    os.environ.setdefault('TOKEN', 'harness')
+    from bot import bot as app    # imported once the fakes and the working directory are set up
+
+    app.LAVALINK_NODES = [{'name': node.name, 'host': '127.0.0.1', 'port': node.port} for node in nodes]
+    app.METRICS_PORT = 0
+    app.bot.rest._rest_url = discord.rest_url
+    app.bot.unsubscribe(hikari.StartedEvent, app.bot._manage_application_commands)  # command sync is not faked
+    if not args.verbose:
+        quiet_console()
+    miru.install(app.bot)
+
+    start = perf_counter()
+    await app.bot.start(check_for_updates=False)
+    while (len(app.bot.cache.get_available_guilds_view()) < args.guilds
+            or len(app.bot.d.lavalink.node_manager.available_nodes) < args.nodes):
+        await asyncio.sleep(0.01)
+    print(f'Started with {args.guilds} guilds, {args.shards} shards and {args.nodes} nodes '
+        f'in {perf_counter() - start:.2f}s, working in {os.getcwd()}')
+
+    guild_ids = list(discord.guilds)
+
+    async def play(i: int) -> Optional[float]:
+        if i % 100 < args.playlists:
+            query = f'https://www.youtube.com/playlist?list=PL{i % args.distinct:08d}'
+        else:
+            query = f'song {i % args.distinct}'
+        return await discord.invoke(guild_ids[i % len(guild_ids)], 'play', query=query)
+
+    async def search(i: int) -> Optional[float]:
+        return await discord.autocomplete(guild_ids[i % len(guild_ids)], 'search', 'query',
+            f'artist {i % args.distinct}', source='Spotify')
+
+    lines = [report('/play', *await drive(args.commands, args.concurrency, play))]
+    if args.autocomplete:
+        lines.append(report('autocomplete', *await drive(args.autocomplete, args.concurrency, search)))
+
+    settled = await settle(nodes, args.settle_timeout)
+    events = sum((node.events for node in nodes), start=Counter())
+    lines.append('track events: {} sent, {}'.format(
+        ', '.join(f'{kind} {count}' for kind, count in sorted(events.items())),
+        'not all handled' if settled is None else f'all handled {settled:.2f}s after the last command'))
+
+    players = app.bot.d.lavalink.player_manager.players.values()
+    lavalink = sum((node.requests for node in nodes), start=Counter())
+    idle = sum(not player.is_playing and len(player.queue) > 0 for player in players)
+    lines.append(f'players: {len(players)}, playing: {sum(player.is_playing for player in players)}, '
+        f'idle with tracks queued: {idle}')
+    lines.append('lavalink: ' + ', '.join(f'{path} {count}' for path, count in sorted(lavalink.items())))
+    lines.append('discord: ' + ', '.join(f'{route} {count}' for route, count in sorted(discord.requests.items())))
+
+    await app.bot.close()
+    app.bot.d.lavalink.player_manager.players.clear()    # nothing to move off the nodes once the fakes close
+    for node in app.bot.d.lavalink.node_manager:
+        node._transport._destroyed = True     # and no reconnecting
+    for fake in (discord, *nodes):
+        await fake.close()
+    print('\n'.join(lines))
+    return not idle
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(prog='python -m bot.harness',
+        description='Runs the bot offline against fake Discord and Lavalink servers and measures commands')
+    parser.add_argument('--guilds', type=int, default=50)
+    parser.add_argument('--shards', type=int, default=1)
+    parser.add_argument('--nodes', type=int, default=1, help='fake Lavalink nodes')
+    parser.add_argument('--commands', type=int, default=500, help='/play invocations, round robin over guilds')
+    parser.add_argument('--autocomplete', type=int, default=0, help='/search autocomplete requests afterwards')
+    parser.add_argument('--concurrency', type=int, default=20, help='interactions in flight')
+    parser.add_argument('--distinct', type=int, default=100, help='distinct queries, repeats hit the track cache')
+    parser.add_argument('--playlists', type=int, default=0, help='percent of /play loading a playlist URL')
+    parser.add_argument('--lavalink-latency', type=float, default=0.02, help='seconds per Lavalink REST call')
+    parser.add_argument('--rest-latency', type=float, default=0.05, help='seconds per Discord REST call')
+    parser.add_argument('--voice-latency', type=float, default=0.02, help='seconds until the voice server update')
+    parser.add_argument('--results', type=int, default=20, help='tracks per search result')
+    parser.add_argument('--playlist-size', type=int, default=100)
+    parser.add_argument('--padding', type=int, default=0, help='extra bytes per track payload')
+    parser.add_argument('--track-seconds', type=float, default=30, help='until a fake track ends')
+    parser.add_argument('--settle-timeout', type=float, default=60, help='seconds to wait for queued track events')
+    parser.add_argument('--workdir', help='directory for logs/ and data/, a new temporary one by default')
+    parser.add_argument('--verbose', action='store_true', help='print the bot\'s info logs')
+    args = parser.parse_args()
+
+    workdir(args.workdir)
+    try:
+        if not asyncio.run(run(args)):
+            sys.exit(1)
+    except KeyboardInterrupt:
+        sys.exit(130)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+import re
+import json
+import zlib
+import asyncio
+import logging
+from time import perf_counter
+from itertools import count
+from datetime import datetime, timezone
+from collections import Counter
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+BOT_ID = 1_000_000_000_000_000_001
+APPLICATION_ID = BOT_ID
+HEARTBEAT_INTERVAL = 41_250     # ms, as sent by Discord
+JOINED_AT = '2020-01-01T00:00:00+00:00'
+
+def user(user_id: int, name: str, bot: bool = False) -> dict:
+    return {'id': str(user_id), 'username': name, 'discriminator': '0', 'global_name': None, 'avatar': None,
+        'bot': bot}
+
+def member(user_id: int, name: str, bot: bool = False) -> dict:
+    return {'user': user(user_id, name, bot), 'roles': [], 'joined_at': JOINED_AT, 'deaf': False, 'mute': False}
+
+class FakeGuild:
+    """A guild with one voice and one text channel, and one member listening in the voice channel"""
+
+    __slots__ = ('id', 'voice_channel', 'text_channel', 'user_id')
+
+    def __init__(self, guild_id: int) -> None:
+        self.id = guild_id
+        self.voice_channel, self.text_channel = guild_id + 1, guild_id + 2
+        self.user_id = guild_id + 3
+
+    def voice_state(self, user_id: int, channel_id: Optional[int], session_id: str, self_deaf: bool = False) -> dict:
+        return {'guild_id': str(self.id), 'channel_id': None if channel_id is None else str(channel_id),
+            'user_id': str(user_id), 'member': member(user_id, 'MusicCat' if user_id == BOT_ID else 'listener',
+            user_id == BOT_ID), 'session_id': session_id, 'deaf': False, 'mute': False, 'self_deaf': self_deaf,
+            'self_mute': False, 'self_video': False, 'suppress': False, 'request_to_speak_timestamp': None}
+
+    def dump(self) -> dict:
+
+        channel = {'guild_id': str(self.id), 'permission_overwrites': [], 'parent_id': None, 'nsfw': False}
+        return {
+            'id': str(self.id), 'name': f'Guild {self.id}', 'icon': None, 'splash': None, 'discovery_splash': None,
+            'banner': None, 'description': None, 'features': [], 'owner_id': str(self.user_id), 'application_id': None,
+            'afk_channel_id': None, 'afk_timeout': 300, 'verification_level': 0, 'default_message_notifications': 0,
+            'explicit_content_filter': 0, 'mfa_level': 0, 'system_channel_id': None, 'system_channel_flags': 0,
+            'rules_channel_id': None, 'public_updates_channel_id': None, 'vanity_url_code': None, 'premium_tier': 0,
+            'premium_subscription_count': 0, 'preferred_locale': 'en-US', 'nsfw_level': 0, 'widget_enabled': False,
+            'widget_channel_id': None, 'max_video_channel_users': 25, 'large': False, 'unavailable': False,
+            'joined_at': JOINED_AT, 'member_count': 2, 'roles': [], 'emojis': [], 'stickers': [], 'threads': [],
+            'presences': [], 'stage_instances': [], 'guild_scheduled_events': [],
+            'members': [member(self.user_id, 'listener'), member(BOT_ID, 'MusicCat', True)],
+            'voice_states': [self.voice_state(self.user_id, self.voice_channel, f'user-{self.user_id}')],
+            'channels': [
+                dict(channel, id=str(self.voice_channel), type=2, name='Music', position=0, bitrate=64000,
+                    user_limit=0, rtc_region=None),
+                dict(channel, id=str(self.text_channel), type=0, name='general', position=1, topic=None,
+                    rate_limit_per_user=0, last_message_id=None),
+            ],
+        }
+
+class Shard:
+    """One gateway connection, frames are sent as a zlib stream like Discord's `compress=zlib-stream`"""
+
+    __slots__ = ('ws', 'shard_id', 'seq', 'compressor')
+
+    def __init__(self, ws: web.WebSocketResponse) -> None:
+        self.ws = ws
+        self.shard_id = 0
+        self.seq = 0
+        self.compressor = zlib.compressobj()
+
+    async def send(self, op: int, data, event: Optional[str] = None) -> None:
+
+        payload = {'op': op, 'd': data, 's': None, 't': event}
+        if event is not None:
+            self.seq += 1
+            payload['s'] = self.seq
+        frame = self.compressor.compress(json.dumps(payload, separators=(',', ':')).encode())
+        await self.ws.send_bytes(frame + self.compressor.flush(zlib.Z_SYNC_FLUSH))
+
+class FakeDiscord:
+    """
+    Local stand-in for the Discord gateway and REST API.
+
+    Shards identifying on its gateway get `READY` and a `GUILD_CREATE` per
+    guild they own, with a listener already in each guild's voice channel.
+    Voice state updates from the bot are answered with `VOICE_STATE_UPDATE`
+    and, after `voice_latency` seconds, `VOICE_SERVER_UPDATE`. `invoke` and
+    `autocomplete` send `INTERACTION_CREATE` and time the interaction until
+    its callback arrives on the REST API, where every request waits
+    `rest_latency` seconds. Application command sync is not served.
+    """
+
+    def __init__(self, guilds: int = 10, shards: int = 1, rest_latency: float = 0.05,
+            voice_latency: float = 0.02) -> None:
+        self.guilds: Dict[int, FakeGuild] = {}
+        for index in range(guilds):
+            guild = FakeGuild((1 << 22) * (1000 + index))   # shard of a guild is (id >> 22) % shards
+            self.guilds[guild.id] = guild
+        self.shard_count = shards
+        self.rest_latency = rest_latency
+        self.voice_latency = voice_latency
+        self.port = 0
+        self.requests: Counter = Counter()      # route -> count
+
+        self._ids = count(1 << 40)
+        self._shards: Dict[int, Shard] = {}
+        self._pending: Dict[str, asyncio.Future] = {}   # interaction id -> callback
+        self._runner: Optional[web.AppRunner] = None
+        self._routes: List[Tuple[str, re.Pattern, str, Callable[..., Awaitable[web.Response]]]] = [
+            ('GET', re.compile(r'gateway/bot'), 'gateway', self._gateway_bot),
+            ('POST', re.compile(r'interactions/(\d+)/[^/]+/callback'), 'callback', self._callback),
+            ('GET', re.compile(r'webhooks/\d+/[^/]+/messages/@original'), 'original', self._message),
+            ('PATCH', re.compile(r'webhooks/\d+/[^/]+/messages/@original'), 'original', self._message),
+            ('DELETE', re.compile(r'webhooks/\d+/[^/]+/messages/@original'), 'original', self._no_content),
+            ('POST', re.compile(r'channels/(\d+)/messages'), 'message', self._message),
+            ('PATCH', re.compile(r'channels/(\d+)/messages/\d+'), 'message', self._message),
+            ('DELETE', re.compile(r'channels/(\d+)/messages/\d+'), 'message', self._no_content),
+        ]
+
+    @property
+    def rest_url(self) -> str:
+        return f'http://127.0.0.1:{self.port}/api/v10'
+
+    def shard_of(self, guild_id: int) -> int:
+        return (guild_id >> 22) % self.shard_count
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> None:
+
+        app = web.Application()
+        app.router.add_get('/gateway', self._gateway)
+        app.router.add_route('*', '/api/v10/{path:.*}', self._rest)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        for shard in list(self._shards.values()):
+            await shard.ws.close()
+        if self._runner:
+            await self._runner.cleanup()
+
+    async def invoke(self, guild_id: int, command: str, timeout: float = 30, **options) -> Optional[float]:
+        """Runs a slash command as the guild's listener, returns seconds until it was answered or `None`"""
+
+        return await self._interact(guild_id, 2, {'name': command, 'type': 1,
+            'options': [{'name': name, 'type': 3, 'value': value} for name, value in options.items()]}, timeout)
+
+    async def autocomplete(self, guild_id: int, command: str, option: str, value: str, timeout: float = 30,
+            **options) -> Optional[float]:
+
+        data = {'name': command, 'type': 1, 'options': [{'name': option, 'type': 3, 'value': value, 'focused': True}]
+            + [{'name': name, 'type': 3, 'value': text} for name, text in options.items()]}
+        return await self._interact(guild_id, 4, data, timeout)
+
+    async def _interact(self, guild_id: int, kind: int, data: dict, timeout: float) -> Optional[float]:
+
+        guild = self.guilds[guild_id]
+        interaction_id = str(next(self._ids))
+        data['id'] = str(zlib.crc32(data['name'].encode()))   # command id
+        callback = self._pending[interaction_id] = asyncio.get_running_loop().create_future()
+        payload = {
+            'id': interaction_id, 'application_id': str(APPLICATION_ID), 'type': kind, 'data': data,
+            'guild_id': str(guild_id), 'channel_id': str(guild.text_channel), 'token': f'token-{interaction_id}',
+            'version': 1, 'locale': 'en-US', 'guild_locale': 'en-US', 'app_permissions': '0',
+            'member': dict(member(guild.user_id, 'listener'), permissions='0'),
+        }
+        start = perf_counter()
+        try:
+            await self._shards[self.shard_of(guild_id)].send(0, payload, 'INTERACTION_CREATE')
+            await asyncio.wait_for(callback, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self._pending.pop(interaction_id, None)
+        return perf_counter() - start
+
+    async def _gateway(self, request: web.Request) -> web.WebSocketResponse:
+
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        shard = Shard(ws)
+        await shard.send(10, {'heartbeat_interval': HEARTBEAT_INTERVAL})
+        async for message in ws:
+            try:
+                payload = json.loads(message.data)
+                await self._receive(shard, payload['op'], payload['d'])
+            except Exception as e:
+                logging.exception('Fake gateway failed to handle %r: %r', message.data, e)
+        if self._shards.get(shard.shard_id) is shard:
+            del self._shards[shard.shard_id]
+        return ws
+
+    async def _receive(self, shard: Shard, op: int, data) -> None:
+
+        if op == 1:     # heartbeat
+            await shard.send(11, None)
+        elif op == 2:   # identify
+            shard.shard_id = data['shard'][0] if data.get('shard') else 0
+            self._shards[shard.shard_id] = shard
+            guilds = [guild for guild in self.guilds.values() if self.shard_of(guild.id) == shard.shard_id]
+            await shard.send(0, {
+                'v': 10, 'user': dict(user(BOT_ID, 'MusicCat', True), mfa_enabled=False, flags=0, verified=True),
+                'guilds': [{'id': str(guild.id), 'unavailable': True} for guild in guilds],
+                'session_id': f'session-{shard.shard_id}', 'shard': data.get('shard'),
+                'resume_gateway_url': f'ws://127.0.0.1:{self.port}/gateway',
+                'application': {'id': str(APPLICATION_ID), 'flags': 0},
+            }, 'READY')
+            for guild in guilds:
+                await shard.send(0, guild.dump(), 'GUILD_CREATE')
+        elif op == 4:   # voice state update
+            guild = self.guilds[int(data['guild_id'])]
+            channel_id = None if data['channel_id'] is None else int(data['channel_id'])
+            state = guild.voice_state(BOT_ID, channel_id, f'bot-{guild.id}', bool(data.get('self_deaf')))
+            await shard.send(0, state, 'VOICE_STATE_UPDATE')
+            if channel_id is not None:
+                asyncio.get_running_loop().create_task(self._voice_server(shard, guild))
+
+    async def _voice_server(self, shard: Shard, guild: FakeGuild) -> None:
+        await asyncio.sleep(self.voice_latency)
+        await shard.send(0, {'token': f'voice-{guild.id}', 'guild_id': str(guild.id),
+            'endpoint': 'fake.discord.media:443'}, 'VOICE_SERVER_UPDATE')
+
+    async def _rest(self, request: web.Request) -> web.Response:
+
+        path = request.match_info['path']
+        for method, pattern, name, handler in self._routes:
+            if method == request.method and (match := pattern.fullmatch(path)):
+                self.requests[f'{method} {name}'] += 1
+                if self.rest_latency:
+                    await asyncio.sleep(self.rest_latency)
+                return await handler(request, *match.groups())
+        self.requests[f'{request.method} unknown'] += 1
+        logging.warning('Fake Discord has no route for %s /%s', request.method, path)
+        return web.json_response({'message': 'Unknown route', 'code': 0}, status=404)
+
+    async def _gateway_bot(self, request: web.Request) -> web.Response:
+        return web.json_response({'url': f'ws://127.0.0.1:{self.port}/gateway', 'shards': self.shard_count,
+            'session_start_limit': {'total': 1000, 'remaining': 1000, 'reset_after': 0,
+            'max_concurrency': self.shard_count}})
+
+    async def _callback(self, request: web.Request, interaction_id: str) -> web.Response:
+        await request.read()
+        if (callback := self._pending.get(interaction_id)) is not None and not callback.done():
+            callback.set_result(None)
+        return web.Response(status=204)
+
+    async def _message(self, request: web.Request, channel_id: str = None) -> web.Response:
+
+        await request.read()
+        return web.json_response({
+            'id': str(next(self._ids)), 'channel_id': channel_id or '1', 'author': user(BOT_ID, 'MusicCat', True),
+            'content': '', 'timestamp': datetime.now(timezone.utc).isoformat(), 'edited_timestamp': None,
+            'tts': False, 'mention_everyone': False, 'mentions': [], 'mention_roles': [], 'attachments': [],
+            'embeds': [], 'pinned': False, 'type': 0, 'flags': 0,
+        })
+
+    async def _no_content(self, request: web.Request, channel_id: str = None) -> web.Response:
+        return web.Response(status=204)
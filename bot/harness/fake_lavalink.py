@@ -0,0 +1,239 @@
+import json
+import zlib
+import asyncio
+import logging
+from time import time
+from base64 import b64encode, b64decode
+from collections import Counter
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+def make_track(identifier: str, title: str, author: str, length: int, source: str = 'youtube',
+        padding: int = 0) -> dict:
+    """A Lavalink v4 track, the encoded string carries its info so any fake node can decode it"""
+
+    info = {
+        'identifier': identifier, 'isSeekable': True, 'author': author, 'length': length, 'isStream': False,
+        'position': 0, 'title': title, 'uri': f'https://www.youtube.com/watch?v={identifier}', 'sourceName': source,
+        'artworkUrl': f'https://i.ytimg.com/vi/{identifier}/hqdefault.jpg' + '?' * padding, 'isrc': None,
+    }
+    return {'encoded': b64encode(json.dumps(info, separators=(',', ':')).encode()).decode(), 'info': info,
+        'pluginInfo': {}, 'userData': {}}
+
+def decode_track(encoded: str) -> dict:
+    return {'encoded': encoded, 'info': json.loads(b64decode(encoded)), 'pluginInfo': {}, 'userData': {}}
+
+class FakePlayer:
+
+    __slots__ = ('guild_id', 'track', 'position', 'started', 'paused', 'volume', 'filters', 'voice', 'end')
+
+    def __init__(self, guild_id: str) -> None:
+        self.guild_id = guild_id
+        self.track: Optional[dict] = None
+        self.position, self.started, self.paused, self.volume = 0, 0.0, False, 100
+        self.filters, self.voice = {}, {}
+        self.end: Optional[asyncio.TimerHandle] = None
+
+    def elapsed(self) -> int:
+        """Playback position in ms, advancing while a track plays"""
+
+        if self.track is None or self.paused:
+            return self.position
+        return self.position + int((time() - self.started) * 1000)
+
+    def dump(self) -> dict:
+        return {'guildId': self.guild_id, 'track': self.track, 'volume': self.volume, 'paused': self.paused,
+            'state': {'time': int(time() * 1000), 'position': self.elapsed(), 'connected': bool(self.voice),
+            'ping': 0}, 'voice': self.voice, 'filters': self.filters}
+
+class FakeLavalink:
+    """
+    Local stand-in for a Lavalink v4 node with the LavaSearch plugin.
+
+    Serves `loadtracks`, `loadsearch`, `decodetrack(s)`, `info`, `version`
+    and player PATCH/DELETE, and sends `ready`, `stats`, `playerUpdate`
+    and track start/end events on its websocket. Every REST request waits
+    `latency` seconds, searches return `results` tracks, playlists
+    `playlist_size`, and a playing track ends after `track_seconds`.
+    """
+
+    def __init__(self, name: str, latency: float = 0.02, results: int = 20, playlist_size: int = 100,
+            track_seconds: float = 30, padding: int = 0) -> None:
+        self.name = name
+        self.latency = latency
+        self.results = results
+        self.playlist_size = playlist_size
+        self.track_seconds = track_seconds
+        self.padding = padding
+        self.port = 0
+        self.requests: Counter = Counter()      # path -> count
+        self.events: Counter = Counter()        # event type -> sent
+        self.players: Dict[str, FakePlayer] = {}
+
+        self._sockets: Dict[str, web.WebSocketResponse] = {}   # session -> websocket
+        self._sessions = 0
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> None:
+
+        app = web.Application()
+        app.router.add_get('/v4/websocket', self._websocket)
+        app.router.add_get('/version', self._version)
+        app.router.add_get('/v4/info', self._info)
+        app.router.add_get('/v4/loadtracks', self._load_tracks)
+        app.router.add_get('/v4/loadsearch', self._load_search)
+        app.router.add_get('/v4/decodetrack', self._decode_track)
+        app.router.add_post('/v4/decodetracks', self._decode_tracks)
+        app.router.add_patch('/v4/sessions/{session}/players/{guild}', self._update_player)
+        app.router.add_delete('/v4/sessions/{session}/players/{guild}', self._destroy_player)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        for ws in list(self._sockets.values()):
+            await ws.close()
+        for player in self.players.values():
+            if player.end:
+                player.end.cancel()
+        if self._runner:
+            await self._runner.cleanup()
+
+    def tracks(self, query: str, count: int) -> List[dict]:
+        key = zlib.crc32(query.encode()) % 10 ** 8     # same tracks for a query on every run
+        return [make_track(f'{key:08d}{i:03d}', f'{query} {i}', f'Artist {(key + i) % 97}', 180_000 + i * 1000,
+            padding=self.padding) for i in range(count)]
+
+    async def _request(self, path: str) -> None:
+        self.requests[path] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def _websocket(self, request: web.Request) -> web.WebSocketResponse:
+
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self._sessions += 1
+        session = f'{self.name}-{self._sessions}'
+        self._sockets[session] = ws
+        await ws.send_json({'op': 'ready', 'resumed': False, 'sessionId': session})
+        await ws.send_json({'op': 'stats', 'players': 0, 'playingPlayers': 0, 'uptime': 0,
+            'memory': {'free': 1, 'used': 1, 'allocated': 2, 'reservable': 2},
+            'cpu': {'cores': 1, 'systemLoad': 0.0, 'lavalinkLoad': 0.0}, 'frameStats': None})
+        async for _ in ws:
+            pass
+        self._sockets.pop(session, None)
+        return ws
+
+    async def _send(self, session: str, payload: dict) -> None:
+        if (ws := self._sockets.get(session)) is not None and not ws.closed:
+            await ws.send_json(payload)
+            if payload['op'] == 'event':
+                self.events[payload['type']] += 1
+
+    async def _version(self, request: web.Request) -> web.Response:
+        await self._request('version')
+        return web.Response(text='4.0.0')
+
+    async def _info(self, request: web.Request) -> web.Response:
+        await self._request('info')
+        return web.json_response({'version': {'semver': '4.0.0'}, 'buildTime': 0, 'git': {}, 'jvm': 'fake',
+            'lavaplayer': 'fake', 'sourceManagers': ['youtube'], 'filters': [], 'plugins': [{'name': 'lavasearch'}]})
+
+    async def _load_tracks(self, request: web.Request) -> web.Response:
+
+        await self._request('loadtracks')
+        identifier = request.query['identifier']
+        prefix, _, query = identifier.partition(':')
+        if not identifier.startswith('http'):
+            data = {'loadType': 'search', 'data': self.tracks(query or prefix, self.results)}
+        elif 'list=' in identifier:
+            data = {'loadType': 'playlist', 'data': {'info': {'name': 'Fake playlist', 'selectedTrack': -1},
+                'pluginInfo': {}, 'tracks': self.tracks(identifier, self.playlist_size)}}
+        else:
+            data = {'loadType': 'track', 'data': self.tracks(identifier, 1)[0]}
+        return web.json_response(data)
+
+    async def _load_search(self, request: web.Request) -> web.Response:
+
+        await self._request('loadsearch')
+        query = request.query['query'].partition(':')[2]
+        types = request.query.get('types') or 'track'
+        count = min(self.results, 20)
+
+        def item(kind: str, i: int) -> dict:
+            return {'info': {'name': f'{query} {kind} {i}', 'selectedTrack': -1}, 'pluginInfo': {'type': kind,
+                'url': f'https://open.spotify.com/{kind}/{i}', 'artworkUrl': None, 'author': f'Artist {i}',
+                'totalTracks': 10}, 'tracks': []}
+
+        return web.json_response({
+            'tracks': self.tracks(query, count) if 'track' in types else [],
+            'albums': [item('album', i) for i in range(count)] if 'album' in types else [],
+            'artists': [item('artist', i) for i in range(count)] if 'artist' in types else [],
+            'playlists': [item('playlist', i) for i in range(count)] if 'playlist' in types else [],
+            'texts': [],
+        })
+
+    async def _decode_track(self, request: web.Request) -> web.Response:
+        await self._request('decodetrack')
+        return web.json_response(decode_track(request.query['track']))
+
+    async def _decode_tracks(self, request: web.Request) -> web.Response:
+        await self._request('decodetracks')
+        return web.json_response([decode_track(encoded) for encoded in await request.json()])
+
+    async def _update_player(self, request: web.Request) -> web.Response:
+
+        await self._request('update_player')
+        session, guild_id = request.match_info['session'], request.match_info['guild']
+        body = await request.json()
+        player = self.players.get(guild_id) or self.players.setdefault(guild_id, FakePlayer(guild_id))
+
+        if 'voice' in body:
+            player.voice = body['voice']
+        if 'paused' in body:
+            player.position, player.started, player.paused = player.elapsed(), time(), body['paused']
+        for key in ('volume', 'filters'):
+            if key in body:
+                setattr(player, key, body[key])
+        if 'position' in body:
+            player.position, player.started = body['position'], time()
+        if 'voice' in body or 'position' in body:
+            await self._send(session, {'op': 'playerUpdate', 'guildId': guild_id, 'state': player.dump()['state']})
+
+        if 'track' in body:
+            encoded = body['track'].get('encoded')
+            if player.track is not None:
+                if request.query.get('noReplace') == 'true' and encoded:
+                    return web.json_response(player.dump())
+                self._end(session, player, 'replaced' if encoded else 'stopped')
+            if encoded:
+                player.track, player.started = decode_track(encoded), time()
+                player.position = body.get('position', 0)
+                await self._send(session, {'op': 'event', 'type': 'TrackStartEvent', 'guildId': guild_id,
+                    'track': player.track})
+                player.end = asyncio.get_running_loop().call_later(self.track_seconds, self._end, session, player)
+        return web.json_response(player.dump())
+
+    def _end(self, session: str, player: FakePlayer, reason: str = 'finished') -> None:
+
+        if player.end:
+            player.end.cancel()
+            player.end = None
+        track, player.track = player.track, None
+        if track is None:
+            return
+        task = asyncio.get_running_loop().create_task(self._send(session, {'op': 'event', 'type': 'TrackEndEvent',
+            'guildId': player.guild_id, 'track': track, 'reason': reason}))
+        task.add_done_callback(lambda task: task.cancelled() or task.exception() and logging.error(
+            'Fake node %s failed to send track end: %r', self.name, task.exception()))
+
+    async def _destroy_player(self, request: web.Request) -> web.Response:
+
+        await self._request('destroy_player')
+        if (player := self.players.pop(request.match_info['guild'], None)) is not None and player.end:
+            player.end.cancel()
+        return web.Response(status=204)
@@ -0,0 +1,119 @@
+"""
+Multi-process launcher: `python -O -m bot.launcher`
+
+Starts `WORKERS` bot processes, each owning a contiguous range of the
+`SHARD_COUNT` gateway shards with its own Lavalink client, plus the local
+coordinator they share. Dead workers are restarted with a backoff.
+"""
+import os
+import signal
+import asyncio
+import logging
+import multiprocessing
+from time import monotonic
+from typing import Dict, List
+
+import hikari
+
+from bot.config import SHARD_COUNT, WORKERS, COORDINATOR_PATH
+from bot.library.coordinator import Coordinator
+
+RESTART_BACKOFF = (1, 60)   # seconds before restarting a worker, doubled up to the max while it keeps dying
+
+def shard_ranges(shard_count: int, workers: int) -> List[List[int]]:
+    """Contiguous shard ids per worker, sizes differ by at most one"""
+
+    workers = max(min(workers, shard_count), 1)
+    size, extra = divmod(shard_count, workers)
+    ranges, start = [], 0
+    for worker in range(workers):
+        end = start + size + (worker < extra)
+        ranges.append(list(range(start, end)))
+        start = end
+    return ranges
+
+async def recommended_shards(token: str) -> int:
+    async with hikari.RESTApp().acquire(token, hikari.TokenType.BOT) as rest:
+        return (await rest.fetch_gateway_bot_info()).shard_count
+
+def run_worker(worker_id: int, shard_ids: List[int], shard_count: int, path: str) -> None:
+    """Entry point of a worker process"""
+
+    os.environ.update(WORKER_ID=str(worker_id), SHARD_IDS=','.join(map(str, shard_ids)),
+        SHARD_COUNT=str(shard_count), COORDINATOR_PATH=path)
+    from bot import bot     # imported here, every worker builds its own bot
+    bot.run()
+
+class Launcher:
+
+    def __init__(self, shard_count: int, workers: int, path: str = COORDINATOR_PATH) -> None:
+        self.shard_count = shard_count
+        self.ranges = shard_ranges(shard_count, workers)
+        self.coordinator = Coordinator(path)
+        self._context = multiprocessing.get_context('spawn')
+        self._processes: Dict[int, multiprocessing.Process] = {}
+        self._backoff: Dict[int, float] = {}
+        self._started: Dict[int, float] = {}
+        self._stopping = asyncio.Event()
+
+    def spawn(self, worker: int) -> None:
+
+        process = self._context.Process(target=run_worker, name=f'musiccat-worker-{worker}', daemon=False,
+            args=(worker, self.ranges[worker], self.shard_count, self.coordinator.path))
+        process.start()
+        self._processes[worker], self._started[worker] = process, monotonic()
+        logging.info('Worker %d started (pid %d) with shards %s', worker, process.pid, self.ranges[worker])
+
+    async def run(self) -> None:
+
+        await self.coordinator.start()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self._stopping.set)
+        for worker in range(len(self.ranges)):
+            self.spawn(worker)
+
+        try:
+            while not self._stopping.is_set():
+                await self.supervise()
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), 1)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            await self.stop()
+
+    async def supervise(self) -> None:
+        """Restarts dead workers, the backoff resets once a worker stays up"""
+
+        for worker, process in list(self._processes.items()):
+            if process.is_alive():
+                if monotonic() - self._started[worker] > RESTART_BACKOFF[1]:
+                    self._backoff.pop(worker, None)
+                continue
+            delay = self._backoff.get(worker, RESTART_BACKOFF[0])
+            logging.error('Worker %d exited with code %s, restarting in %ds', worker, process.exitcode, delay)
+            self._backoff[worker] = min(delay * 2, RESTART_BACKOFF[1])
+            del self._processes[worker]
+            loop = asyncio.get_running_loop()
+            loop.call_later(delay, lambda worker=worker: self._stopping.is_set() or self.spawn(worker))
+
+    async def stop(self) -> None:
+
+        for process in self._processes.values():
+            process.terminate()     # SIGTERM, the bot closes its players and snapshots
+        for process in self._processes.values():
+            await asyncio.to_thread(process.join, 30)
+            if process.is_alive():
+                process.kill()
+        await self.coordinator.close()
+
+async def main() -> None:
+
+    logging.basicConfig(level=logging.INFO)
+    shard_count = int(os.environ.get('SHARD_COUNT', SHARD_COUNT)) or await recommended_shards(os.environ['TOKEN'])
+    workers = int(os.environ.get('WORKERS', WORKERS)) or os.cpu_count() or 1
+    await Launcher(shard_count, workers).run()
+
+if __name__ == '__main__':
+    asyncio.run(main())
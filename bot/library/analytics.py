@@ -0,0 +1,315 @@
+import os
+import re
+import gzip
+import json
+import shutil
+import asyncio
+import logging
+from time import time
+from heapq import nlargest
+from operator import itemgetter
+from typing import Dict, List, Optional, Tuple
+
+from lavalink import EndReason
+
+from bot.config import PLAY_LOG_PATH, PLAY_LOG_ROLLOVER, PLAY_LOG_FLUSH, PLAY_TOP_CAPACITY, PLAY_TOP_TOTAL_CAPACITY
+
+SKIP_REASONS = ('stopped', 'replaced')
+
+class TopCounter:
+    """
+    Space-saving counter of the most played keys in bounded memory.
+
+    Keeps at most `capacity` keys, a new key replaces the least counted one
+    and inherits its count. Counts are exact while fewer keys were seen,
+    after that only keys played rarely can be over-counted.
+    """
+
+    __slots__ = ('capacity', 'counts', 'labels', '_lowest', '_lowest_count')
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+        self.labels: Dict[str, str] = {}   # key -> display name, when it differs from the key
+        self._lowest: List[str] = []        # keys that had the lowest count on the last scan
+        self._lowest_count = 0
+
+    def add(self, key: str, label: Optional[str] = None) -> None:
+
+        counts = self.counts
+        if key in counts:
+            counts[key] += 1
+        elif len(counts) < self.capacity:
+            counts[key] = 1
+        else:
+            evicted = self._evict()
+            counts[key] = counts.pop(evicted) + 1
+            self.labels.pop(evicted, None)
+        if label is not None:
+            self.labels[key] = label
+
+    def _evict(self) -> str:
+        """A key with the lowest count, rescanning only once all keys of the last scan moved up"""
+
+        # counts never drop below the lowest one, so keys still at it are still the lowest
+        while self._lowest:
+            if self.counts.get(key := self._lowest.pop()) == self._lowest_count:
+                return key
+        self._lowest_count = min(self.counts.values())
+        self._lowest = [key for key, count in self.counts.items() if count == self._lowest_count]
+        return self._lowest.pop()
+
+    def top(self, n: int) -> List[Tuple[str, str, int]]:
+        """`(key, label, count)` of the `n` most counted keys, bounded by the capacity and not by history"""
+        return [(key, self.labels.get(key, key), count)
+            for key, count in nlargest(n, self.counts.items(), key=itemgetter(1))]
+
+    def dump(self) -> list:
+        return [[key, count, self.labels.get(key)] for key, count in self.counts.items()]
+
+    def load(self, entries: list) -> None:
+        for key, count, label in entries:
+            self.counts[key] = count
+            if label is not None:
+                self.labels[key] = label
+
+class PlayStats:
+    """Aggregates of one guild, or of all of them"""
+
+    __slots__ = ('plays', 'skips', 'listened', 'tracks', 'artists')
+
+    def __init__(self, capacity: int) -> None:
+        self.plays, self.skips, self.listened = 0, 0, 0     # listened in ms
+        self.tracks = TopCounter(capacity)
+        self.artists = TopCounter(capacity)
+
+    @property
+    def hours(self) -> float:
+        return self.listened / 3_600_000
+
+    @property
+    def skip_rate(self) -> float:
+        return self.skips / self.plays if self.plays else 0.0
+
+    def add(self, play: dict) -> None:
+
+        self.plays += 1
+        self.skips += play['end'] in SKIP_REASONS
+        self.listened += play['l']
+        self.tracks.add(play['u'], f'{play["ti"]} - {play["a"]}')
+        self.artists.add(play['a'])
+
+    def dump(self) -> list:
+        return [self.plays, self.skips, self.listened, self.tracks.dump(), self.artists.dump()]
+
+    def load(self, state: list) -> None:
+        self.plays, self.skips, self.listened, tracks, artists = state
+        self.tracks.load(tracks)
+        self.artists.load(artists)
+
+class PlayAnalytics:
+    """
+    Append-only play log with incrementally maintained aggregates.
+
+    Every finished play is one compact JSON line: start time `t`, guild `g`,
+    requester `r`, source `s`, encoded track `id` and uri `u`, title `ti`,
+    author `a`, duration `d` and listened `l` in ms, and end reason `end`.
+    Listened time is the time the track played, paused time excluded.
+    Lines are appended in batches; past `rollover` bytes the log is
+    compressed into numbered segments and the aggregates are checkpointed
+    next to it. After a crash the aggregates are rebuilt from the last
+    checkpoint plus the segments and log written after it.
+    """
+
+    def __init__(self, path: str = PLAY_LOG_PATH, rollover: int = PLAY_LOG_ROLLOVER,
+            flush_interval: float = PLAY_LOG_FLUSH, capacity: int = PLAY_TOP_CAPACITY,
+            total_capacity: int = PLAY_TOP_TOTAL_CAPACITY) -> None:
+        self.path = path
+        self.rollover = rollover
+        self.flush_interval = flush_interval
+        self.capacity = capacity
+        self.total = PlayStats(total_capacity)
+        self.guilds: Dict[int, PlayStats] = {}
+        self.segment = 0    # last compressed segment
+
+        self._size = 0
+        self._playing: Dict[int, list] = {}     # guild -> [track, started, paused since or None, paused seconds]
+        self._buffer: List[str] = []
+        self._writing: Optional[asyncio.Future] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def state_path(self) -> str:
+        return f'{os.path.splitext(self.path)[0]}.state.json'
+
+    def segment_path(self, segment: int) -> str:
+        root, ext = os.path.splitext(self.path)
+        return f'{root}.{segment:06d}{ext}'
+
+    async def open(self) -> None:
+        """Rebuilds the aggregates from the checkpoint and the log, then starts appending"""
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        replayed = await asyncio.to_thread(self._rebuild)
+        logging.info('Play analytics rebuilt with %d plays, %d replayed from the log', self.total.plays, replayed)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.wait({self._task})
+            self._task = None
+        await self.flush()
+
+    def guild(self, guild_id: int) -> PlayStats:
+        return self.guilds.get(guild_id) or PlayStats(0)
+
+    def start(self, guild_id: int, track, paused: bool = False) -> None:
+        """Opens a play when a track starts, closing the previous one if its end was missed"""
+
+        if (playing := self._playing.get(guild_id)) is not None:
+            if playing[0] is track:     # restarted on another node
+                return
+            self.end(guild_id, EndReason.REPLACED)
+        now = time()
+        self._playing[guild_id] = [track, now, now if paused else None, 0.0]
+
+    def pause(self, guild_id: int, paused: bool) -> None:
+        """Starts or stops a paused interval of the current play"""
+
+        if (playing := self._playing.get(guild_id)) is None:
+            return
+        if paused and playing[2] is None:
+            playing[2] = time()
+        elif not paused and playing[2] is not None:
+            playing[3] += time() - playing[2]
+            playing[2] = None
+
+    def end(self, guild_id: int, reason: EndReason) -> None:
+
+        if (playing := self._playing.pop(guild_id, None)) is None:
+            return
+        track, started, paused_since, paused = playing
+        now = time()
+        if paused_since is not None:
+            paused += now - paused_since
+        listened = max(int((now - started - paused) * 1000), 0)
+        self.add({
+            't': int(started), 'g': guild_id, 'r': track.requester, 's': track.source_name, 'id': track.track,
+            'u': track.uri, 'ti': track.title, 'a': track.author, 'd': track.duration,
+            'l': min(listened, track.duration) if not track.stream else listened, 'end': reason.value,
+        })
+
+    def add(self, play: dict) -> None:
+
+        self._aggregate(play)
+        self._buffer.append(json.dumps(play, separators=(',', ':'), ensure_ascii=False))
+
+    async def flush(self) -> None:
+
+        if self._writing is not None:
+            await asyncio.wait({self._writing})     # one write at a time, its thread outlives a cancelled flush
+        if not self._buffer:
+            return
+        lines, self._buffer = self._buffer, []
+        data = ('\n'.join(lines) + '\n').encode('utf-8')
+        self._size += len(data)
+        state = None
+        if self._size >= self.rollover:     # checkpoint taken together with the lines, nothing is added in between
+            self.segment, self._size = self.segment + 1, 0
+            state = self.dump()
+        self._writing = asyncio.ensure_future(self._write_logged(data, state, len(lines)))
+        await asyncio.shield(self._writing)
+
+    def dump(self) -> dict:
+        return {'segment': self.segment, 'total': self.total.dump(),
+            'guilds': {guild_id: stats.dump() for guild_id, stats in self.guilds.items()}}
+
+    def stats(self) -> Dict[str, float]:
+        return {'plays': self.total.plays, 'guilds': len(self.guilds), 'hours': round(self.total.hours, 1),
+            'skip_rate': round(self.total.skip_rate, 3), 'segment': self.segment, 'playing': len(self._playing)}
+
+    def _aggregate(self, play: dict) -> None:
+
+        self.total.add(play)
+        if (stats := self.guilds.get(play['g'])) is None:
+            stats = self.guilds[play['g']] = PlayStats(self.capacity)
+        stats.add(play)
+
+    async def _write_logged(self, data: bytes, state: Optional[dict], plays: int) -> None:
+        try:
+            await asyncio.to_thread(self._write, data, state)
+        except OSError as e:
+            logging.error('Failed to write %d plays: %s', plays, e)
+
+    def _write(self, data: bytes, state: Optional[dict]) -> None:
+
+        with open(self.path, 'ab') as file:
+            file.write(data)
+        if state is None:
+            return
+
+        # a crash at any step leaves files the rebuild reads: the plain segment until its archive is complete
+        segment = self.segment_path(state['segment'])
+        os.replace(self.path, segment)
+        with open(segment, 'rb') as source, gzip.open(segment + '.gz.tmp', 'wb') as archive:
+            shutil.copyfileobj(source, archive)
+        os.replace(segment + '.gz.tmp', segment + '.gz')
+        os.remove(segment)
+        with open(self.state_path + '.tmp', 'w', encoding='utf-8') as file:
+            json.dump(state, file, separators=(',', ':'))
+        os.replace(self.state_path + '.tmp', self.state_path)
+
+    def _segments(self) -> Dict[int, str]:
+        """Existing segments by number, the archive if complete or else the plain file"""
+
+        root, ext = os.path.splitext(os.path.basename(self.path))
+        pattern = re.compile(rf'{re.escape(root)}\.(\d+){re.escape(ext)}(\.gz)?$')
+        directory = os.path.dirname(self.path) or '.'
+        segments = {}
+        for name in sorted(os.listdir(directory)):     # plain files sort first, archives replace them
+            if match := pattern.match(name):
+                segments[int(match.group(1))] = os.path.join(directory, name)
+        return segments
+
+    def _rebuild(self) -> int:
+
+        self.total, self.guilds = PlayStats(self.total.tracks.capacity), {}
+        if os.path.exists(self.state_path):
+            with open(self.state_path, encoding='utf-8') as file:
+                state = json.load(file)
+            self.segment = state['segment']
+            self.total.load(state['total'])
+            for guild_id, stats in state['guilds'].items():
+                self.guilds[int(guild_id)] = PlayStats(self.capacity)
+                self.guilds[int(guild_id)].load(stats)
+
+        segments = self._segments()
+        replayed = 0
+        for segment in sorted(number for number in segments if number > self.segment):
+            replayed += self._replay(segments[segment])
+        self.segment = max(segments, default=self.segment)
+        if os.path.exists(self.path):
+            replayed += self._replay(self.path)
+            self._size = os.path.getsize(self.path)
+        return replayed
+
+    def _replay(self, path: str) -> int:
+
+        count = 0
+        with (gzip.open if path.endswith('.gz') else open)(path, 'rt', encoding='utf-8') as file:
+            for line in file:
+                try:
+                    play = json.loads(line)
+                except ValueError:
+                    continue    # torn last line of a crash
+                self._aggregate(play)
+                count += 1
+        return count
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+play_analytics = PlayAnalytics()
@@ -0,0 +1,135 @@
+import asyncio
+import logging
+from time import monotonic
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from bot.config import AUTOCOMPLETE_DEBOUNCE, AUTOCOMPLETE_BUDGET, AUTOCOMPLETE_TTL, AUTOCOMPLETE_CACHE_SIZE
+
+class Flight:
+
+    __slots__ = ('task', 'waiters')
+
+    def __init__(self, task: asyncio.Task) -> None:
+        self.task = task
+        self.waiters = 0
+
+class AutocompleteEngine:
+    """
+    Debounces keystrokes per user, cancels superseded lookups and coalesces identical queries.
+
+    A keystroke only waits `debounce` seconds while an earlier one of the same
+    user is still pending, the first keystroke of a burst is looked up at once.
+    """
+
+    def __init__(self, debounce: float = AUTOCOMPLETE_DEBOUNCE, budget: float = AUTOCOMPLETE_BUDGET,
+            ttl: float = AUTOCOMPLETE_TTL, cache_size: int = AUTOCOMPLETE_CACHE_SIZE) -> None:
+        self.debounce = debounce
+        self.budget = budget
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self.requests, self.lookups, self.coalesced, self.superseded = 0, 0, 0, 0
+        self.hits, self.budget_misses, self.stale_served = 0, 0, 0
+
+        self._latest: Dict[Hashable, asyncio.Future] = {}   # user key -> fired when a newer keystroke arrives
+        self._flights: Dict[Hashable, Flight] = {}          # query key -> shared in-flight lookup
+        self._results: 'OrderedDict[Hashable, Tuple[float, Any]]' = OrderedDict()  # query key -> (expires, choices)
+
+    async def complete(self, user_key: Hashable, query_key: Hashable,
+            lookup: Callable[[], Awaitable[Any]], local: Optional[Callable[[], Any]] = None) -> Optional[Any]:
+        """
+        Runs `lookup` for the latest keystroke of `user_key`, sharing it with
+        every concurrent request for `query_key`. Returns `None` if superseded.
+
+        `query_key` must be a tuple ending with the query text, so that results
+        of shorter prefixes can be served once the latency budget runs out.
+        `local` answers when neither fresh nor stale results are available in time.
+        """
+        self.requests += 1
+        deadline = monotonic() + self.budget
+
+        if (cached := self._results.get(query_key)) and cached[0] > monotonic():
+            self.hits += 1
+            self._results.move_to_end(query_key)
+            return cached[1]
+
+        typing = (previous := self._latest.get(user_key)) is not None and not previous.done()
+        if typing:
+            previous.set_result(None)
+        superseded = self._latest[user_key] = asyncio.get_running_loop().create_future()
+
+        try:
+            if typing:
+                await asyncio.wait((superseded,), timeout=self.debounce)
+                if superseded.done():
+                    self.superseded += 1
+                    return None
+            return await self._join(query_key, lookup, superseded, deadline, local)
+        finally:
+            if self._latest.get(user_key) is superseded:
+                del self._latest[user_key]
+
+    def fallback(self, query_key: Hashable, local: Optional[Callable[[], Any]] = None) -> Optional[Any]:
+        """Best stale choices for `query_key`, falling back to the longest cached prefix, then `local`"""
+
+        *scope, text = query_key
+        for end in range(len(text), 0, -1):
+            if (cached := self._results.get((*scope, text[:end]))) is not None:
+                self.stale_served += 1
+                return cached[1]
+        return local() if local else None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'requests': self.requests, 'lookups': self.lookups, 'hits': self.hits,
+            'coalesced': self.coalesced, 'superseded': self.superseded,
+            'budget_misses': self.budget_misses, 'stale_served': self.stale_served,
+        }
+
+    async def _join(self, query_key: Hashable, lookup: Callable[[], Awaitable[Any]],
+            superseded: asyncio.Future, deadline: float, local: Optional[Callable[[], Any]]) -> Optional[Any]:
+
+        if (flight := self._flights.get(query_key)) is None:
+            self.lookups += 1
+            flight = self._flights[query_key] = Flight(asyncio.ensure_future(lookup()))
+            flight.task.add_done_callback(lambda _: self._land(query_key, flight))
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            await asyncio.wait((flight.task, superseded),
+                timeout=max(deadline - monotonic(), 0), return_when=asyncio.FIRST_COMPLETED)
+            if flight.task.done():
+                if flight.task.cancelled():
+                    return self.fallback(query_key, local)
+                if (error := flight.task.exception()) is None:
+                    return flight.task.result()
+                logging.error('Autocomplete lookup failed for query: %s, Reason: %s', query_key, error)
+                return self.fallback(query_key, local)
+            if superseded.done():
+                self.superseded += 1
+                return None
+
+            # out of time, the lookup keeps running to fill the cache for the next keystroke
+            self.budget_misses += 1
+            logging.warning('Autocomplete budget exceeded for query: %s', query_key)
+            return self.fallback(query_key, local)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done() and superseded.done():
+                flight.task.cancel()    # nobody is waiting for this prefix anymore
+
+    def _land(self, query_key: Hashable, flight: Flight) -> None:
+
+        if self._flights.get(query_key) is flight:
+            del self._flights[query_key]
+        if flight.task.cancelled() or flight.task.exception() is not None:
+            return  # failed lookups are never cached
+
+        self._results[query_key] = (monotonic() + self.ttl, flight.task.result())
+        self._results.move_to_end(query_key)
+        while len(self._results) > self.cache_size:
+            self._results.popitem(last=False)
+
+autocomplete_engine = AutocompleteEngine()
@@ -1,26 +1,32 @@
 import re
-from random import randrange
 import logging
 
 import hikari
 import lavalink
-from lavalink import LoadType
+from lavalink import LoadType, LoadResult
 
-from bot.utils import format_time
+from bot.library.render import track_card
+from bot.library.cache import track_cache, dump_result, load_result
+from bot.library.coordinator import coordinator
+from bot.library.store import track_store
+from bot.library.voice import voice_index
+from bot.library.tracing import span, traced
 from bot.library.classes.sources import *
 
 URL_RX = re.compile(r'https?://(?:www\.)?.+')
 
 async def _join(bot, guild_id: int, author_id: int):
 
-    states = bot.cache.get_voice_states_view_for_guild(guild_id)
-    voice_state = next(filter(lambda i : i[0] == author_id, states.items()), None)
+    channel_id = voice_index.channel_of(guild_id, author_id)
     
-    assert voice_state is not None  # should already be covered via checks
+    assert channel_id is not None  # should already be covered via checks
 
-    bot.d.lavalink.player_manager.create(guild_id=guild_id)
+    # the channel's voice region picks a node nearby, lavalink maps it like a voice endpoint
+    channel = bot.cache.get_guild_channel(channel_id)
+    bot.d.lavalink.player_manager.create(guild_id=guild_id, endpoint=getattr(channel, 'region', None))
     try:
-        await bot.update_voice_state(guild_id, voice_state[1].channel_id, self_deaf=True)
+        with span('join'):
+            await bot.update_voice_state(guild_id, channel_id, self_deaf=True)
     except RuntimeError as e:
         logging.error('Failed to join voice channel on guild: %s, Reason: %s', guild_id, e)
         raise e
@@ -32,16 +38,40 @@ async def _get_tracks(lavalink: lavalink.Client, query: str = None, source: Sour
         query = query.strip('<>')
         return query
     
+    async def load_tracks(query, is_url):
+        with span('load') as load:     # only on track cache misses
+            if is_url and (track := await track_store.get_by_uri(query)):
+                load.set(source='store')
+                return LoadResult(LoadType.TRACK, [track])
+            if coordinator.enabled:
+                with span('coordinator.cache_get'):
+                    shared = await coordinator.cache_get(key)
+                if shared is not None:  # loaded by another worker
+                    load.set(source='coordinator')
+                    return load_result(shared)
+            node = lavalink.node_manager.find_ideal_node()
+            result = await lavalink.get_tracks(query, node=node)
+            track_store.put_many(result.tracks)
+            coordinator.cache_put(key, dump_result(result), track_cache.ttl(result.load_type))
+            load.set(source='lavalink')
+            return result
+
     query = parse_query(query)
-    if not URL_RX.match(query):
+    if is_url := bool(URL_RX.match(query)):
+        key = track_cache.make_key(query)
+    else:
+        key = track_cache.make_key(query, source.search_prefix)
         query = '{}:{}'.format(source.search_prefix, query)
 
-    result = await lavalink.get_tracks(query)
+    # cached results are copies, safe to modify per guild
+    with span('get_tracks'):
+        result = await track_cache.get_or_load(key, lambda: load_tracks(query, is_url))
     if result.load_type == LoadType.PLAYLIST and result.tracks:
         result.tracks[0].user_data['playlist_url'] = query
 
     return result
-        
+
+@traced('play')
 async def _play(bot, result: lavalink.LoadResult, guild_id: int, author_id: int,
         text_channel: int = 0, play_next: bool = False, loop: bool = False, shuffle: bool = True) -> hikari.Embed:
     
@@ -61,10 +91,7 @@ async def _play(bot, result: lavalink.LoadResult, guild_id: int, author_id: int,
         player.add(requester=author_id, track=track, index=0 if play_next else None)
         player.set_loop(1) if loop else None
         image_url = track.artwork_url
-        description = '[{}]({})\n{} `{}`\n\n<@!{}>'.format(
-            track.title, track.uri, track.author,
-            'LIVE' if track.stream else format_time(track.duration), 
-            track.requester)
+        description = '{}\n\n<@!{}>'.format(track_card(track), track.requester)
 
     if result.load_type == LoadType.PLAYLIST:
         result_type = 'playlist'
@@ -87,19 +114,16 @@ async def _play(bot, result: lavalink.LoadResult, guild_id: int, author_id: int,
                     result.playlist_info.name, playlist_url, num_tracks, plugin_info.get('author'), author_id)
             else:
                 raise Exception('Unknown result type!')
-        while tracks:
-            pop_at = randrange(len(tracks)) if shuffle else 0
-            track = tracks.pop(pop_at)
-            track.user_data = {
-                'playlist_name': result.playlist_info.name,
-                'playlist_url': playlist_url,
-            }
-            player.add(requester=author_id, track=track)
+        player.add_tracks(tracks, requester=author_id, shuffle_tracks=shuffle, user_data={
+            'playlist_name': result.playlist_info.name,
+            'playlist_url': playlist_url,
+        })
         player.set_loop(2) if loop else None
 
     player.send_channel = text_channel
-    if not player.is_playing:
-        await player.play()
+    if not player.is_playing and not player.is_starting:    # a concurrent /play may have started one already
+        with span('player.play'):
+            await player.play()
 
     return hikari.Embed(
         title=f'{result_type.capitalize()} added',
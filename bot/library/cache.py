@@ -0,0 +1,174 @@
+import copy
+import asyncio
+import logging
+from time import monotonic
+from operator import attrgetter
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from lavalink import AudioTrack, LoadResult, LoadType
+
+from bot.config import CACHE_MAX_ENTRIES, CACHE_MAX_BYTES, CACHE_TTL
+
+TRACK_OVERHEAD = 512    # rough per-track cost of slots, dicts and info strings
+TRACK_SLOTS = attrgetter(*AudioTrack.__slots__)
+
+def copy_track(track: AudioTrack) -> AudioTrack:
+    """Shallow copy of a track with its own `user_data` and `extra` dicts"""
+
+    if type(track) is AudioTrack:   # twice as fast as copy.copy, subclasses may add slots
+        clone = object.__new__(AudioTrack)
+        for slot, value in zip(AudioTrack.__slots__, TRACK_SLOTS(track)):
+            setattr(clone, slot, value)
+    else:
+        clone = copy.copy(track)
+    clone.user_data = dict(track.user_data) if track.user_data else {}
+    clone.extra = dict(track.extra)
+    return clone
+
+def copy_result(result: LoadResult) -> LoadResult:
+    """Copy of a load result that is safe to mutate per guild"""
+
+    return LoadResult(
+        result.load_type,
+        [copy_track(track) for track in result.tracks],
+        result.playlist_info, result.plugin_info, result.error)
+
+def dump_result(result: LoadResult) -> Optional[dict]:
+    """Load result in Lavalink's response format for other workers, None if not worth sharing"""
+
+    raws = [track.raw for track in result.tracks]
+    if result.load_type == LoadType.TRACK and raws:
+        return {'loadType': 'track', 'data': raws[0]}
+    if result.load_type == LoadType.SEARCH:
+        return {'loadType': 'search', 'data': raws}
+    if result.load_type == LoadType.PLAYLIST:
+        info = {'name': result.playlist_info.name, 'selectedTrack': result.playlist_info.selected_track}
+        return {'loadType': 'playlist', 'data': {'info': info, 'pluginInfo': result.plugin_info or {}, 'tracks': raws}}
+    return None
+
+def load_result(data: dict) -> LoadResult:
+    return LoadResult.from_dict(data)
+
+def estimate_size(result: LoadResult) -> int:
+    """Approximate memory footprint of a load result in bytes"""
+
+    size = 0
+    for track in result.tracks:
+        size += TRACK_OVERHEAD + len(track.track or '') + len(track.title) + len(track.author) \
+            + len(track.uri or '') + len(track.artwork_url or '')
+    return size
+
+class CacheEntry:
+
+    __slots__ = ('result', 'expires', 'size')
+
+    def __init__(self, result: LoadResult, expires: float, size: int) -> None:
+        self.result = result
+        self.expires = expires
+        self.size = size
+
+class LoadResultCache:
+    """TTL + LRU cache for Lavalink load results shared by all guilds"""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, max_bytes: int = CACHE_MAX_BYTES,
+            ttls: Dict[str, float] = CACHE_TTL) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttls = ttls
+        self.size = 0
+        self.hits, self.misses, self.evictions = 0, 0, 0
+
+        self._entries: 'OrderedDict[Hashable, CacheEntry]' = OrderedDict()
+        self._pending: Dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def make_key(query: str, prefix: Optional[str] = None) -> Tuple[Optional[str], str]:
+        """Cache key for a URL (no prefix) or a search query with its source prefix"""
+
+        if prefix is None:
+            return None, query.strip()
+        return prefix, ' '.join(query.split()).casefold()
+
+    def ttl(self, load_type: LoadType) -> float:
+        return self.ttls.get(load_type.name, 0)
+
+    def get(self, key: Hashable) -> Optional[LoadResult]:
+        """Returns a copy of the cached result or `None` on miss"""
+
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires <= monotonic():
+            self._remove(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return copy_result(entry.result)
+
+    def peek(self, key: Hashable) -> Optional[LoadResult]:
+        """Same as `get` but expired entries are still returned and counters are untouched"""
+
+        entry = self._entries.get(key)
+        return copy_result(entry.result) if entry is not None else None
+
+    def put(self, key: Hashable, result: LoadResult) -> None:
+
+        ttl = self.ttl(result.load_type)
+        size = estimate_size(result)
+        if ttl <= 0 or size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = CacheEntry(result, monotonic() + ttl, size)
+        self.size += size
+
+        while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[LoadResult]]) -> LoadResult:
+        """Returns a cached copy, or loads it once for all concurrent callers of the same key"""
+
+        if (result := self.get(key)) is not None:
+            return result
+
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.ensure_future(loader())
+            task.add_done_callback(lambda task: self._loaded(key, task))
+            self._pending[key] = task
+
+        return copy_result(await asyncio.shield(task))
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'entries': len(self._entries), 'bytes': self.size,
+            'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+        }
+
+    def _loaded(self, key: Hashable, task: asyncio.Task) -> None:
+
+        self._pending.pop(key, None)
+        if task.cancelled():
+            return
+        if (error := task.exception()) is not None:
+            logging.warning('Failed to load tracks for cache key %s: %s', key, error)
+            return
+        self.put(key, task.result())
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key)
+        self.size -= entry.size
+
+track_cache = LoadResultCache()
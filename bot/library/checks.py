@@ -1,6 +1,8 @@
 import lightbulb
 from lightbulb import CheckFailure
 
+from bot.library.voice import voice_index
+
 class PlayerNotPlaying(CheckFailure):
     pass
 
@@ -19,14 +21,13 @@ def valid_user_voice(ctx: lightbulb.Context) -> bool:
     if not ctx.guild_id:
         raise lightbulb.CheckFailure('Cannot invoke command in DMs')
     
-    states = ctx.app.cache.get_voice_states_view_for_guild(ctx.guild_id)
-    user_voice_state = next(filter(lambda i : i[0] == ctx.author.id, states.items()), None)
-    bot_voice_state = next(filter(lambda i: i[0] == ctx.app.get_me().id, states.items()), None)
+    user_channel = voice_index.channel_of(ctx.guild_id, ctx.author.id)
+    bot_channel = voice_index.channel_of(ctx.guild_id, ctx.app.get_me().id)
     
     # if user & bot not in voice or in different channels
-    if not user_voice_state:
+    if not user_channel:
         raise NotInVoice('Join voice channel to use command')
-    if bot_voice_state and user_voice_state[1].channel_id != bot_voice_state[1].channel_id:
+    if bot_channel and user_channel != bot_channel:
         raise NotSameVoice('Join the same channel as bot to use command')
     return True
 
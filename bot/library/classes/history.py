@@ -0,0 +1,192 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Dict, Iterator, List, Optional, Set
+
+from lavalink import AudioTrack
+
+from bot.config import HISTORY_SIZE, HISTORY_FLUSH, HISTORY_PATH
+from bot.library.store import track_store
+
+class HistorySpill:
+    """
+    Append-only per-guild files of history pushed out of memory.
+
+    Entries are buffered and appended in batches from a worker thread, and
+    read back newest first, from the buffer and then from the end of the file.
+    Discarded files are removed by the next batch, before its new entries.
+    """
+
+    def __init__(self, directory: str = HISTORY_PATH, flush_interval: float = HISTORY_FLUSH) -> None:
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.spilled, self.read_back, self.discarded = 0, 0, 0
+
+        self._pending: Dict[str, List[dict]] = {}    # path -> entries not written yet, oldest first
+        self._removals: Set[str] = set()            # paths to remove before the pending entries are written
+        self._lock = threading.Lock()
+        self._writing: Optional[asyncio.Future] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    def path(self, guild_id: int) -> str:
+        return os.path.join(self.directory, f'{guild_id}.jsonl')
+
+    def discard(self, path: str) -> None:
+        """Drops the entries of a file, buffered and written"""
+
+        self._pending.pop(path, None)
+        self._removals.add(path)
+        self.discarded += 1
+
+    def add(self, path: str, entry: dict) -> None:
+        self._pending.setdefault(path, []).append(entry)
+        self.spilled += 1
+
+    async def take(self, path: str) -> Optional[dict]:
+        """Removes and returns the newest entry of a file, `None` if it has none"""
+
+        if entries := self._pending.get(path):
+            entry = entries.pop()
+        elif path in self._removals:
+            entry = None    # only entries from before the discard are on disk
+        else:
+            if self._writing is not None:
+                await asyncio.wait({self._writing})     # entries in flight are newer than the file
+            entry = await asyncio.to_thread(self._read_last, path)
+        self.read_back += entry is not None
+        return entry
+
+    async def flush(self) -> None:
+
+        if self._writing is not None:
+            await asyncio.wait({self._writing})
+        batches, self._pending = {path: entries for path, entries in self._pending.items() if entries}, {}
+        removals, self._removals = self._removals, set()
+        if not batches and not removals:
+            return
+        self._writing = asyncio.ensure_future(asyncio.to_thread(self._write, batches, removals))
+        try:
+            await self._writing
+        except OSError as e:
+            logging.error('Failed to spill play history of %d guilds: %s', len(batches), e)
+        finally:
+            self._writing = None
+
+    def stats(self) -> Dict[str, int]:
+        return {'spilled': self.spilled, 'read_back': self.read_back, 'discarded': self.discarded,
+            'pending': sum(len(entries) for entries in self._pending.values())}
+
+    def _write(self, batches: Dict[str, List[dict]], removals: Set[str]) -> None:
+
+        with self._lock:
+            for path in removals:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            os.makedirs(self.directory, exist_ok=True)
+            for path, entries in batches.items():
+                with open(path, 'a', encoding='utf-8') as file:
+                    file.write(''.join(json.dumps(entry, separators=(',', ':')) + '\n' for entry in entries))
+
+    def _read_last(self, path: str) -> Optional[dict]:
+        """Cuts the last line off a file and parses it"""
+
+        with self._lock:
+            if not os.path.exists(path):
+                return None
+            try:
+                with open(path, 'rb+') as file:
+                    end = file.seek(0, os.SEEK_END)
+                    start = max(end - 4096, 0)  # entries are a few hundred bytes
+                    file.seek(start)
+                    if not (tail := file.read()):
+                        return None
+                    cut = tail.rfind(b'\n', 0, len(tail) - 1) + 1
+                    if cut == 0 and start > 0:
+                        return None
+                    file.truncate(start + cut)
+                return json.loads(tail[cut:])
+            except (OSError, ValueError) as e:
+                logging.error('Failed to read back play history from %s: %s', path, e)
+                return None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+history_spill = HistorySpill()
+
+class PlayHistory:
+    """
+    Fixed-capacity ring buffer of recently played tracks.
+
+    Tracks pushed out of the buffer are spilled as compact references
+    (encoded track, uri, requester) to a per-guild append-only file, and
+    `pop` reads them back once the buffer is empty. Iteration and indexing
+    only cover the buffer, the length counts spilled tracks too. The file
+    is discarded on creation and on clear, as its older entries are never
+    read back.
+    """
+
+    def __init__(self, guild_id: int, capacity: int = HISTORY_SIZE) -> None:
+        self.path = history_spill.path(guild_id)
+        self._tracks: deque = deque(maxlen=capacity)
+        self._spilled = 0   # tracks spilled since the last clear, only these are read back
+        history_spill.discard(self.path)    # left by an earlier player or run
+
+    def __len__(self) -> int:
+        return len(self._tracks) + self._spilled
+
+    def __iter__(self) -> Iterator[AudioTrack]:
+        return iter(self._tracks)
+
+    def __getitem__(self, index: int) -> AudioTrack:
+        return self._tracks[index]
+
+    def append(self, track: AudioTrack) -> None:
+        if len(self._tracks) == self._tracks.maxlen:
+            self._spill(self._tracks[0])
+        self._tracks.append(track)
+
+    async def pop(self, client) -> Optional[AudioTrack]:
+        """Removes and returns the most recently played track, `None` if a spilled one could not be read back"""
+
+        if self._tracks:
+            return self._tracks.pop()
+        if not self._spilled:
+            raise IndexError('pop from an empty history')
+        self._spilled -= 1
+        if (entry := await history_spill.take(self.path)) is None:
+            return None
+        tracks = await track_store.decode_tracks(client, [entry['track']])
+        if not tracks:
+            return None
+        track = tracks[0]
+        track.requester = entry['requester']
+        return track
+
+    def clear(self) -> None:
+        self._tracks.clear()
+        if self._spilled:
+            history_spill.discard(self.path)
+        self._spilled = 0
+
+    def _spill(self, track: AudioTrack) -> None:
+        history_spill.add(self.path, {'ts': int(time.time()), 'track': track.track, 'uri': track.uri,
+            'requester': track.requester})
+        self._spilled += 1
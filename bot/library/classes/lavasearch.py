@@ -1,7 +1,19 @@
-from typing import List, Optional, Any
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Union
+
+import aiohttp
 from lavalink import AudioTrack
+from lavalink.errors import AuthenticationError, ClientError
+
+from bot.config import LAVASEARCH_TIMEOUT, LAVASEARCH_CONCURRENCY, LAVASEARCH_RETRIES
+
+SEARCH_TYPES = ('track', 'album', 'artist', 'playlist', 'text')
 
 class SearchResultItem:
+
+    __slots__ = ('title', 'author', 'uri', 'artwork_url', 'item_type')
+
     def __init__(self, title: Optional[str] = None, author: Optional[str] = None, uri: Optional[str] = None,
                  artwork_url: Optional[str] = None, item_type: Optional[str] = None) -> None:
         """
@@ -40,16 +52,59 @@ class SearchResultItem:
             item_type=plugin_info.get('type')
         )
 
+class LazyList(Sequence):
+
+    __slots__ = ('_raw', '_decode', '_items')
+
+    def __init__(self, raw: List[Any], decode: Callable[[Any], Any]) -> None:
+        """
+        Initialize a LazyList instance.
+
+        Items are decoded on first access only, so slicing the first few items
+        of a large result never decodes the rest.
+
+        Args:
+            raw (List[Any]): The raw items.
+            decode (Callable[[Any], Any]): Function decoding one raw item.
+        """
+        self._raw = raw
+        self._decode = decode
+        self._items: List[Any] = [None] * len(raw)
+
+    def __len__(self) -> int:
+        return len(self._raw)
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:
+        if isinstance(index, slice):
+            return [self._get(i) for i in range(*index.indices(len(self._raw)))]
+        if index < 0:
+            index += len(self._raw)
+        if not 0 <= index < len(self._raw):
+            raise IndexError('LazyList index out of range')
+        return self._get(index)
+
+    def __iter__(self) -> Iterator[Any]:
+        return (self._get(i) for i in range(len(self._raw)))
+
+    def _get(self, index: int) -> Any:
+        if (item := self._items[index]) is None:
+            item = self._items[index] = self._decode(self._raw[index])
+        return item
+
 class LavasearchResult:
 
+    __slots__ = ('raw', 'tracks', 'albums', 'artists', 'playlists', 'texts', 'plugin')
+
     def __init__(self, raw: Any, tracks: Optional[List[dict]] = None, albums: Optional[List[dict]] = None,
                  artists: Optional[List[dict]] = None, playlists: Optional[List[dict]] = None, 
                  texts: Optional[List[str]] = None, plugin: Optional[Any] = None) -> None:
         """
         Initialize a LavasearchResult instance.
 
+        Tracks and items are decoded lazily, on first access.
+
         Args:
-            raw (Any): The raw data.
+            raw (Any): The raw data, None unless it should be kept alive.
             tracks (Optional[List[dict]]): List of raw track dictionaries. Defaults to None.
             albums (Optional[List[dict]]): List of raw album dictionaries. Defaults to None.
             artists (Optional[List[dict]]): List of raw artist dictionaries. Defaults to None.
@@ -58,30 +113,137 @@ class LavasearchResult:
             plugin (Optional[Any]): An optional plugin. Defaults to None.
         """
         self.raw = raw
-        self.tracks: List[AudioTrack] = [AudioTrack.from_dict(raw_track) for raw_track in (tracks or [])]
-        self.albums: List[SearchResultItem] = [SearchResultItem.from_dict(raw_item) for raw_item in (albums or [])]
-        self.artists: List[SearchResultItem] = [SearchResultItem.from_dict(raw_item) for raw_item in (artists or [])]
-        self.playlists: List[SearchResultItem] = [SearchResultItem.from_dict(raw_item) for raw_item in (playlists or [])]
+        self.tracks: Sequence[AudioTrack] = LazyList(tracks or [], AudioTrack.from_dict)
+        self.albums: Sequence[SearchResultItem] = LazyList(albums or [], SearchResultItem.from_dict)
+        self.artists: Sequence[SearchResultItem] = LazyList(artists or [], SearchResultItem.from_dict)
+        self.playlists: Sequence[SearchResultItem] = LazyList(playlists or [], SearchResultItem.from_dict)
         self.texts: List[str] = texts or []
         self.plugin = plugin
 
     @classmethod
-    def from_dict(cls, mapping: dict) -> 'LavasearchResult':
+    def from_dict(cls, mapping: dict, limit: Optional[int] = None, keep_raw: bool = False) -> 'LavasearchResult':
         """
         Create a LavasearchResult instance from a dictionary.
 
         Args:
             mapping (dict): The dictionary containing search result data.
+            limit (Optional[int]): Max number of items kept per type. Defaults to None (all).
+            keep_raw (bool): Whether to keep the whole mapping as `raw`. Defaults to False.
 
         Returns:
             LavasearchResult: The created LavasearchResult instance.
         """
+        mapping = mapping or {}
         return cls(
-            raw=mapping,
-            tracks=mapping.get('tracks'),
-            albums=mapping.get('albums'),
-            artists=mapping.get('artists'),
-            playlists=mapping.get('playlists'),
-            texts=mapping.get('texts'),
+            raw=mapping if keep_raw else None,
+            tracks=(mapping.get('tracks') or [])[:limit],
+            albums=(mapping.get('albums') or [])[:limit],
+            artists=(mapping.get('artists') or [])[:limit],
+            playlists=(mapping.get('playlists') or [])[:limit],
+            texts=(mapping.get('texts') or [])[:limit],
             plugin=mapping.get('plugin')
-        )
\ No newline at end of file
+        )
+
+class LavasearchNode:
+
+    __slots__ = ('name', 'url', 'password', 'semaphore')
+
+    def __init__(self, name: str, url: str, password: str, concurrency: int) -> None:
+        self.name = name
+        self.url = url
+        self.password = password
+        self.semaphore = asyncio.Semaphore(concurrency)
+
+class LavasearchClient:
+
+    def __init__(self, password: str, timeout: float = LAVASEARCH_TIMEOUT,
+                 concurrency: int = LAVASEARCH_CONCURRENCY, retries: int = LAVASEARCH_RETRIES) -> None:
+        """
+        Initialize a LavasearchClient instance.
+
+        Requests go through one keep-alive session per node, with at most
+        `concurrency` requests in flight per node.
+
+        Args:
+            password (str): The default password of the Lavalink nodes.
+            timeout (float): Total timeout of a single request, in seconds.
+            concurrency (int): Max number of in-flight requests per node.
+            retries (int): Number of retries on timeouts, connection and server errors.
+        """
+        self.password = password
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.retries = retries
+        self.nodes: Dict[str, LavasearchNode] = {}
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+
+    def add_node(self, name: str, host: str, port: int, ssl: bool = False, password: Optional[str] = None) -> None:
+        """
+        Register a Lavalink node with the Lavasearch plugin.
+
+        Args:
+            name (str): The node name, same as the lavalink node.
+            host (str): The node host.
+            port (int): The node port.
+            ssl (bool): Whether to use https. Defaults to False.
+            password (Optional[str]): The node password. Defaults to None (client password).
+        """
+        url = '{}://{}:{}/v4/loadsearch'.format('https' if ssl else 'http', host, port)
+        self.nodes[name] = LavasearchNode(name, url, password or self.password, self.concurrency)
+
+    async def search(self, node_name: str, query: str, types: Optional[str] = None,
+                     limit: Optional[int] = None) -> LavasearchResult:
+        """
+        Search a query on the given node.
+
+        Args:
+            node_name (str): Name of the node to send the request to.
+            query (str): The query including its source prefix, e.g. `spsearch:query`.
+            types (Optional[str]): Comma-separated result types. Defaults to None (all types).
+            limit (Optional[int]): Max number of items kept per type. Defaults to None (all).
+
+        Returns:
+            LavasearchResult: The search result, empty if nothing was found.
+        """
+        node = self.nodes[node_name]
+        types = ','.join(t for t in (types or ','.join(SEARCH_TYPES[:4])).split(',') if t in SEARCH_TYPES)
+        params = {'query': query, 'types': types}
+
+        for attempt in range(self.retries + 1):
+            try:
+                async with node.semaphore:
+                    json = await self._request(node, params)
+                return LavasearchResult.from_dict(json, limit)
+            except (asyncio.TimeoutError, aiohttp.ClientConnectionError, ClientError) as error:
+                if attempt == self.retries:
+                    raise ClientError(f'Lavasearch request failed on node {node.name}') from error
+                logging.warning('Lavasearch request failed on node %s (attempt %d): %r', node.name, attempt + 1, error)
+                await asyncio.sleep(0.1 * 2 ** attempt)
+
+    async def close(self) -> None:
+        """Close all node sessions."""
+        for session in self._sessions.values():
+            await session.close()
+        self._sessions.clear()
+
+    async def _request(self, node: LavasearchNode, params: dict) -> Optional[dict]:
+
+        async with self._session(node).get(node.url, params=params) as res:
+            if res.status in (401, 403):
+                raise AuthenticationError
+            if res.status == 204:
+                return None
+            if res.status == 200:
+                return await res.json()
+            if res.status >= 500:
+                raise ClientError(f'Lavasearch returned status {res.status}')
+            raise ValueError(f'Lavasearch rejected request with status {res.status}: {params}')
+
+    def _session(self, node: LavasearchNode) -> aiohttp.ClientSession:
+
+        if (session := self._sessions.get(node.name)) is None or session.closed:
+            session = self._sessions[node.name] = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={'Authorization': node.password})
+        return session
\ No newline at end of file
@@ -0,0 +1,170 @@
+from itertools import chain, islice
+from typing import Any, Iterable, Iterator, List, Union
+
+class TrackQueue:
+    """
+    List-like queue of tracks for very large queues.
+
+    Tracks are stored in blocks of at most `2 * LOAD` items, with a Fenwick
+    tree over block sizes. Indexing, insert and pop at any position locate
+    their block in O(log n) and only shift items within that block.
+    `version` changes on every mutation.
+    """
+
+    LOAD: int = 512
+
+    def __init__(self, iterable: Iterable[Any] = ()) -> None:
+        self._blocks: List[List[Any]] = []
+        self._tree: List[int] = [0]     # 1-based Fenwick tree of block sizes
+        self._len = 0
+        self.version = 0
+        self.extend(iterable)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[Any]:
+        return chain.from_iterable(self._blocks)
+
+    def __repr__(self) -> str:
+        return f'TrackQueue({list(self)!r})'
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:
+
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._len)
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            if start >= stop:
+                return []
+            return list(islice(self.iter_from(start), stop - start))
+
+        block, offset = self._locate(self._normalize(index))
+        return self._blocks[block][offset]
+
+    def iter_from(self, start: int) -> Iterator[Any]:
+        """Lazy iterator over the items from `start` on"""
+
+        if start >= self._len:
+            return iter(())
+        block, offset = self._locate(max(start, 0))
+        return chain(islice(self._blocks[block], offset, None), chain.from_iterable(islice(self._blocks, block + 1, None)))
+
+    def __setitem__(self, index: int, track: Any) -> None:
+        self.version += 1
+        block, offset = self._locate(self._normalize(index))
+        self._blocks[block][offset] = track
+
+    def __delitem__(self, index: int) -> None:
+        self.pop(index)
+
+    def append(self, track: Any) -> None:
+
+        self.version += 1
+        if not self._blocks or len(self._blocks[-1]) >= self.LOAD:
+            self._blocks.append([track])
+            self._len += 1
+            self._rebuild()
+            return
+        self._blocks[-1].append(track)
+        self._len += 1
+        self._update(len(self._blocks) - 1, 1)
+
+    def extend(self, tracks: Iterable[Any]) -> None:
+
+        tracks = list(tracks)
+        if not tracks:
+            return
+        self.version += 1
+        if self._blocks and (room := self.LOAD - len(self._blocks[-1])) > 0:
+            self._blocks[-1].extend(tracks[:room])
+            tracks = tracks[room:]
+        self._blocks.extend(tracks[i:i + self.LOAD] for i in range(0, len(tracks), self.LOAD))
+        self._len = sum(map(len, self._blocks))
+        self._rebuild()
+
+    def insert(self, index: int, track: Any) -> None:
+
+        self.version += 1
+        if index < 0:
+            index = max(index + self._len, 0)
+        if index >= self._len:
+            self.append(track)
+            return
+
+        block, offset = self._locate(index)
+        self._blocks[block].insert(offset, track)
+        self._len += 1
+        if len(self._blocks[block]) > 2 * self.LOAD:
+            items = self._blocks[block]
+            self._blocks[block:block + 1] = [items[:self.LOAD], items[self.LOAD:]]
+            self._rebuild()
+        else:
+            self._update(block, 1)
+
+    def pop(self, index: int = -1) -> Any:
+
+        if not self._len:
+            raise IndexError('pop from empty queue')
+        block, offset = self._locate(self._normalize(index))
+        self.version += 1
+        track = self._blocks[block].pop(offset)
+        self._len -= 1
+
+        size = len(self._blocks[block])
+        if not size:
+            del self._blocks[block]
+            self._rebuild()
+        elif size < self.LOAD // 4 and block + 1 < len(self._blocks) \
+                and size + len(self._blocks[block + 1]) <= self.LOAD:
+            self._blocks[block].extend(self._blocks.pop(block + 1))
+            self._rebuild()
+        else:
+            self._update(block, -1)
+        return track
+
+    def remove(self, track: Any) -> None:
+        """Removes the first occurrence of `track`, like `list.remove`"""
+
+        for index, item in enumerate(self):
+            if item == track:
+                self.pop(index)
+                return
+        raise ValueError('track not in queue')
+
+    def clear(self) -> None:
+        self.version += 1
+        self._blocks.clear()
+        self._tree = [0]
+        self._len = 0
+
+    def _normalize(self, index: int) -> int:
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError('queue index out of range')
+        return index
+
+    def _locate(self, index: int):
+        """Block number and offset within it of the item at `index`"""
+
+        pos, step = 0, 1 << (len(self._blocks).bit_length() - 1)
+        while step:
+            if pos + step <= len(self._blocks) and self._tree[pos + step] <= index:
+                pos += step
+                index -= self._tree[pos]
+            step >>= 1
+        return pos, index
+
+    def _update(self, block: int, delta: int) -> None:
+        i = block + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _rebuild(self) -> None:
+        tree = [0] + [len(block) for block in self._blocks]
+        for i in range(1, len(tree)):
+            if (parent := i + (i & -i)) < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
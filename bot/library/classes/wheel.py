@@ -0,0 +1,75 @@
+from typing import Dict, Hashable, List, Set, Tuple
+
+class TimerWheel:
+    """
+    Hierarchical timer wheel keyed by hashable ids, driven by `advance`.
+
+    Level `n` has `slots` buckets of `tick * slots ** n` seconds. Timers far in
+    the future sit in higher levels and cascade down as the lower wheel wraps,
+    so scheduling, cancelling and expiring are O(1) per timer.
+    """
+
+    def __init__(self, tick: float = 1.0, slots: int = 64, levels: int = 3, now: float = 0) -> None:
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self.current = int(now / tick)     # ticks processed so far
+
+        self._wheels: List[List[Set[Hashable]]] = [[set() for _ in range(slots)] for _ in range(levels)]
+        self._timers: Dict[Hashable, Tuple[int, int, int]] = {}  # key -> (expiry tick, level, slot)
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._timers
+
+    def schedule(self, key: Hashable, delay: float) -> None:
+        """(Re)schedules `key` to expire `delay` seconds from the current tick"""
+
+        self.cancel(key)
+        self._place(key, self.current + max(int(delay / self.tick + 0.999999), 1))
+
+    def cancel(self, key: Hashable) -> None:
+        if (timer := self._timers.pop(key, None)) is not None:
+            self._wheels[timer[1]][timer[2]].discard(key)
+
+    def advance(self, now: float) -> List[Hashable]:
+        """Moves the wheel up to `now`, returning the keys that expired"""
+
+        expired = []
+        target = int(now / self.tick)
+        while self.current < target:
+            self.current += 1
+            if self.current % self.slots == 0:
+                self._cascade(1)
+            bucket = self._wheels[0][self.current % self.slots]
+            for key in bucket:
+                del self._timers[key]
+            expired.extend(bucket)
+            bucket.clear()
+        return expired
+
+    def _place(self, key: Hashable, expires: int) -> None:
+
+        delta, level = expires - self.current, 0
+        while level < self.levels - 1 and delta >= self.slots ** (level + 1):
+            level += 1
+        slot = (expires // self.slots ** level) % self.slots
+        self._wheels[level][slot].add(key)
+        self._timers[key] = (expires, level, slot)
+
+    def _cascade(self, level: int) -> None:
+        """Re-places the timers of the next higher bucket once the lower wheel wraps"""
+
+        if level >= self.levels:
+            return
+        span = self.slots ** level
+        if (self.current // span) % self.slots == 0:
+            self._cascade(level + 1)
+        bucket = self._wheels[level][(self.current // span) % self.slots]
+        keys = list(bucket)
+        bucket.clear()
+        for key in keys:
+            expires = self._timers.pop(key)[0]
+            self._place(key, max(expires, self.current))
@@ -0,0 +1,226 @@
+import os
+import json
+import asyncio
+import logging
+from itertools import count
+from time import monotonic
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from bot.config import COORDINATOR_CACHE_SIZE, COORDINATOR_TIMEOUT, COORDINATOR_REPORT_INTERVAL
+from bot.library.health import NodeHealth, node_health
+
+LINE_LIMIT = 64 * 1024 * 1024   # a large playlist result is a single line
+
+def cache_key(key: Hashable) -> str:
+    return json.dumps(key, separators=(',', ':'))
+
+def weighted_mean(samples: List[Tuple[float, int]]) -> float:
+    """Mean of `(value, weight)` pairs, unweighted if every weight is 0"""
+
+    weight = sum(weight for _, weight in samples)
+    if not weight:
+        return sum(value for value, _ in samples) / len(samples)
+    return sum(value * weight for value, weight in samples) / weight
+
+def merge_health(reports: Dict[str, Dict[str, dict]]) -> Dict[str, dict]:
+    """
+    Node latency and error rate of all workers, weighted by the requests each
+    worker sent the node in its last report interval. A worker that stopped
+    using a node does not hold its average at an old value.
+    """
+    samples: Dict[str, Dict[str, list]] = {}
+    for health in reports.values():
+        for name, node in health.items():
+            for key in ('latency_ms', 'error_rate'):
+                if node[key] is not None:   # no latency without a successful request
+                    samples.setdefault(name, {}).setdefault(key, []).append((node[key], node['requests']))
+    return {name: {key: weighted_mean(values) for key, values in keys.items()} for name, keys in samples.items()}
+
+class Coordinator:
+    """
+    Local coordinator of the worker processes, served on a Unix socket.
+
+    Workers send JSON lines `{"id", "op", ...}` and get `{"id", "result"}`
+    back, requests without id get no reply. It keeps the latest report of
+    every worker for `/stats` totals and node health, and a search cache
+    shared by all workers.
+    """
+
+    def __init__(self, path: str, cache_size: int = COORDINATOR_CACHE_SIZE) -> None:
+        self.path = path
+        self.cache_size = cache_size
+        self.requests, self.cache_hits, self.cache_misses = 0, 0, 0
+
+        self._reports: Dict[str, dict] = {}             # worker -> latest stats
+        self._health: Dict[str, Dict[str, dict]] = {}   # worker -> node health samples
+        self._cache: 'OrderedDict[str, Tuple[float, Any]]' = OrderedDict()     # key -> (expires, result)
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        if os.path.exists(self.path):
+            os.remove(self.path)    # left over by a killed launcher
+        self._server = await asyncio.start_unix_server(self._serve, self.path, limit=LINE_LIMIT)
+
+    async def close(self) -> None:
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def handle(self, worker: Optional[str], message: dict) -> Any:
+
+        self.requests += 1
+        op = message['op']
+        if op == 'report':
+            self._reports[worker] = message['stats']
+            self._health[worker] = message['health']
+            return merge_health(self._health)
+        if op == 'totals':
+            totals = {'workers': len(self._reports)}
+            for stats in self._reports.values():
+                for key, value in stats.items():
+                    totals[key] = totals.get(key, 0) + value
+            return totals
+        if op == 'cache_get':
+            entry = self._cache.get(message['key'])
+            if entry is None or entry[0] <= monotonic():
+                self.cache_misses += 1
+                return None
+            self.cache_hits += 1
+            self._cache.move_to_end(message['key'])
+            return entry[1]
+        if op == 'cache_put':
+            self._cache[message['key']] = (monotonic() + message['ttl'], message['result'])
+            self._cache.move_to_end(message['key'])
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return None
+        raise ValueError(f'Unknown coordinator op: {op}')
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+
+        worker = None
+        try:
+            while line := await reader.readline():
+                message = json.loads(line)
+                worker = message.get('worker', worker)
+                try:
+                    result = self.handle(worker, message)
+                except Exception as e:
+                    logging.error('Coordinator request %s failed: %r', message.get('op'), e)
+                    result = None
+                if message.get('id') is not None:
+                    writer.write(json.dumps({'id': message['id'], 'result': result}).encode() + b'\n')
+                    await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+            logging.warning('Coordinator lost worker %s: %r', worker, e)
+        finally:
+            self._reports.pop(worker, None)     # totals only count live workers
+            self._health.pop(worker, None)
+            writer.close()
+
+class CoordinatorClient:
+    """
+    Worker side of the coordinator, every call returns None when not connected.
+
+    A worker started without a coordinator runs standalone, a worker that
+    loses it keeps running on its local caches and health.
+    """
+
+    def __init__(self, timeout: float = COORDINATOR_TIMEOUT, interval: float = COORDINATOR_REPORT_INTERVAL,
+            health: NodeHealth = node_health) -> None:
+        self.timeout = timeout
+        self.interval = interval
+        self.health = health
+        self.worker: Optional[str] = None
+        self.errors = 0
+
+        self._ids = count()
+        self._waiting: Dict[int, asyncio.Future] = {}
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._tasks = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self._writer is not None
+
+    async def connect(self, path: str, worker: str, collect: Callable[[], Dict[str, float]]) -> None:
+        """Connects to the coordinator and reports `collect()` every interval"""
+
+        self.worker = worker
+        reader, self._writer = await asyncio.open_unix_connection(path, limit=LINE_LIMIT)
+        self._create_task(self._read(reader))
+        self._create_task(self._report(collect))
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        if self._writer:
+            self._writer.close()
+            self._writer = None
+
+    async def call(self, op: str, **kwargs) -> Any:
+
+        if not self.enabled:
+            return None
+        id_ = next(self._ids)
+        future = self._waiting[id_] = asyncio.get_running_loop().create_future()
+        try:
+            self._send({'id': id_, 'op': op, **kwargs})
+            return await asyncio.wait_for(future, self.timeout)
+        except (asyncio.TimeoutError, ConnectionError) as e:
+            self.errors += 1
+            logging.warning('Coordinator %s failed: %r', op, e)
+            return None
+        finally:
+            self._waiting.pop(id_, None)
+
+    async def cache_get(self, key: Hashable) -> Optional[dict]:
+        return await self.call('cache_get', key=cache_key(key)) if self.enabled else None
+
+    def cache_put(self, key: Hashable, result: Optional[dict], ttl: float) -> None:
+        if self.enabled and result is not None and ttl > 0:
+            self._send({'op': 'cache_put', 'key': cache_key(key), 'ttl': ttl, 'result': result})
+
+    async def totals(self) -> Optional[Dict[str, float]]:
+        return await self.call('totals')
+
+    def _send(self, message: dict) -> None:
+        message['worker'] = self.worker
+        self._writer.write(json.dumps(message, separators=(',', ':')).encode() + b'\n')
+
+    async def _read(self, reader: asyncio.StreamReader) -> None:
+        try:
+            while line := await reader.readline():
+                message = json.loads(line)
+                if (future := self._waiting.get(message['id'])) is not None and not future.done():
+                    future.set_result(message['result'])
+        except (ConnectionError, ValueError) as e:
+            logging.error('Coordinator connection failed: %r', e)
+        logging.warning('Coordinator disconnected, worker %s runs standalone', self.worker)
+        self._writer = None
+        self.health.adopt({})   # merged averages would only get older
+        for future in self._waiting.values():
+            if not future.done():
+                future.set_exception(ConnectionError('coordinator disconnected'))
+
+    async def report(self, collect: Callable[[], Dict[str, float]]) -> None:
+        """Sends stats and local node health, scores use the merged health of all workers afterwards"""
+
+        merged = await self.call('report', stats=collect(), health=self.health.report())
+        if merged:
+            self.health.adopt(merged)
+
+    async def _report(self, collect: Callable[[], Dict[str, float]]) -> None:
+        while self.enabled:
+            await self.report(collect)
+            await asyncio.sleep(self.interval)
+
+    def _create_task(self, coro) -> None:
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+coordinator = CoordinatorClient()
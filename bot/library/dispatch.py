@@ -0,0 +1,257 @@
+import asyncio
+import logging
+from heapq import heappush, heappop
+from itertools import count
+from time import monotonic
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+import hikari
+
+from bot.config import DISPATCH_CONCURRENCY, DISPATCH_ROUTE_LIMIT
+from bot.library.metrics import command_responded
+from bot.library.tracing import span
+
+INTERACTION, MESSAGE, EDIT, DELETE = range(4)     # priorities, lowest first
+PRIORITY_NAMES = ('interaction', 'message', 'edit', 'delete')
+
+class Bucket:
+    """Local token bucket for one REST route, drained before Discord would reject requests"""
+
+    __slots__ = ('limit', 'period', 'tokens', 'updated')
+
+    def __init__(self, limit: int, period: float) -> None:
+        self.limit = limit
+        self.period = period
+        self.tokens = float(limit)
+        self.updated = monotonic()
+
+    def acquire(self) -> float:
+        """Takes a token, or returns the seconds to wait for the next one"""
+
+        now = monotonic()
+        self.tokens = min(self.limit, self.tokens + (now - self.updated) * self.limit / self.period)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) * self.period / self.limit
+
+class Operation:
+
+    __slots__ = ('call', 'kwargs', 'priority', 'route', 'key', 'future', 'created', 'dropped')
+
+    def __init__(self, call: Callable[..., Awaitable[Any]], kwargs: Dict[str, Any], priority: int,
+            route: Optional[Hashable], key: Optional[Hashable]) -> None:
+        self.call = call
+        self.kwargs = kwargs
+        self.priority = priority
+        self.route = route
+        self.key = key
+        self.future = asyncio.get_running_loop().create_future()
+        self.future.add_done_callback(lambda f: f.cancelled() or f.exception())    # fire and forget is fine
+        self.created = monotonic()
+        self.dropped = False
+
+class Dispatcher:
+    """
+    Central queue for outbound Discord REST calls.
+
+    Pending operations on the same message are keyed by `(channel, message)`:
+    a new edit merges into the pending one and a delete drops it. Interaction
+    responses skip the queue, new messages run before edits and deletes.
+    Routes are paced by local buckets so workers never sit in a rate limit.
+    """
+
+    def __init__(self, concurrency: int = DISPATCH_CONCURRENCY,
+            route_limit: Tuple[int, float] = DISPATCH_ROUTE_LIMIT) -> None:
+        self.concurrency = concurrency
+        self.route_limit = route_limit
+        self.rest: Optional[hikari.api.RESTClient] = None
+        self.submitted, self.executed, self.coalesced, self.superseded, self.errors = 0, 0, 0, 0, 0
+        self.running = 0
+
+        self._seq = count()
+        self._ready: List[tuple] = []       # (priority, seq, op)
+        self._delayed: List[tuple] = []     # (due, seq, op), waiting for a route token
+        self._pending: Dict[Hashable, Operation] = {}
+        self._buckets: Dict[Hashable, Bucket] = {}
+        self._wait_total = [0.0] * len(PRIORITY_NAMES)
+        self._wait_max = [0.0] * len(PRIORITY_NAMES)
+        self._done = [0] * len(PRIORITY_NAMES)
+        self._wakeup: Optional[asyncio.Event] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._task: Optional[asyncio.Task] = None
+        self._tasks = set()
+
+    def start(self, rest: hikari.api.RESTClient) -> None:
+        self.rest = rest
+        self._wakeup, self._slots = asyncio.Event(), asyncio.Semaphore(self.concurrency)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self) -> None:
+        """Stops the queue, operations that did not start are cancelled"""
+
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        for _, _, op in (*self._ready, *self._delayed):
+            op.future.cancel()
+        self._ready.clear()
+        self._delayed.clear()
+        self._pending.clear()
+
+    def submit(self, call: Callable[..., Awaitable[Any]], priority: int = MESSAGE,
+            route: Optional[Hashable] = None, key: Optional[Hashable] = None, **kwargs) -> asyncio.Future:
+        """Queues `call(**kwargs)`, interaction responses never wait behind other operations"""
+
+        self.submitted += 1
+        op = Operation(call, kwargs, priority, route, key)
+        if self._task is None or priority == INTERACTION:   # interaction tokens have their own limits
+            self._create_task(self._execute(op))
+            return op.future
+        if key is not None:
+            self._pending[key] = op
+        heappush(self._ready, (priority, next(self._seq), op))
+        self._wakeup.set()
+        return op.future
+
+    def create(self, channel: int, **kwargs) -> asyncio.Future:
+        return self.submit(self.rest.create_message, MESSAGE, ('message', channel), channel=channel, **kwargs)
+
+    def edit(self, channel: int, message: hikari.SnowflakeishOr[hikari.PartialMessage], **kwargs) -> asyncio.Future:
+        """Edits a message, merged into a pending edit of the same message if any"""
+
+        key = (channel, int(message))
+        if (pending := self._pending.get(key)) is not None:
+            if pending.priority != DELETE:
+                self.coalesced += 1
+                pending.kwargs.update(kwargs)
+            return pending.future
+        return self.submit(self.rest.edit_message, EDIT, ('message', channel), key,
+            channel=channel, message=message, **kwargs)
+
+    def delete(self, channel: int, message: hikari.SnowflakeishOr[hikari.PartialMessage]) -> asyncio.Future:
+        """Deletes a message, pending edits of it are dropped"""
+
+        key = (channel, int(message))
+        if (pending := self._pending.get(key)) is not None:
+            if pending.priority == DELETE:
+                return pending.future
+            self._drop(pending)
+        return self.submit(self.rest.delete_message, DELETE, ('delete', channel), key,
+            channel=channel, message=message)
+
+    async def delete_response(self, response, delay: float) -> None:
+        """Deletes a command response after `delay` seconds, like `delete_after`"""
+
+        await asyncio.sleep(delay)
+        try:
+            message = await response.message()
+            await self.delete(message.channel_id, message)
+        except hikari.NotFoundError:
+            pass
+        except Exception as e:
+            logging.error('Failed to delete response: %s', e)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'depth': len(self._ready) + len(self._delayed), 'delayed': len(self._delayed), 'running': self.running,
+            'submitted': self.submitted, 'executed': self.executed, 'coalesced': self.coalesced,
+            'superseded': self.superseded, 'errors': self.errors,
+            'wait_ms': {name: round(1000 * self._wait_total[i] / self._done[i], 1) if self._done[i] else 0
+                for i, name in enumerate(PRIORITY_NAMES)},
+            'max_wait_ms': {name: round(1000 * self._wait_max[i], 1) for i, name in enumerate(PRIORITY_NAMES)},
+        }
+
+    def _drop(self, op: Operation) -> None:
+
+        op.dropped = True
+        self.superseded += 1
+        if self._pending.get(op.key) is op:
+            del self._pending[op.key]
+        if not op.future.done():
+            op.future.set_result(None)
+
+    def _next(self) -> Tuple[Optional[Operation], Optional[float]]:
+        """Next operation that can run now, or the seconds until one might"""
+
+        now = monotonic()
+        while self._delayed and self._delayed[0][0] <= now:
+            _, seq, op = heappop(self._delayed)
+            heappush(self._ready, (op.priority, seq, op))
+
+        while self._ready:
+            _, seq, op = heappop(self._ready)
+            if op.dropped:
+                continue
+            if op.route is not None:
+                if len(self._buckets) > 4096:
+                    self._prune(now)
+                bucket = self._buckets.get(op.route)
+                if bucket is None:
+                    bucket = self._buckets[op.route] = Bucket(*self.route_limit)
+                if (wait := bucket.acquire()) > 0:
+                    heappush(self._delayed, (now + wait, seq, op))
+                    continue
+            return op, None
+        return None, (self._delayed[0][0] - now if self._delayed else None)
+
+    def _prune(self, now: float) -> None:
+        for route in [route for route, bucket in self._buckets.items() if now - bucket.updated > bucket.period]:
+            del self._buckets[route]    # refilled anyway
+
+    async def _run(self) -> None:
+        while True:
+            await self._slots.acquire()
+            op, wait = self._next()
+            if op is None:
+                self._slots.release()
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            if self._pending.get(op.key) is op:
+                del self._pending[op.key]   # later edits queue a new operation
+            self._create_task(self._execute(op, release=True))
+
+    async def _execute(self, op: Operation, release: bool = False) -> None:
+
+        waited = monotonic() - op.created
+        self._wait_total[op.priority] += waited
+        self._wait_max[op.priority] = max(self._wait_max[op.priority], waited)
+        self._done[op.priority] += 1
+
+        self.running += 1
+        try:
+            result = await op.call(**op.kwargs)
+            if not op.future.done():    # cancelled if the caller stopped waiting
+                op.future.set_result(result)
+        except Exception as e:
+            self.errors += 1
+            if not op.future.done():
+                op.future.set_exception(e)    # logged by the caller awaiting it, if it cares
+        finally:
+            self.running -= 1
+            self.executed += 1
+            if release:
+                self._slots.release()
+
+    def _create_task(self, coro: Awaitable[Any]) -> None:
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)   # keep a reference until done
+        task.add_done_callback(self._tasks.discard)
+
+dispatcher = Dispatcher()
+
+async def respond(ctx, *args, delete_after: Optional[float] = None, **kwargs):
+    """`ctx.respond` through the dispatcher at interaction priority"""
+
+    with span('respond'):
+        response = await dispatcher.submit(lambda: ctx.respond(*args, **kwargs), INTERACTION)
+    command_responded(ctx)
+    if delete_after is not None:
+        dispatcher._create_task(dispatcher.delete_response(response, delete_after))
+    return response
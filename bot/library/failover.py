@@ -0,0 +1,150 @@
+import asyncio
+import logging
+from time import time, monotonic
+from typing import Dict, List, Optional, Set
+
+from lavalink import Node, NodeManager, DeferredAudioTrack, NodeChangedEvent
+from lavalink.errors import ClientError
+
+from bot.config import NODE_MIGRATE_CONCURRENCY
+from bot.library.health import node_health, TimedNode
+
+class NodeFailover:
+    """
+    Moves players between Lavalink nodes, on node loss or when a node is drained.
+
+    Each player is recreated on the best scored node with its current track,
+    position, pause state, volume and filters in one update; the queue lives
+    on the player and moves with it. Players already placed during a move
+    count against their new node, so a move spreads over the healthy nodes.
+    """
+
+    def __init__(self, concurrency: int = NODE_MIGRATE_CONCURRENCY) -> None:
+        self.concurrency = concurrency
+        self.draining: Set[str] = set()     # names of nodes that get no new players
+        self.moved, self.failed, self.evacuations = 0, 0, 0
+        self.last_ms = 0.0
+
+    def candidates(self, nodes: List[Node]) -> List[Node]:
+        """Nodes open for players, draining nodes only if nothing else is left"""
+        return [node for node in nodes if node.name not in self.draining] or nodes
+
+    async def evacuate(self, manager: NodeManager, node: Node, alive: bool = False) -> int:
+        """Moves every player off `node`, `alive` if the node can still be told to destroy them"""
+
+        players = node.players
+        if not players:
+            return 0
+        self.evacuations += 1
+        for player in players:
+            if player.is_playing and not player.paused:
+                player._last_position, player._last_update = player.position, int(time() * 1000)
+            player._internal_pause = True   # freezes the position until the player is recreated
+
+        moved = await self._move_all(manager, players, alive)
+        logging.info('Moved %d/%d players off node %s in %s ms', moved, len(players), node.name, self.last_ms)
+        return moved
+
+    async def resume(self, manager: NodeManager) -> int:
+        """Moves the players that found no node on the last move, once a node is ready"""
+
+        players, manager._player_queue = manager._player_queue, []
+        return await self._move_all(manager, players)
+
+    async def drain(self, manager: NodeManager, node: Node) -> int:
+        """Stops placing players on `node` and moves its players away, for rolling upgrades"""
+
+        self.draining.add(node.name)
+        return await self.evacuate(manager, node, alive=True)
+
+    def undrain(self, node: Node) -> None:
+        self.draining.discard(node.name)
+
+    def stats(self) -> Dict[str, object]:
+        return {'moved': self.moved, 'failed': self.failed, 'evacuations': self.evacuations,
+            'last_ms': self.last_ms, 'draining': sorted(self.draining)}
+
+    async def _move_all(self, manager: NodeManager, players: list, alive: bool = False) -> int:
+
+        start = monotonic()
+        slots, placed = asyncio.Semaphore(self.concurrency), {}
+        results = await asyncio.gather(*(self._move(manager, player, alive, slots, placed) for player in players))
+        self.last_ms = round((monotonic() - start) * 1000, 1)
+        return sum(results)
+
+    async def _move(self, manager: NodeManager, player, alive: bool,
+            slots: asyncio.Semaphore, placed: Dict[str, int]) -> bool:
+
+        async with slots:
+            node = player.node
+            if alive:
+                try:
+                    await node.destroy_player(player._internal_id)
+                except ClientError as e:
+                    logging.warning('Failed to destroy player %s on node %s: %r', player.guild_id, node.name, e)
+
+            tried = [node] if alive or not node.available else []  # a reconnected node may take them back
+            while (target := node_health.best(self.candidates(manager.nodes), node.region, tried, placed)) is not None:
+                placed[target.name] = placed.get(target.name, 0) + 1
+                try:
+                    await self.migrate(player, target)
+                    self.moved += 1
+                    return True
+                except (ClientError, asyncio.TimeoutError) as e:
+                    placed[target.name] -= 1
+                    tried.append(target)
+                    logging.error('Failed to move player %s to node %s: %r', player.guild_id, target.name, e)
+
+        self.failed += 1
+        if player not in manager._player_queue:
+            manager._player_queue.append(player)    # moved once any node is ready again
+        return False
+
+    async def migrate(self, player, target: Node) -> None:
+        """Recreates `player` on `target`, like `change_node` without touching the old node"""
+
+        # copies DefaultPlayer.change_node and the player internals it uses (_next, _internal_pause,
+        # _last_update, NodeManager._player_queue) as of lavalink.py 5.1.0, recheck them on upgrade.
+        # change_node itself cannot be used: it reads the position after the voice update, leaves
+        # _next unset so the start event from the new node drops the track, sends the filters in a
+        # second request and keeps the target node on failure
+        old, position = player.node, player.position   # a state update from the new node may reset the position
+        player.node = target
+        try:
+            if player._voice_state:
+                await player._dispatch_voice_update()
+            if player.current:
+                track = player.current.track
+                if isinstance(player.current, DeferredAudioTrack) and track is None:
+                    track = await player.current.load(player.client)
+                player._next = player.current   # the start event from the new node sets it as current again
+                await target.update_player(player._internal_id, encoded_track=track,
+                    position=position, paused=player.paused, volume=player.volume,
+                    filters=list(player.filters.values()))
+                player._last_update = int(time() * 1000)
+        except Exception:
+            player.node = old
+            raise
+        player._internal_pause = False
+        await player.client._dispatch_event(NodeChangedEvent(player, old, target))
+
+node_failover = NodeFailover()
+
+class HealthNodeManager(NodeManager):
+    """Node manager placing players on the best scored node and moving them off lost nodes"""
+
+    def add_node(self, host: str, port: int, password: str, region: str, name: str = None,
+            ssl: bool = False, session_id: Optional[str] = None) -> Node:
+        node = TimedNode(self, host, port, password, region, name, ssl, session_id)
+        self.nodes.append(node)
+        return node
+
+    def find_ideal_node(self, region: str = None, exclude: Optional[List[Node]] = None) -> Optional[Node]:
+        return node_health.best(node_failover.candidates(self.nodes), region, exclude)   # prefers connected nodes
+
+    async def _handle_node_disconnect(self, node: Node):
+        await node_failover.evacuate(self, node)
+
+    async def _handle_node_ready(self, node: Node):
+        if self._player_queue:
+            await node_failover.resume(self)
@@ -1,9 +1,14 @@
 import logging
 
 import lavalink
-import miru
 
-from bot.library.view import PlayerView
+from bot.library.nowplaying import now_playing
+from bot.library.progress import live_progress
+from bot.library.index import track_index
+from bot.library.voice import voice_index
+from bot.library.analytics import play_analytics
+from bot.library.metrics import timed
+from bot.library.tracing import traced
 from .classes.events import VoiceServerUpdate, VoiceStateUpdate
 from bot.logger.custom_logger import track_logger
 
@@ -13,59 +18,39 @@ class EventHandler:
     def __init__(self, bot) -> None:
         self.bot = bot
 
-    async def update_player(self, event):
-
-        async def delete_message(channel_id: int, message_id: int):
-            message = await self.bot.rest.fetch_message(channel_id, message_id)
-            miru.get_view(message).stop()
-            await message.delete()
-        
-        guild_id = event.player.guild_id
-        player = self.bot.d.lavalink.player_manager.get(guild_id)
-        message_id, channel_id = player.message_id, player.text_channel
-        if channel_id and message_id:
-            try:
-                await delete_message(channel_id, message_id)
-            except Exception as e:
-                logging.error('Failed to delete old player: %s', e)
-                return
-        player.message_id, player.text_channel = None, None
-
-        if isinstance(event, lavalink.TrackStartEvent):
-        
-            view = PlayerView(guild_id=guild_id)
-            message = await self.bot.rest.create_message(
-                channel=player.send_channel,
-                embed=PlayerView.get_embed(player),
-                components=view)
-            
-            player.message_id = message.id
-            player.text_channel = player.send_channel
-
-            await view.start(message)
-
     @lavalink.listener(lavalink.TrackStartEvent)
+    @timed('track_start')
+    @traced('track_start')
     async def track_start(self, event: lavalink.TrackStartEvent):
 
-        await self.update_player(event)
+        now_playing.show(self.bot, event.player)     # REST calls must not hold up the node's event reader
+        live_progress.arm(event.player)
         track, guild_id = event.track, event.player.guild_id
         track_logger.info('%s - %s - %s', track.title, track.author, track.uri)
+        track_index.add(track.title, track.author, track.uri, track.source_name)
+        play_analytics.start(guild_id, track, event.player.paused)
         logging.info('Track started on guild: %s', guild_id)
 
     @lavalink.listener(lavalink.TrackEndEvent)
+    @timed('track_end')
     async def track_end(self, event: lavalink.TrackEndEvent):
+        play_analytics.end(event.player.guild_id, event.reason)
         logging.info('Track finished on guild: %s', event.player.guild_id)
 
     @lavalink.listener(lavalink.QueueEndEvent)
+    @timed('queue_finish')
     async def queue_finish(self, event: lavalink.QueueEndEvent):
-        await self.update_player(event)
+        now_playing.finish(self.bot, event.player)
+        live_progress.disarm(event.player.guild_id)
         logging.info('Queue finished on guild: %s', event.player.guild_id)
         
     @lavalink.listener(lavalink.TrackExceptionEvent)
+    @timed('track_exception')
     async def track_exception(self, event: lavalink.TrackExceptionEvent):
         logging.warning('Track exception event happened on guild: %s', event.player.guild_id)
     
     @lavalink.listener(VoiceServerUpdate)
+    @timed('voice_server_update')
     async def voice_server_update(self, event: VoiceServerUpdate):
 
         await self.bot.d.lavalink.voice_update_handler({
@@ -77,6 +62,7 @@ class EventHandler:
         }})
 
     @lavalink.listener(VoiceStateUpdate)
+    @timed('voice_state_update')
     async def voice_state_update(self, event: VoiceStateUpdate):
 
         async def check_voice(bot, event: VoiceStateUpdate):
@@ -84,22 +70,21 @@ class EventHandler:
             bot_id = bot.get_me().id
             cur_state, prev_state = event.cur_state, event.prev_state
             user_id, guild_id = cur_state.user_id, cur_state.guild_id
-            bot_state = bot.cache.get_voice_state(guild_id, bot_id)
+            bot_channel = voice_index.channel_of(guild_id, bot_id)
             player = bot.d.lavalink.player_manager.get(guild_id)
 
-            if not bot_state or user_id == bot_id:
-                if not bot_state and user_id == bot_id:  # bot is disconnected
+            if not bot_channel or user_id == bot_id:
+                if not bot_channel and user_id == bot_id:  # bot is disconnected
                     await player.stop()
                     logging.info('Client disconnected from voice on guild: %s', event.cur_state.guild_id)
                 return
 
             # event occurs in channel not same as bot
-            if not ((prev_state and prev_state.channel_id == bot_state.channel_id) or
-                (cur_state and cur_state.channel_id == bot_state.channel_id)):
+            if not ((prev_state and prev_state.channel_id == bot_channel) or
+                (cur_state and cur_state.channel_id == bot_channel)):
                     return
 
-            states = bot.cache.get_voice_states_view_for_guild(cur_state.guild_id).items()
-            user_count = len([state[0] for state in filter(lambda x: x[1].channel_id == bot_state.channel_id, states)])  # count users in channel with bot
+            user_count = voice_index.count(guild_id, bot_channel)  # users in channel with bot
 
             if user_count != 2:  
                 if user_count == 1:     # bot by itself in voice chat
@@ -0,0 +1,149 @@
+import asyncio
+import logging
+from time import monotonic
+from typing import Any, Awaitable, Dict, Iterable, List, Optional, Tuple
+
+from lavalink import Node
+
+from bot.config import NODE_LATENCY_ALPHA, NODE_LATENCY_WEIGHT, NODE_ERROR_WEIGHT, NODE_PROBE_INTERVAL
+from bot.library.metrics import LAVALINK_REST_SECONDS, LAVALINK_REST_ERRORS
+from bot.library.tracing import span
+
+class NodeHealth:
+    """
+    Scores Lavalink nodes for player placement and search routing.
+
+    A score is the Lavalink stats penalty (playing players, CPU, nulled and
+    deficit frames) plus `latency_weight` points per millisecond of REST
+    latency and `error_weight` points per unit of error rate. Latency and
+    error rate are EWMAs of searches and periodic version probes, with
+    several worker processes the coordinator merges them and scores use the
+    merged averages, while the local ones keep only this worker's samples.
+    Lower is better, nodes without a websocket are only picked as last resort.
+    """
+
+    def __init__(self, alpha: float = NODE_LATENCY_ALPHA, latency_weight: float = NODE_LATENCY_WEIGHT,
+            error_weight: float = NODE_ERROR_WEIGHT, probe_interval: float = NODE_PROBE_INTERVAL) -> None:
+        self.alpha = alpha
+        self.latency_weight = latency_weight
+        self.error_weight = error_weight
+        self.probe_interval = probe_interval
+
+        self._latency: Dict[str, float] = {}    # node -> REST latency EWMA in ms
+        self._errors: Dict[str, float] = {}     # node -> error rate EWMA, 0 to 1
+        self._shared: Dict[str, Dict[str, float]] = {}  # node -> averages of all workers
+        self._requests: Dict[str, int] = {}
+        self._interval: Dict[str, int] = {}     # node -> requests since the last report
+        self._failures: Dict[str, int] = {}
+        self._nodes: List[Node] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, nodes: List[Node]) -> None:
+        self._nodes = nodes
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def record(self, name: str, latency: Optional[float]) -> None:
+        """Adds a request of `latency` ms to the averages of a node, None for a failed request"""
+
+        self._requests[name] = self._requests.get(name, 0) + 1
+        self._interval[name] = self._interval.get(name, 0) + 1
+        failed = latency is None
+        if failed:
+            self._failures[name] = self._failures.get(name, 0) + 1
+        else:
+            previous = self._latency.get(name)
+            self._latency[name] = latency if previous is None else previous + self.alpha * (latency - previous)
+        previous = self._errors.get(name, 0.0)
+        self._errors[name] = previous + self.alpha * (failed - previous)
+
+    def report(self) -> Dict[str, Dict[str, Optional[float]]]:
+        """Local averages and the requests behind them since the last report, for the coordinator"""
+
+        report = {name: {'latency_ms': self._latency.get(name), 'error_rate': errors,
+            'requests': self._interval.get(name, 0)} for name, errors in self._errors.items()}
+        self._interval.clear()
+        return report
+
+    def adopt(self, shared: Dict[str, Dict[str, float]]) -> None:
+        """Scores with the averages of all worker processes from now on, empty to go back to local ones"""
+        self._shared = shared
+
+    def averages(self, name: str) -> Tuple[float, float]:
+        """REST latency in ms and error rate of a node, merged over workers if known"""
+
+        shared = self._shared.get(name, {})
+        return shared.get('latency_ms', self._latency.get(name, 0.0)), shared.get('error_rate', self._errors.get(name, 0.0))
+
+    async def timed(self, node: Node, request: Awaitable[Any], path: str = 'rest') -> Any:
+        """Awaits a REST request to `node`, recording its latency or failure"""
+
+        start = monotonic()
+        try:
+            with span(f'lavalink.{path}', node=node.name):
+                result = await request
+        except Exception:
+            self.record(node.name, None)
+            LAVALINK_REST_ERRORS.labels(node.name, path).inc()
+            raise
+        elapsed = monotonic() - start
+        self.record(node.name, elapsed * 1000)
+        LAVALINK_REST_SECONDS.labels(node.name, path).observe(elapsed)
+        return result
+
+    def score(self, node: Node) -> float:
+
+        stats = node.stats
+        penalty = stats.penalty.total if stats is not None else 0
+        latency, errors = self.averages(node.name)
+        return penalty + self.latency_weight * latency + self.error_weight * errors
+
+    def best(self, nodes: Iterable[Node], region: Optional[str] = None, exclude: Optional[List[Node]] = None,
+            bias: Optional[Dict[str, float]] = None) -> Optional[Node]:
+        """Lowest scored node, in `region` if any node there is connected, `bias` adds points per node name"""
+
+        nodes = [node for node in nodes if node not in (exclude or ())]
+        connected = [node for node in nodes if node.available] or nodes
+        regional = [node for node in connected if node.region == region] if region else []
+        key = (lambda node: self.score(node) + bias.get(node.name, 0)) if bias else self.score
+        return min(regional or connected, key=key, default=None)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {node.name: {
+            'score': round(self.score(node), 1),
+            'latency_ms': round(self.averages(node.name)[0], 1),
+            'error_rate': round(self.averages(node.name)[1], 3),
+            'requests': self._requests.get(node.name, 0), 'errors': self._failures.get(node.name, 0),
+            'connected': node.available,
+        } for node in self._nodes}
+
+    async def _probe(self, node: Node) -> None:
+        try:
+            await self.timed(node, node.get_version(), 'version')
+        except Exception as e:
+            logging.warning('Health probe failed on node %s: %r', node.name, e)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.gather(*(self._probe(node) for node in self._nodes))
+            await asyncio.sleep(self.probe_interval)
+
+node_health = NodeHealth()
+
+class TimedNode(Node):
+    """Node recording the latency of every track load and player update"""
+
+    @property
+    def available(self) -> bool:
+        """Whether the websocket is connected, lavalink 5 reports every node as available"""
+        return self._transport.ws_connected
+
+    async def get_tracks(self, query: str):
+        return await node_health.timed(self, super().get_tracks(query), 'loadtracks')
+
+    async def update_player(self, *args, **kwargs):
+        return await node_health.timed(self, super().update_player(*args, **kwargs), 'update_player')
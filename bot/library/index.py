@@ -0,0 +1,147 @@
+import os
+import re
+import json
+import asyncio
+import logging
+from heapq import nlargest
+from collections import Counter, OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sortedcontainers import SortedList
+
+from bot.config import TRACK_INDEX_SIZE
+
+TOKEN_RX = re.compile(r'\w+')
+
+PLAY_WEIGHT = 1.0       # score added each time a track is played
+SEARCH_WEIGHT = 0.1     # score added each time a track shows up in search results
+SEP, END = '\x00', '\uffff'
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RX.findall(text.casefold())
+
+def source_from_uri(uri: str) -> str:
+    for name in ('youtube', 'spotify', 'deezer'):
+        if name in uri:
+            return name
+    return 'unknown'
+
+class IndexedTrack:
+
+    __slots__ = ('title', 'author', 'uri', 'source_name', 'score', 'tokens')
+
+    def __init__(self, title: str, author: str, uri: str, source_name: str) -> None:
+        self.title = title
+        self.author = author
+        self.uri = uri
+        self.source_name = source_name
+        self.score = 0.0
+        self.tokens = sorted(set(tokenize(f'{title} {author}')))
+
+class TrackIndex:
+    """
+    Memory-bounded prefix index of known tracks, fed by play history and search results.
+
+    Every `token + SEP + uri` pair is kept in one sorted list, so the tracks
+    matching a query token prefix form a contiguous range found with two bisects.
+    The whole range is ranked, a popular track sorting late is never cut off.
+    """
+
+    def __init__(self, max_tracks: int = TRACK_INDEX_SIZE) -> None:
+        self.max_tracks = max_tracks
+
+        self._tracks: 'OrderedDict[str, IndexedTrack]' = OrderedDict()  # uri -> track, least recently seen first
+        self._keys = SortedList()       # `token + SEP + uri` entries, inserts and removals in O(log n)
+
+    def __len__(self) -> int:
+        return len(self._tracks)
+
+    def add(self, title: str, author: str, uri: str, source_name: str = None, weight: float = PLAY_WEIGHT) -> None:
+        """Adds or refreshes a track, evicting the least recently seen ones past capacity"""
+
+        if not uri or not title:
+            return
+
+        if (track := self._tracks.get(uri)) is None:
+            track = self._tracks[uri] = IndexedTrack(title, author or '', uri, source_name or source_from_uri(uri))
+            self._keys.update(token + SEP + uri for token in track.tokens)
+        else:
+            self._tracks.move_to_end(uri)
+        track.score += weight
+
+        while len(self._tracks) > self.max_tracks:
+            self._evict(next(iter(self._tracks)))
+
+    def search(self, query: str, source_name: Optional[str] = None, limit: int = 5) -> List[IndexedTrack]:
+        """Ranked tracks whose tokens start with every token of `query`"""
+
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        # candidates come from the narrowest token range, the other tokens only filter them
+        ranges = [self._range(token) for token in tokens]
+        lo, hi = min(ranges, key=lambda r: r[1] - r[0])
+        candidates = {key.split(SEP, 1)[1] for key in self._keys.islice(lo, hi)}
+
+        tracks = []
+        for uri in candidates:
+            track = self._tracks[uri]
+            if source_name and track.source_name != source_name:
+                continue
+            if len(tokens) == 1 or all(any(word.startswith(token) for word in track.tokens) for token in tokens):
+                tracks.append(track)
+        return nlargest(limit, tracks, key=lambda track: track.score)
+
+    async def load(self, path: str) -> None:
+        """Rebuilds the index from the track log, keeping the most recently played tracks"""
+
+        entries = await asyncio.to_thread(self.read_log, path)
+        self.build(entries)
+        logging.info('Track index rebuilt with %d tracks', len(self._tracks))
+
+    def read_log(self, path: str) -> List[tuple]:
+        """Parses `title - author - uri` track log lines, text or JSON, into `(title, author, uri, plays)` entries"""
+
+        if not os.path.exists(path):
+            return []
+
+        plays, seen = Counter(), OrderedDict()
+        with open(path, encoding='utf-8', errors='replace') as file:
+            for line in file:
+                try:
+                    message = json.loads(line)['msg'] if line.startswith('{') else line.rstrip('\n').split(': ', 1)[1]
+                    title, author, uri = message.rsplit(' - ', 2)
+                except (IndexError, KeyError, ValueError):
+                    continue
+                plays[uri] += 1
+                seen[uri] = (title, author)
+                seen.move_to_end(uri)
+
+        return [(title, author, uri, plays[uri]) for uri, (title, author) in
+            list(seen.items())[-self.max_tracks:]]
+
+    def build(self, entries: Iterable[tuple]) -> None:
+        """Replaces the index with `(title, author, uri, plays)` entries in one sort"""
+
+        self._tracks.clear()
+        keys = []
+        for title, author, uri, plays in entries:
+            track = self._tracks[uri] = IndexedTrack(title, author, uri, source_from_uri(uri))
+            track.score = plays * PLAY_WEIGHT
+            keys.extend(token + SEP + uri for token in track.tokens)
+        self._keys = SortedList(keys)
+
+    def stats(self) -> Dict[str, int]:
+        return {'tracks': len(self._tracks), 'tokens': len(self._keys)}
+
+    def _range(self, prefix: str) -> Tuple[int, int]:
+        return self._keys.bisect_left(prefix), self._keys.bisect_left(prefix + END)
+
+    def _evict(self, uri: str) -> None:
+
+        track = self._tracks.pop(uri)
+        for token in track.tokens:
+            self._keys.remove(token + SEP + uri)
+
+track_index = TrackIndex()
@@ -0,0 +1,182 @@
+import logging
+from bisect import bisect_left
+from functools import wraps
+from time import perf_counter
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from aiohttp import web
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUEUE_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+class Counter:
+    """Single threaded on the event loop, so updates need no lock"""
+
+    __slots__ = ('value',)
+
+    def __init__(self) -> None:
+        self.value = 0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def samples(self, name: str, labels: str) -> List[str]:
+        return [f'{name}{labels} {self.value}']
+
+class Gauge(Counter):
+
+    __slots__ = ()
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+class Histogram:
+    """Counts are kept per bucket and only made cumulative when scraped, the total count is their sum"""
+
+    __slots__ = ('bounds', 'counts', 'sum')
+
+    def __init__(self, bounds: Sequence[float]) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def samples(self, name: str, labels: str) -> List[str]:
+
+        lines, total, prefix = [], 0, labels[:-1] + ',' if labels else '{'
+        for bound, count in zip((*self.bounds, '+Inf'), self.counts):
+            total += count
+            lines.append(f'{name}_bucket{prefix}le="{bound}"}} {total}')
+        lines.append(f'{name}_sum{labels} {self.sum}')
+        lines.append(f'{name}_count{labels} {total}')
+        return lines
+
+class Family:
+    """A metric and its children per label values, callers keep the children they update often"""
+
+    def __init__(self, name: str, help: str, kind: str, labels: Tuple[str, ...] = (),
+            buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labelnames = labels
+        self.buckets = buckets
+        self.children: Dict[tuple, object] = {}
+
+    def labels(self, *values) -> object:
+        if (child := self.children.get(values)) is None:
+            child = self.children[values] = Histogram(self.buckets) if self.kind == 'histogram' \
+                else Gauge() if self.kind == 'gauge' else Counter()
+        return child
+
+    def clear(self) -> None:
+        self.children.clear()
+
+    def render(self) -> List[str]:
+
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        for values, child in self.children.items():
+            labels = ','.join('{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                for name, value in zip(self.labelnames, values))
+            lines.extend(child.samples(self.name, '{' + labels + '}' if labels else ''))
+        return lines
+
+class Registry:
+    """
+    Metrics in Prometheus text format on a local HTTP endpoint.
+
+    Hot paths only touch plain counters and histogram buckets. Values that
+    already exist elsewhere (cache hits, players per node) are copied in by
+    collectors when `/metrics` is scraped.
+    """
+
+    def __init__(self) -> None:
+        self.families: Dict[str, Family] = {}
+        self.collectors: List[Callable[[], None]] = []
+        self._runner: Optional[web.AppRunner] = None
+
+    def family(self, name: str, help: str, kind: str, labels: Tuple[str, ...] = (), **kwargs) -> Family:
+        family = self.families[name] = Family(name, help, kind, labels, **kwargs)
+        return family
+
+    def counter(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Family:
+        return self.family(name, help, 'counter', labels)
+
+    def gauge(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Family:
+        return self.family(name, help, 'gauge', labels)
+
+    def histogram(self, name: str, help: str, labels: Tuple[str, ...] = (),
+            buckets: Sequence[float] = LATENCY_BUCKETS) -> Family:
+        return self.family(name, help, 'histogram', labels, buckets=buckets)
+
+    def render(self) -> str:
+
+        for collect in self.collectors:
+            try:
+                collect()
+            except Exception as e:
+                logging.error('Metrics collector %s failed: %r', getattr(collect, '__name__', collect), e)
+        return '\n'.join(line for family in self.families.values() for line in family.render()) + '\n'
+
+    async def start(self, host: str, port: int) -> None:
+
+        app = web.Application()
+        app.router.add_get('/metrics', self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+
+    async def close(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.render(), content_type='text/plain', charset='utf-8')
+
+metrics = Registry()
+
+COMMAND_SECONDS = metrics.histogram('musiccat_command_seconds',
+    'Seconds from command invocation to its first response', ('command',))
+LAVALINK_REST_SECONDS = metrics.histogram('musiccat_lavalink_rest_seconds',
+    'Seconds per Lavalink REST request', ('node', 'path'))
+LAVALINK_REST_ERRORS = metrics.counter('musiccat_lavalink_rest_errors_total',
+    'Failed Lavalink REST requests', ('node', 'path'))
+EVENT_SECONDS = metrics.histogram('musiccat_event_handler_seconds',
+    'Seconds spent in Lavalink event handlers', ('event',))
+AUTOCOMPLETE = metrics.counter('musiccat_autocomplete_total',
+    'Autocomplete requests by outcome', ('outcome',))
+CACHE = metrics.counter('musiccat_track_cache_total', 'Track cache lookups by outcome', ('outcome',))
+PLAYERS = metrics.gauge('musiccat_players', 'Players per Lavalink node', ('node', 'state'))
+QUEUE_LENGTH = metrics.gauge('musiccat_queue_length_players',
+    'Connected players with at most `le` queued tracks, recounted on every scrape', ('le',))
+
+_commands: Dict[int, Tuple[str, float]] = {}    # id of context -> (command, start)
+
+def command_started(ctx) -> None:
+    _commands[id(ctx)] = (ctx.command.name, perf_counter())
+
+def command_responded(ctx) -> None:
+    """Observes the first response of a command, later ones and completion are ignored"""
+
+    if (started := _commands.pop(id(ctx), None)) is not None:
+        COMMAND_SECONDS.labels(started[0]).observe(perf_counter() - started[1])
+
+def timed(event: str) -> Callable:
+    """Decorator observing the duration of an event handler"""
+
+    def decorator(func: Callable) -> Callable:
+        histogram = EVENT_SECONDS.labels(event)
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                histogram.observe(perf_counter() - start)
+        return wrapper
+    return decorator
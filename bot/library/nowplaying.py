@@ -0,0 +1,128 @@
+import asyncio
+import logging
+from typing import Dict, Set
+
+import hikari
+
+from bot.config import NOW_PLAYING_DELETE_DELAY
+from bot.library.view import PlayerView
+from bot.library.dispatch import dispatcher
+
+class NowPlaying:
+    """
+    One now playing message per player, edited in place on every track change.
+
+    A new message is only sent when the old one is gone or the player moved to
+    another channel. Deletes run in the background after a delay, so a queue
+    that resumes shortly after ending reuses the message. Updates run as one
+    task per guild, off the Lavalink websocket reader that fires track events.
+    """
+
+    def __init__(self, delete_delay: float = NOW_PLAYING_DELETE_DELAY) -> None:
+        self.delete_delay = delete_delay
+        self.tracks, self.rest_calls = 0, 0
+        self.edits, self.creates, self.deletes = 0, 0, 0
+
+        self._deletes: Dict[int, asyncio.Task] = {}     # guild -> deferred delete
+        self._updates: Dict[int, asyncio.Task] = {}     # guild -> running update
+        self._stale: Set[int] = set()                   # guilds whose track changed during their update
+
+    def show(self, bot, player) -> None:
+        """Schedules an update for `player`, called on track start"""
+
+        if player.guild_id in self._updates:
+            self._stale.add(player.guild_id)    # the running update shows this track on its next pass
+            return
+        self._updates[player.guild_id] = asyncio.get_running_loop().create_task(self._show(bot, player))
+
+    async def update(self, bot, player) -> None:
+        """Shows the current track of `player`"""
+
+        self.tracks += 1
+        if (task := self._deletes.pop(player.guild_id, None)) is not None:
+            task.cancel()
+
+        message, view = player.message, player.view
+        if message is not None and message.channel_id == player.send_channel:
+            view.sync(player)
+            try:
+                self.rest_calls += 1
+                edited = await dispatcher.edit(message.channel_id, message,
+                    embed=PlayerView.get_embed(player), components=view)
+                if edited is not None:  # None if a delete superseded the edit
+                    player.message = edited
+                    self.edits += 1
+                    return
+                view.stop()
+            except hikari.NotFoundError:
+                view.stop()     # deleted by a user, send a new one
+            except hikari.HTTPError as e:
+                logging.error('Failed to edit player on guild: %s, Reason: %s', player.guild_id, e)
+                return
+        elif message is not None:
+            self._schedule(bot, player, 0)
+
+        view = PlayerView(guild_id=player.guild_id)
+        self.rest_calls += 1
+        player.message = await dispatcher.create(
+            player.send_channel, embed=PlayerView.get_embed(player), components=view)
+        player.view = view
+        self.creates += 1
+        await view.start(player.message)
+
+    def finish(self, bot, player) -> None:
+        """Removes the message of `player` after the delete delay, called on queue end"""
+
+        if player.message is not None and player.guild_id not in self._deletes:
+            self._schedule(bot, player, self.delete_delay)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'tracks': self.tracks, 'rest_calls': self.rest_calls, 'edits': self.edits,
+            'creates': self.creates, 'deletes': self.deletes,
+            'rest_per_track': round(self.rest_calls / self.tracks, 2) if self.tracks else 0,
+        }
+
+    async def _show(self, bot, player) -> None:
+
+        try:
+            while True:
+                self._stale.discard(player.guild_id)
+                if player.is_playing:   # the track may have ended before the task ran
+                    await self.update(bot, player)
+                if player.guild_id not in self._stale:
+                    break
+        except hikari.HTTPError as e:
+            logging.error('Failed to send player on guild: %s, Reason: %s', player.guild_id, e)
+        except Exception:
+            logging.exception('Failed to update player on guild: %s', player.guild_id)
+        finally:
+            del self._updates[player.guild_id]
+
+    def _schedule(self, bot, player, delay: float) -> None:
+
+        message, view = player.message, player.view
+        player.message, player.view = (message, view) if delay else (None, None)
+        task = asyncio.get_running_loop().create_task(self._delete(bot, player, message, view, delay))
+        if delay:
+            self._deletes[player.guild_id] = task
+
+    async def _delete(self, bot, player, message: hikari.Message, view: PlayerView, delay: float) -> None:
+
+        if delay:
+            await asyncio.sleep(delay)
+            if player.message is message:
+                player.message, player.view = None, None
+            del self._deletes[player.guild_id]
+
+        view.stop()
+        try:
+            self.rest_calls += 1
+            await dispatcher.delete(message.channel_id, message)
+            self.deletes += 1
+        except hikari.NotFoundError:
+            pass
+        except hikari.HTTPError as e:
+            logging.error('Failed to delete old player: %s', e)
+
+now_playing = NowPlaying()
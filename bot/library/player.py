@@ -1,9 +1,14 @@
-from random import randrange
+from random import randrange, shuffle
 
 from typing import Dict, List, Optional, Union
 from lavalink import DefaultPlayer, DeferredAudioTrack, QueueEndEvent, AudioTrack
 from lavalink.common import MISSING
 
+from bot.library.classes.queue import TrackQueue
+from bot.library.classes.history import PlayHistory
+from bot.library.analytics import play_analytics
+from bot.config import LIVE_PROGRESS
+
 class MusicCatPlayer(DefaultPlayer):
     """Custom lavalink player for MusicCat"""
 
@@ -13,10 +18,14 @@ class MusicCatPlayer(DefaultPlayer):
     
     def __init__(self, guild_id: int, node):
         super().__init__(guild_id, node)
-        self.recently_played: List[AudioTrack] = []
-        self.message_id = None
-        self.text_channel = None
+        self.queue: TrackQueue = TrackQueue()
+        self.recently_played: PlayHistory = PlayHistory(guild_id)
+        self.message = None     # now playing message and its view, edited in place on track change
+        self.view = None
         self.send_channel = None
+        self.live_progress: bool = LIVE_PROGRESS
+        self.render_cache: Dict[str, tuple] = {}   # rendered embed parts keyed by player versions
+        self.queue_view = None      # latest /queue view, older ones are stopped
 
     async def play(self,
                    track: Optional[Union[AudioTrack, 'DeferredAudioTrack', Dict[str, Union[Optional[str], bool, int]]]] = None,
@@ -75,6 +84,19 @@ class MusicCatPlayer(DefaultPlayer):
 
         await self.play_track(track, start_time, end_time, no_replace, volume, pause, **kwargs)
 
+    async def play_track(self, track, *args, **kwargs):
+
+        try:
+            await super().play_track(track, *args, **kwargs)
+        except Exception:
+            self._next = None   # the node never got the track, no start event will clear it
+            raise
+
+    @property
+    def is_starting(self) -> bool:
+        """Whether a track was sent to the node and its start event is not handled yet"""
+        return self._next is not None
+
     async def stop(self):
         """|coro|
 
@@ -84,6 +106,14 @@ class MusicCatPlayer(DefaultPlayer):
         await self.client._dispatch_event(QueueEndEvent(self))
         await self._clear()
 
+    async def set_pause(self, pause: bool):
+        """|coro|
+
+        Sets the paused state, paused time does not count as listened.
+        """
+        await super().set_pause(pause)
+        play_analytics.pause(self.guild_id, pause)
+
     async def play_previous(self):
         """|coro|
 
@@ -95,8 +125,9 @@ class MusicCatPlayer(DefaultPlayer):
 
         assert len(self.recently_played) >= 2
 
-        self.queue = self.recently_played[-2:] + self.queue
-        self.recently_played = self.recently_played[:-2]
+        self.queue.insert(0, await self.recently_played.pop(self.client))  # current, always in memory
+        if (previous := await self.recently_played.pop(self.client)) is not None:
+            self.queue.insert(0, previous)
 
         await self.play(index=0)
 
@@ -109,6 +140,22 @@ class MusicCatPlayer(DefaultPlayer):
         await self.play()
         return current
     
+    def add_tracks(self, tracks: List[AudioTrack], requester: int = 0,
+            user_data: Optional[Dict] = None, shuffle_tracks: bool = False):
+        """
+        Adds tracks to the queue in one shot, shuffling them in place first if requested.
+        All tracks share the same `user_data` dict (e.g. playlist metadata).
+        """
+        if shuffle_tracks:
+            shuffle(tracks)     # Fisher-Yates, O(n)
+
+        user_data = user_data if user_data is not None else {}
+        for track in tracks:
+            track.user_data = user_data
+            if requester != 0:
+                track.requester = requester
+        self.queue.extend(tracks)
+
     def remove(self, index):
         """
         Removes track by index from queue.
@@ -121,6 +168,6 @@ class MusicCatPlayer(DefaultPlayer):
         self.queue.clear()
         self.recently_played.clear()
         self.loop, self.shuffle = self.LOOP_NONE, False
-        self.send_channel, self.text_channel = None, None
+        self.send_channel = None
         await self.clear_filters()
     
\ No newline at end of file
@@ -0,0 +1,141 @@
+import asyncio
+import logging
+from time import monotonic
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+import hikari
+
+from bot.config import LIVE_PROGRESS_TICK, LIVE_PROGRESS_RATE, LIVE_PROGRESS_CONCURRENCY, LIVE_PROGRESS_PAUSED
+from bot.library.classes.wheel import TimerWheel
+from bot.library.dispatch import dispatcher
+from bot.library.view import PlayerView
+from bot.library.render import BAR_SLOTS
+
+def bar_slot(position: int, duration: int) -> int:
+    return min(int(position / duration * BAR_SLOTS), BAR_SLOTS - 1) if duration > 0 else 0
+
+def next_change(position: int, duration: int) -> float:
+    """Seconds until the progress bar moves to the next slot"""
+
+    boundary = (bar_slot(position, duration) + 1) * duration / BAR_SLOTS
+    return max(boundary - position, 0) / 1000
+
+class LiveProgress:
+    """
+    Live progress bars on now playing messages, for every guild from one timer wheel.
+
+    Each player has a single timer set to the moment its bar moves to the next
+    of the 12 slots, so a track costs at most 12 edits. Due players are edited
+    at most `rate` times per second with bounded concurrency; when demand is
+    higher, players wait in arrival order and render their latest position.
+    """
+
+    def __init__(self, tick: float = LIVE_PROGRESS_TICK, rate: float = LIVE_PROGRESS_RATE,
+            concurrency: int = LIVE_PROGRESS_CONCURRENCY, paused: float = LIVE_PROGRESS_PAUSED) -> None:
+        self.tick = tick
+        self.rate = rate
+        self.concurrency = concurrency
+        self.paused = paused
+        self.edits, self.skipped, self.errors = 0, 0, 0
+
+        self.wheel = TimerWheel(tick, now=monotonic())
+        self._get_player: Optional[Callable] = None
+        self._due: 'OrderedDict[int, None]' = OrderedDict()     # guilds waiting for an edit, oldest first
+        self._rendered: Dict[int, Tuple[int, int]] = {}         # guild -> (id of track, slot) last shown
+        self._budget = 0.0
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._task: Optional[asyncio.Task] = None
+        self._tasks = set()
+
+    def start(self, get_player: Callable) -> None:
+        self._get_player = get_player
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def arm(self, player) -> None:
+        """Starts tracking a player whose now playing message was just rendered"""
+
+        if not player.live_progress or not player.current or player.current.stream:
+            self.wheel.cancel(player.guild_id)
+            return
+        self._rendered[player.guild_id] = (id(player.current), bar_slot(player.position, player.current.duration))
+        self.wheel.schedule(player.guild_id, next_change(player.position, player.current.duration))
+
+    def disarm(self, guild_id: int) -> None:
+        self.wheel.cancel(guild_id)
+        self._due.pop(guild_id, None)
+        self._rendered.pop(guild_id, None)
+
+    def step(self, now: float) -> None:
+        """Expires timers up to `now` and queues the players whose bar moved"""
+
+        for guild_id in self.wheel.advance(now):
+            player = self._get_player(guild_id)
+            if player is None or player.message is None or not player.is_playing \
+                    or not player.live_progress or player.current.stream:
+                self.disarm(guild_id)
+                continue
+            if player.paused:
+                self.skipped += 1
+                self.wheel.schedule(guild_id, self.paused)
+                continue
+
+            current, position = player.current, player.position
+            if self._rendered.get(guild_id) != (id(current), bar_slot(position, current.duration)):
+                self._due[guild_id] = None
+            else:
+                self.skipped += 1
+            self.wheel.schedule(guild_id, next_change(position, current.duration))
+
+    def take(self, elapsed: float) -> list:
+        """Due guilds that fit in the edit budget for `elapsed` seconds"""
+
+        self._budget = min(self._budget + elapsed * self.rate, self.rate)
+        guilds = []
+        while self._due and self._budget >= 1:
+            guilds.append(self._due.popitem(last=False)[0])
+            self._budget -= 1
+        return guilds
+
+    def stats(self) -> Dict[str, int]:
+        return {'players': len(self.wheel), 'due': len(self._due), 'edits': self.edits,
+            'skipped': self.skipped, 'errors': self.errors}
+
+    async def _render(self, guild_id: int) -> None:
+
+        player = self._get_player(guild_id)
+        if player is None or player.message is None or not player.is_playing:
+            return
+        async with self._slots:
+            # the track may have ended or the message gone while waiting for a slot
+            if player.message is None or not player.is_playing:
+                return
+            current = player.current
+            self._rendered[guild_id] = (id(current), bar_slot(player.position, current.duration))
+            try:
+                await dispatcher.edit(player.message.channel_id, player.message, embed=PlayerView.get_embed(player))
+                self.edits += 1
+            except hikari.HTTPError as e:
+                self.errors += 1
+                logging.warning('Failed to update progress on guild: %s, Reason: %s', guild_id, e)
+
+    async def _run(self) -> None:
+
+        last = monotonic()
+        while True:
+            await asyncio.sleep(self.tick)
+            now = monotonic()
+            self.step(now)
+            for guild_id in self.take(now - last):
+                task = asyncio.get_running_loop().create_task(self._render(guild_id))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            last = now
+
+live_progress = LiveProgress()
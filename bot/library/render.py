@@ -0,0 +1,99 @@
+from functools import lru_cache
+from typing import Tuple
+
+from bot.constants import EMOJI_RADIO_BUTTON, EMOJI_RESUME_PLAYER, EMOJI_PAUSE_PLAYER
+
+BAR_SLOTS = 12
+AUTHOR_SOURCES = ('deezer', 'spotify')      # sources whose titles do not include the artist
+
+# every state of the progress bar, the last one has no radio button (position past the end)
+BARS = tuple(''.join(EMOJI_RADIO_BUTTON if i == slot else '▬' for i in range(BAR_SLOTS))
+    for slot in range(BAR_SLOTS + 1))
+PLAYER_BARS = {
+    paused: tuple(f'{emoji} {bar}' for bar in BARS)
+    for paused, emoji in ((False, EMOJI_PAUSE_PLAYER), (True, EMOJI_RESUME_PLAYER))
+}
+
+def bar_index(percent: float) -> int:
+    index = int(percent * BAR_SLOTS)
+    return index if 0 <= index < BAR_SLOTS else BAR_SLOTS
+
+@lru_cache(maxsize=16384)
+def format_seconds(seconds: int, option: str = None) -> str:
+
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+
+    if days and (option == 'd' or not option):
+        return '%d:%02d:%02d:%02d' % (days, hours, minutes, seconds)
+    elif hours and (option == 'h' or not option):
+        return '%d:%02d:%02d' % (days * 24 + hours, minutes, seconds)
+    return '%d:%02d' % ((days * 24 + hours) * 60 + minutes, seconds)
+
+def format_time(time: int, option: str = None) -> str:
+    """Milliseconds as `[d:][h:]m:ss`, memoized per second"""
+    return format_seconds(int(time // 1000), option)
+
+def progress_bar(percent: float) -> str:
+    return BARS[bar_index(percent)]
+
+def player_bar(player) -> str:
+
+    current = player.current
+    bars = PLAYER_BARS[bool(player.paused)]
+    if current.stream:
+        return f'{bars[bar_index(0.99)]} `LIVE`'
+    position = player.position
+    return '{} `{} | {}`'.format(bars[bar_index(position / current.duration)],
+        format_time(position), format_time(current.duration))
+
+def track_line(track) -> str:
+    """`[title](uri) `duration`` fragment of a track, cached on the track"""
+
+    if (line := track.extra.get('line')) is None:
+        line = '[{}]({}) `{}`'.format(track.title, track.uri, 'LIVE' if track.stream else format_time(track.duration))
+        if track.source_name in AUTHOR_SOURCES:
+            line += f' {track.author}'
+        track.extra['line'] = line
+    return line
+
+def track_card(track) -> str:
+    """Title, author and duration lines of the player and play embeds, cached on the track"""
+
+    if (card := track.extra.get('card')) is None:
+        card = track.extra['card'] = '[{}]({})\n{} `{}`'.format(
+            track.title, track.uri, track.author, 'LIVE' if track.stream else format_time(track.duration))
+    return card
+
+def track_header(track) -> Tuple[str, str]:
+    """Title/author and playlist lines of `/now` and `/queue`, cached on the track"""
+
+    if (header := track.extra.get('header')) is None:
+        playlist = ''
+        if track.user_data:
+            playlist = 'Playlist [{}]({})\n'.format(
+                track.user_data.get('playlist_name', 'Unknown Playlist'), track.user_data.get('playlist_url', '#'))
+        header = track.extra['header'] = ('[{}]({})\n{}\n'.format(track.title, track.uri, track.author), playlist)
+    return header
+
+def now_description(player) -> str:
+    """Description of `/now` and `/queue` without the queue lines"""
+
+    current = player.current
+    head, playlist = track_header(current)
+    return '{}{}\n\n{}Requested <@!{}>\n'.format(head, player_bar(player), playlist, current.requester)
+
+def queue_page(player, page: int, size: int = 10) -> str:
+    """Numbered queue lines of one page, rebuilt only when the queue version or page changes"""
+
+    key = (player.queue.version, page, size)
+    if (cached := player.render_cache.get('queue_page')) is not None and cached[0] == key:
+        return cached[1]
+
+    start = page * size
+    lines = ''.join('\n{}. {}'.format(i, track_line(track))
+        for i, track in enumerate(player.queue[start:start + size], start + 1))
+    text = '\n**Up next:**' + lines if lines else ''
+    player.render_cache['queue_page'] = (key, text)
+    return text
@@ -0,0 +1,286 @@
+import os
+import json
+import asyncio
+import logging
+from time import time, monotonic
+from typing import Dict, List, Optional, Tuple
+
+import lavalink
+from lavalink import filters as lavalink_filters
+
+from bot.config import SNAPSHOT_PATH, SNAPSHOT_INTERVAL, SNAPSHOT_COMPACT, SNAPSHOT_MAX_AGE, \
+    SNAPSHOT_RESTORE_CONCURRENCY, SNAPSHOT_JOIN_INTERVAL
+from bot.library.cache import copy_track
+from bot.library.store import track_store
+
+def fingerprint(player) -> tuple:
+    """Changes whenever the saved state of a player (other than its position) does"""
+
+    return (player.current.track if player.current else None, player.queue.version, player.channel_id,
+        player.send_channel, player.loop, player.shuffle, player.paused, player.volume,
+        tuple((name, repr(f.values)) for name, f in player.filters.items()))
+
+def capture(player) -> dict:
+    """State of a player by reference, cheap enough for the event loop, `dump_player` serializes it"""
+
+    current = player.current
+    return {
+        'channel': player.channel_id, 'send_channel': player.send_channel, 'current': current,
+        'position': player.position if current else 0, 'paused': player.paused,
+        'loop': player.loop, 'shuffle': player.shuffle, 'volume': player.volume,
+        'filters': [[type(f).__name__, f.values.copy()] for f in player.filters.values()],
+        'queue': list(player.queue),
+    }
+
+def dump_player(state: dict) -> dict:
+    """Compact form of a captured state, `user_data` dicts shared by queued tracks are stored once"""
+
+    metas, meta_ids = [], {}
+
+    def entry(track) -> list:
+        key = id(track.user_data)
+        if key not in meta_ids:
+            meta_ids[key] = len(metas)
+            metas.append(track.user_data or {})
+        return [track.track, track.requester, meta_ids[key]]
+
+    current = state['current']
+    return {**state, 'current': entry(current) if current else None,
+        'queue': [entry(track) for track in state['queue']], 'meta': metas}
+
+class JoinPacer:
+    """Spaces out voice state updates per shard to stay under the gateway send limit"""
+
+    def __init__(self, interval: float = SNAPSHOT_JOIN_INTERVAL) -> None:
+        self.interval = interval
+        self._next: Dict[int, float] = {}
+
+    async def wait(self, shard_id: int) -> None:
+        now = monotonic()
+        at = self._next[shard_id] = max(self._next.get(shard_id, now), now) + self.interval
+        if (delay := at - self.interval - now) > 0:
+            await asyncio.sleep(delay)
+
+class SnapshotManager:
+    """
+    Crash-safe player snapshots in an append-only JSON lines journal.
+
+    Every interval only guilds whose state changed get a full line, the others
+    playing get a small position line. The last line of a guild wins, a `null`
+    state removes it. The journal is compacted through an atomic rename once
+    it is `compact` times the size of the live guilds' full lines. States are
+    captured by reference on the event loop and serialized in the writer thread.
+    """
+
+    def __init__(self, path: str = SNAPSHOT_PATH, interval: float = SNAPSHOT_INTERVAL,
+            compact: int = SNAPSHOT_COMPACT, max_age: float = SNAPSHOT_MAX_AGE) -> None:
+        self.path = path
+        self.interval = interval
+        self.compact = compact
+        self.max_age = max_age
+        self.writes, self.restored, self.failed = 0, 0, 0
+
+        self._task: Optional[asyncio.Task] = None
+        self._client: Optional[lavalink.Client] = None
+        self._prints: Dict[int, tuple] = {}     # guild -> fingerprint of the last saved state
+        self._sizes: Dict[int, int] = {}        # guild -> bytes of its last full line
+        self._bytes = 0                         # journal size since the last compaction
+
+    def start(self, client: lavalink.Client) -> None:
+        self._client = client
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self) -> None:
+
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self._client:
+            await self.save()
+
+    def collect(self) -> List[dict]:
+        """Journal lines for players changed since the last call"""
+
+        lines, now = [], round(time(), 3)
+        players = {guild_id: player for guild_id, player in self._client.player_manager
+            if player.is_connected and (player.current or player.queue)}
+
+        for guild_id in [guild_id for guild_id in self._prints if guild_id not in players]:
+            del self._prints[guild_id]
+            self._sizes.pop(guild_id, None)
+            lines.append({'guild': guild_id, 'ts': now, 'state': None})
+
+        for guild_id, player in players.items():
+            if self._prints.get(guild_id) != (print_ := fingerprint(player)):
+                self._prints[guild_id] = print_
+                lines.append({'guild': guild_id, 'ts': now, 'state': capture(player)})
+            elif player.current and not player.paused:
+                lines.append({'guild': guild_id, 'ts': now, 'position': player.position})
+        return lines
+
+    async def save(self, compact: bool = False) -> None:
+
+        # compaction rewrites the journal with one full line per live guild
+        if compact := compact or self._bytes > self.compact * max(sum(self._sizes.values()), 1):
+            self._prints.clear()
+            self._sizes.clear()
+        lines = self.collect()
+        if not lines and not compact:
+            return
+        try:
+            written, sizes = await asyncio.to_thread(self._write, lines, compact)
+        except OSError as e:
+            logging.error('Failed to write player snapshot: %s', e)
+            self._prints.clear()    # everything is rewritten next time
+            return
+        self.writes += 1
+        self._bytes = written if compact else self._bytes + written
+        self._sizes.update(sizes)
+
+    def load(self) -> Dict[int, dict]:
+        """Latest saved state of every guild, positions adjusted for elapsed time"""
+
+        if not os.path.exists(self.path):
+            return {}
+
+        states, saved = {}, {}
+        with open(self.path, encoding='utf-8') as file:
+            for line in file:
+                try:
+                    line = json.loads(line)
+                except ValueError:
+                    continue    # torn write from a crash, only ever the last line
+                guild_id = line['guild']
+                if 'position' in line:
+                    if guild_id in states:
+                        states[guild_id]['position'] = line['position']
+                        saved[guild_id] = line['ts']
+                elif line['state'] is None:
+                    states.pop(guild_id, None)
+                else:
+                    states[guild_id], saved[guild_id] = line['state'], line['ts']
+
+        now = time()
+        for guild_id, state in list(states.items()):
+            if now - saved[guild_id] > self.max_age:
+                del states[guild_id]
+            elif not state['paused']:
+                state['position'] += int((now - saved[guild_id]) * 1000)
+        return states
+
+    async def restore(self, bot, client: lavalink.Client, concurrency: int = SNAPSHOT_RESTORE_CONCURRENCY,
+            pacer: Optional[JoinPacer] = None, timeout: float = 30) -> None:
+        """Recreates saved players in parallel, their tracks are decoded in one batch"""
+
+        self._client = client
+        states = await asyncio.to_thread(self.load)
+        shard_count = getattr(bot, 'shard_count', 1) or 1
+        if shards := getattr(bot, 'shards', None):  # a worker only restores guilds of its own shards
+            states = {guild_id: state for guild_id, state in states.items()
+                if (guild_id >> 22) % shard_count in shards}
+        if not states:
+            return
+
+        start = monotonic()
+        while not client.node_manager.available_nodes:
+            if monotonic() - start > timeout:
+                logging.error('No Lavalink node available, %d players not restored', len(states))
+                return
+            await asyncio.sleep(0.5)
+
+        encoded = {entry[0] for state in states.values()
+            for entry in ([state['current']] if state['current'] else []) + state['queue']}
+        tracks = {track.track: track for track in await track_store.decode_tracks(client, list(encoded))}
+        fresh = dict(tracks)    # decoded tracks not handed to a player yet
+
+        semaphore, pacer = asyncio.Semaphore(concurrency), pacer or JoinPacer()
+        results = await asyncio.gather(*(
+            self._restore_player(bot, client, guild_id, state, tracks, fresh, semaphore, pacer, shard_count)
+            for guild_id, state in states.items()), return_exceptions=True)
+
+        for guild_id, result in zip(states, results):
+            if isinstance(result, BaseException):
+                self.failed += 1
+                logging.error('Failed to restore player on guild: %s, Reason: %s', guild_id, result)
+            else:
+                self.restored += 1
+        logging.info('Restored %d/%d players in %.2fs', self.restored, len(states), monotonic() - start)
+        await self.save(compact=True)   # drops guilds that could not be restored
+
+    def stats(self) -> Dict[str, int]:
+        return {'guilds': len(self._prints), 'writes': self.writes, 'restored': self.restored, 'failed': self.failed}
+
+    async def _restore_player(self, bot, client: lavalink.Client, guild_id: int, state: dict,
+            tracks: Dict[str, lavalink.AudioTrack], fresh: Dict[str, lavalink.AudioTrack],
+            semaphore: asyncio.Semaphore, pacer: JoinPacer, shard_count: int) -> None:
+
+        metas = state['meta']
+
+        def build(entry):
+            if (track := fresh.pop(entry[0], None)) is None:
+                if (track := tracks.get(entry[0])) is None:
+                    return None
+                track = copy_track(track)   # already used by another queue entry
+            track.requester, track.user_data = entry[1], metas[entry[2]]
+            return track
+
+        async with semaphore:   # tracks are built under it too, all guilds at once would stall the loop
+            current = build(state['current']) if state['current'] else None
+            queue = [track for track in map(build, state['queue']) if track is not None]
+            if current is None and not queue:
+                return
+
+            player = client.player_manager.create(guild_id)
+            player.queue.extend(queue)
+            player.loop, player.shuffle, player.volume = state['loop'], state['shuffle'], state['volume']
+            player.send_channel = state['send_channel']
+            for name, values in state['filters']:
+                _filter = getattr(lavalink_filters, name)()
+                _filter.values = values
+                player.filters[name.lower()] = _filter
+
+            await pacer.wait((guild_id >> 22) % shard_count)
+            await bot.update_voice_state(guild_id, state['channel'], self_deaf=True)
+
+            # like `_play`, Lavalink starts the track once the voice update reaches it
+            if current is not None:
+                player.recently_played.append(current)
+                position = state['position'] if current.is_seekable and state['position'] < current.duration else 0
+            else:
+                position = 0
+            options = {'filters': list(player.filters.values())} if player.filters else {}
+            await player.play(current, start_time=position, volume=player.volume, pause=state['paused'], **options)
+
+    def _write(self, lines: List[dict], compact: bool) -> Tuple[int, Dict[int, int]]:
+        """Writes journal lines, returns the bytes written and the size of each full line by guild"""
+
+        data, sizes = [], {}
+        for line in lines:
+            if full := bool(line.get('state')):
+                line['state'] = dump_player(line['state'])
+            data.append(text := json.dumps(line, separators=(',', ':')) + '\n')
+            if full:
+                sizes[line['guild']] = len(text)
+        data = ''.join(data)
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        if not compact:
+            with open(self.path, 'a', encoding='utf-8') as file:
+                file.write(data)
+                file.flush()
+                os.fsync(file.fileno())
+            return len(data), sizes
+
+        temp = self.path + '.tmp'
+        with open(temp, 'w', encoding='utf-8') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp, self.path)
+        return len(data), sizes
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.save()
+
+player_snapshots = SnapshotManager()
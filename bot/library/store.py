@@ -0,0 +1,192 @@
+import os
+import json
+import asyncio
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+import lavalink
+from lavalink import AudioTrack
+
+from bot.config import TRACK_STORE_PATH, TRACK_STORE_CACHE, TRACK_STORE_FLUSH
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS tracks (
+    encoded     TEXT PRIMARY KEY,
+    uri         TEXT,
+    title       TEXT,
+    author      TEXT,
+    duration    INTEGER,
+    artwork_url TEXT,
+    source_name TEXT,
+    isrc        TEXT,
+    info        TEXT,
+    plugin_info TEXT
+);
+CREATE INDEX IF NOT EXISTS tracks_uri ON tracks (uri);
+'''
+
+def to_row(track: AudioTrack) -> tuple:
+    info = track.raw.get('info', track.raw)
+    return (track.track, track.uri, track.title, track.author, track.duration, track.artwork_url,
+        track.source_name, track.isrc, json.dumps(info), json.dumps(track.plugin_info or {}))
+
+def from_row(row: tuple) -> AudioTrack:
+    return AudioTrack({'encoded': row[0], 'info': json.loads(row[8]), 'pluginInfo': json.loads(row[9]), 'userData': {}})
+
+class TrackStore:
+    """
+    Persistent track metadata keyed by encoded track and uri.
+
+    Reads go through an in-memory LRU, then SQLite (WAL mode). Writes are
+    buffered and inserted in batches by a background task (write-behind).
+    """
+
+    def __init__(self, path: str = TRACK_STORE_PATH, cache_size: int = TRACK_STORE_CACHE,
+            flush_interval: float = TRACK_STORE_FLUSH) -> None:
+        self.path = path
+        self.cache_size = cache_size
+        self.flush_interval = flush_interval
+        self.hits, self.misses = 0, 0
+
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._cache: 'OrderedDict[str, tuple]' = OrderedDict()    # encoded -> row
+        self._uris: Dict[str, str] = {}                             # uri -> encoded, for cached rows
+        self._pending: Dict[str, tuple] = {}                        # encoded -> row, not written yet
+
+    def open(self) -> None:
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(SCHEMA)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self) -> None:
+
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+        if self._db:
+            await asyncio.to_thread(self._close)   # waits out a write the cancelled task left running
+
+    def put(self, track: AudioTrack) -> None:
+        if track.track:
+            row = to_row(track)
+            self._pending[row[0]] = row
+            self._remember(row)
+
+    def put_many(self, tracks: Iterable[AudioTrack]) -> None:
+        for track in tracks:
+            self.put(track)
+
+    async def get(self, encoded: str) -> Optional[AudioTrack]:
+        return (await self.get_many([encoded])).get(encoded)
+
+    async def get_by_uri(self, uri: str) -> Optional[AudioTrack]:
+
+        if (encoded := self._uris.get(uri)) is not None and (row := self._lookup(encoded)):
+            self.hits += 1
+            return from_row(row)
+
+        rows = await self._select('SELECT * FROM tracks WHERE uri = ? LIMIT 1', (uri,))
+        if not rows:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._remember(rows[0])
+        return from_row(rows[0])
+
+    async def get_many(self, encoded: List[str]) -> Dict[str, AudioTrack]:
+        """Tracks found locally for the given encoded strings, missing ones are left out"""
+
+        found, missing = {}, []
+        for key in encoded:
+            if (row := self._lookup(key)) is not None:
+                found[key] = from_row(row)
+            else:
+                missing.append(key)
+
+        for i in range(0, len(missing), 500):     # stay below SQLite's variable limit
+            chunk = missing[i:i + 500]
+            for row in await self._select(
+                    'SELECT * FROM tracks WHERE encoded IN ({})'.format(','.join('?' * len(chunk))), chunk):
+                self._remember(row)
+                found[row[0]] = from_row(row)
+
+        self.hits += len(found)
+        self.misses += len(encoded) - len(found)
+        return found
+
+    async def decode_tracks(self, client: lavalink.Client, encoded: List[str]) -> List[AudioTrack]:
+        """Decodes tracks from the store, only asking Lavalink for unknown ones"""
+
+        found = await self.get_many(encoded)
+        if missing := [key for key in dict.fromkeys(encoded) if key not in found]:
+            decoded = await client.decode_tracks(missing)
+            self.put_many(decoded)
+            found.update((track.track, track) for track in decoded)
+        return [found[key] for key in encoded if key in found]
+
+    async def flush(self) -> None:
+
+        if not self._pending or not self._db:
+            return
+        rows, self._pending = list(self._pending.values()), {}
+        try:
+            await asyncio.to_thread(self._write, rows)
+        except sqlite3.Error as e:
+            logging.error('Failed to write %d tracks to store: %s', len(rows), e)
+
+    def stats(self) -> Dict[str, int]:
+        return {'cached': len(self._cache), 'pending': len(self._pending), 'hits': self.hits, 'misses': self.misses}
+
+    def _lookup(self, encoded: str) -> Optional[tuple]:
+        if (row := self._cache.get(encoded)) is not None:
+            self._cache.move_to_end(encoded)
+            return row
+        return self._pending.get(encoded)
+
+    def _remember(self, row: tuple) -> None:
+
+        self._cache[row[0]] = row
+        self._cache.move_to_end(row[0])
+        self._uris[row[1]] = row[0]
+        while len(self._cache) > self.cache_size:
+            _, old = self._cache.popitem(last=False)
+            if self._uris.get(old[1]) == old[0]:
+                del self._uris[old[1]]
+
+    async def _select(self, query: str, params) -> List[tuple]:
+        if not self._db:
+            return []
+        return await asyncio.to_thread(self._execute, query, params)
+
+    def _execute(self, query: str, params) -> List[tuple]:
+        with self._lock:
+            return self._db.execute(query, params).fetchall() if self._db is not None else []
+
+    def _write(self, rows: List[tuple]) -> None:
+        with self._lock:
+            if self._db is None:
+                raise sqlite3.ProgrammingError('store is closed')
+            with self._db:
+                self._db.executemany('INSERT OR REPLACE INTO tracks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def _close(self) -> None:
+        with self._lock:
+            self._db.close()
+            self._db = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+track_store = TrackStore()
@@ -0,0 +1,161 @@
+import os
+import json
+import asyncio
+import logging
+from time import perf_counter, time
+from functools import wraps
+from random import random, getrandbits
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+from bot.config import TRACE_PATH, TRACE_SAMPLE_RATE, TRACE_SLOW, TRACE_FLUSH_INTERVAL, TRACE_BUFFER_SIZE
+
+_current: ContextVar[Optional['Span']] = ContextVar('span', default=None)
+
+class Trace:
+
+    __slots__ = ('start', 'spans')
+
+    def __init__(self, start: float) -> None:
+        self.start = start
+        self.spans: List['Span'] = []   # in start order, the root first
+
+class Span:
+    """
+    A timed section of a trace, used as `with span(...)`.
+
+    The current span is kept in a context var, so it follows awaits and the
+    tasks created below it. A span without a parent starts a new trace,
+    which is sampled once it finishes.
+    """
+
+    __slots__ = ('name', 'attrs', 'trace', 'index', 'parent', 'start', 'elapsed', 'error', '_token')
+
+    def __init__(self, name: str, attrs: Dict[str, Any]) -> None:
+        self.name = name
+        self.attrs = attrs
+        self.elapsed = None
+        self.error = None
+
+    def __enter__(self) -> 'Span':
+
+        self.start = perf_counter()
+        parent = _current.get()
+        if parent is None:
+            self.trace, self.parent = Trace(self.start), None
+        else:
+            self.trace, self.parent = parent.trace, parent.index
+        self.index = len(self.trace.spans)
+        self.trace.spans.append(self)
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, kind, exception, traceback) -> None:
+
+        self.elapsed = perf_counter() - self.start
+        if kind is not None:
+            self.error = kind.__name__
+        _current.reset(self._token)
+        if self.parent is None:
+            tracer.finish(self.trace)
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def dump(self, start: float) -> Dict[str, Any]:
+
+        span = {'name': self.name, 'parent': self.parent, 'start': round((self.start - start) * 1000, 3),
+            'ms': None if self.elapsed is None else round(self.elapsed * 1000, 3)}
+        if self.attrs:
+            span['attrs'] = self.attrs
+        if self.error:
+            span['error'] = self.error
+        return span
+
+class Tracer:
+    """
+    Spans of commands, autocomplete and events, sampled into a local JSONL file.
+
+    A finished trace is kept with probability `sample_rate`, or always when
+    it took longer than `slow` seconds. Kept traces are buffered and appended
+    as one line each every `flush_interval` seconds, `python -m bot.flame`
+    breaks them down offline.
+    """
+
+    def __init__(self, path: str = TRACE_PATH, sample_rate: float = TRACE_SAMPLE_RATE, slow: float = TRACE_SLOW,
+            flush_interval: float = TRACE_FLUSH_INTERVAL, buffer_size: int = TRACE_BUFFER_SIZE) -> None:
+        self.path = path
+        self.sample_rate = sample_rate
+        self.slow = slow
+        self.flush_interval = flush_interval
+        self.buffer_size = buffer_size
+        self.traces, self.sampled, self.dropped = 0, 0, 0
+
+        self._buffer: List[str] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    def finish(self, trace: Trace) -> None:
+
+        self.traces += 1
+        root = trace.spans[0]
+        if root.elapsed < self.slow and random() >= self.sample_rate:
+            return
+        if len(self._buffer) >= self.buffer_size:
+            self.dropped += 1
+            return
+        self.sampled += 1
+        self._buffer.append(json.dumps({     # id and wall time only for kept traces, formatting them is not free
+            'trace': f'{getrandbits(64):016x}', 'time': round(time() - root.elapsed, 3),
+            'name': root.name, 'ms': round(root.elapsed * 1000, 3),
+            'spans': [span.dump(trace.start) for span in trace.spans],
+        }, separators=(',', ':'), default=str))
+
+    async def flush(self) -> None:
+
+        if not self._buffer:
+            return
+        lines, self._buffer = self._buffer, []
+        try:
+            await asyncio.to_thread(self._write, lines)
+        except OSError as e:
+            self.dropped += len(lines)
+            logging.error('Failed to write %d traces: %s', len(lines), e)
+
+    def stats(self) -> Dict[str, int]:
+        return {'traces': self.traces, 'sampled': self.sampled, 'dropped': self.dropped, 'buffered': len(self._buffer)}
+
+    def _write(self, lines: List[str]) -> None:
+        with open(self.path, 'a', encoding='utf-8') as file:
+            file.write('\n'.join(lines) + '\n')
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+tracer = Tracer()
+
+def span(name: str, **attrs) -> Span:
+    return Span(name, attrs)
+
+def traced(name: str) -> Callable:
+    """Decorator running a coroutine function in a span"""
+
+    def decorator(func: Callable) -> Callable:
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            with Span(name, {}):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,9 +1,15 @@
+from itertools import chain, count
+from typing import Iterator, Optional, Tuple
+
 import miru
 import hikari
 import lavalink
 
 from bot.constants import *
-from bot.utils import format_time
+from bot.library.render import now_description, player_bar, queue_page, track_card
+from bot.library.dispatch import dispatcher, respond, INTERACTION
+
+QUEUE_PAGE_SIZE = 10
 
 def next_state(cur, mn, mx):
     while True:
@@ -71,8 +77,10 @@ class PlayerView(miru.View):
         super().__init__(timeout=None)
         self.guild_id = guild_id
 
-        self.add_item(LoopButton(self.get_player()))
-        self.add_item(ShuffleButton(self.get_player()))
+        self.loop_button = LoopButton(self.get_player())
+        self.shuffle_button = ShuffleButton(self.get_player())
+        self.add_item(self.loop_button)
+        self.add_item(self.shuffle_button)
 
     def get_player(self) -> lavalink.DefaultPlayer:
         return self.bot.d.lavalink.player_manager.get(self.guild_id)
@@ -84,14 +92,22 @@ class PlayerView(miru.View):
         
         current = player.current
 
-        return hikari.Embed(
-            description='[{}]({})\n{} `{}`\n\n<@!{}>'.format(
-                current.title, current.uri, current.author,
-                'LIVE' if current.stream else format_time(current.duration), 
-                current.requester)).set_thumbnail(current.artwork_url)
+        description = '{}\n\n<@!{}>'.format(track_card(current), current.requester)
+        if player.live_progress:
+            description += '\n\n' + player_bar(player)
+
+        return hikari.Embed(description=description).set_thumbnail(current.artwork_url)
+
+    def sync(self, player) -> None:
+        """Matches button icons to the player, the view is reused across tracks"""
+
+        self.loop_button.loop, self.loop_button.emoji = player.loop, LoopButton.loop_icon(player.loop)
+        self.shuffle_button.shuffle = player.shuffle
+        self.shuffle_button.emoji = ShuffleButton.shuffle_icon(player.shuffle)
+        self.player_pause.emoji = EMOJI_RESUME_PLAYER if player.paused else EMOJI_PAUSE_PLAYER
 
     async def update_message(self):
-        await self.message.edit(components=self)
+        await dispatcher.edit(self.message.channel_id, self.message, components=self)
 
     @miru.button(row=0, style=hikari.ButtonStyle.SECONDARY, emoji=EMOJI_PLAY_PREVIOUS)
     async def player_previous(self, button: miru.Button, ctx: miru.ViewContext) -> None:
@@ -111,4 +127,145 @@ class PlayerView(miru.View):
     
     @miru.button(row=1, style=hikari.ButtonStyle.SECONDARY, emoji=EMOJI_STOP_PLAYER)
     async def player_stop(self, button: miru.Button, ctx: miru.ViewContext) -> None:
-        await self.get_player().stop()
\ No newline at end of file
+        await self.get_player().stop()
+
+def search_queue(queue, query: str, start: int = 0) -> Iterator[Tuple[int, lavalink.AudioTrack]]:
+    """Lazy `(index, track)` of tracks whose title or author contains `query`, from `start` wrapping around"""
+
+    query = query.casefold()
+    start = start if 0 <= start < len(queue) else 0
+    tracks = chain(zip(count(start), queue.iter_from(start)), zip(range(start), queue))
+    return ((i, track) for i, track in tracks if query in track.title.casefold() or query in track.author.casefold())
+
+class JumpModal(miru.Modal):
+
+    page = miru.TextInput(label='Page', placeholder='Page number', required=True, max_length=6)
+
+    def __init__(self, view: 'QueueView') -> None:
+        super().__init__('Jump to page')
+        self.queue_view = view
+
+    async def callback(self, ctx: miru.ModalContext) -> None:
+
+        page = self.page.value.strip()
+        if not page.isdigit():
+            await respond(ctx, 'Not a page number!', flags=hikari.MessageFlag.EPHEMERAL)
+            return
+        self.queue_view.page = int(page) - 1
+        await self.queue_view.refresh(ctx)
+
+class SearchModal(miru.Modal):
+
+    query = miru.TextInput(label='Search', placeholder='Title or author', required=True, max_length=100)
+
+    def __init__(self, view: 'QueueView') -> None:
+        super().__init__('Search queue')
+        self.queue_view = view
+        self.query.value = view.query
+
+    async def callback(self, ctx: miru.ModalContext) -> None:
+
+        view, query = self.queue_view, self.query.value.strip()
+        player = view.get_player()
+        if player is None or not player.is_playing:
+            await respond(ctx, 'Nothing playing!', flags=hikari.MessageFlag.EPHEMERAL)
+            return
+
+        # the same query again moves on to the next match
+        start = view.found + 1 if query == view.query and view.found is not None else view.page * view.size
+        view.query = query
+        match = next(search_queue(player.queue, query, start), None)
+        if match is None:
+            view.found = None
+            await respond(ctx, f'No track matching `{query}` in queue!', flags=hikari.MessageFlag.EPHEMERAL)
+            return
+        view.found = match[0]
+        view.page = match[0] // view.size
+        await view.refresh(ctx)
+
+class QueueView(miru.View):
+    """
+    Pages of the queue on one message, reused for every page.
+
+    Only the visible page is sliced out of the queue and rendered, so memory
+    and work per click do not grow with the queue.
+    """
+
+    def __init__(self, guild_id: int, page: int = 0, size: int = QUEUE_PAGE_SIZE) -> None:
+        super().__init__(timeout=120)
+        self.guild_id = guild_id
+        self.page = page
+        self.size = size
+        self.query = ''
+        self.found: Optional[int] = None    # queue index of the last search match
+
+    def get_player(self) -> lavalink.DefaultPlayer:
+        return self.bot.d.lavalink.player_manager.get(self.guild_id)
+
+    def pages(self, player) -> int:
+        return max((len(player.queue) + self.size - 1) // self.size, 1)
+
+    def get_embed(self, player) -> hikari.Embed:
+        """Embed of the current page, also clamps the page to the queue and updates the buttons"""
+
+        pages = self.pages(player)
+        self.page = min(max(self.page, 0), pages - 1)
+        self.queue_first.disabled = self.queue_previous.disabled = self.page == 0
+        self.queue_next.disabled = self.queue_last.disabled = self.page == pages - 1
+
+        footer = f'Page {self.page + 1}/{pages} · {len(player.queue)} tracks'
+        if self.found is not None and self.found // self.size == self.page:
+            footer += f' · match #{self.found + 1}'
+        return hikari.Embed(
+            title = '🎵 Queue',
+            description = now_description(player) + queue_page(player, self.page, self.size),
+        ).set_thumbnail(player.current.artwork_url).set_footer(footer)
+
+    async def refresh(self, ctx: miru.Context) -> None:
+
+        player = self.get_player()
+        if player is None or not player.is_playing:
+            self.stop()
+            await dispatcher.submit(lambda: ctx.edit_response(components=[]), INTERACTION)
+            return
+        embed = self.get_embed(player)
+        await dispatcher.submit(lambda: ctx.edit_response(embed=embed, components=self), INTERACTION)
+
+    async def on_timeout(self) -> None:
+
+        player = self.get_player()
+        if player is not None and player.queue_view is self:
+            player.queue_view = None
+        if self.message is not None:
+            try:
+                await dispatcher.edit(self.message.channel_id, self.message, components=[])
+            except hikari.HTTPError:
+                pass
+
+    @miru.button(row=0, style=hikari.ButtonStyle.SECONDARY, emoji='⏮️')
+    async def queue_first(self, button: miru.Button, ctx: miru.ViewContext) -> None:
+        self.page = 0
+        await self.refresh(ctx)
+
+    @miru.button(row=0, style=hikari.ButtonStyle.SECONDARY, emoji='◀️')
+    async def queue_previous(self, button: miru.Button, ctx: miru.ViewContext) -> None:
+        self.page -= 1
+        await self.refresh(ctx)
+
+    @miru.button(row=0, style=hikari.ButtonStyle.SECONDARY, emoji='▶️')
+    async def queue_next(self, button: miru.Button, ctx: miru.ViewContext) -> None:
+        self.page += 1
+        await self.refresh(ctx)
+
+    @miru.button(row=0, style=hikari.ButtonStyle.SECONDARY, emoji='⏭️')
+    async def queue_last(self, button: miru.Button, ctx: miru.ViewContext) -> None:
+        self.page = self.pages(self.get_player()) - 1 if self.get_player() else 0
+        await self.refresh(ctx)
+
+    @miru.button(row=1, style=hikari.ButtonStyle.SECONDARY, label='Jump')
+    async def queue_jump(self, button: miru.Button, ctx: miru.ViewContext) -> None:
+        await ctx.respond_with_modal(JumpModal(self))
+
+    @miru.button(row=1, style=hikari.ButtonStyle.SECONDARY, label='Search')
+    async def queue_search(self, button: miru.Button, ctx: miru.ViewContext) -> None:
+        await ctx.respond_with_modal(SearchModal(self))
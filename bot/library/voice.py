@@ -0,0 +1,55 @@
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+class VoiceIndex:
+    """
+    Voice channel occupancy per guild, kept up to date from gateway events.
+
+    Replaces scans over the guild's voice states with dict lookups:
+    `channel_of` and `count` are O(1) regardless of guild size.
+    """
+
+    def __init__(self) -> None:
+        self._channels: Dict[int, Dict[int, Set[int]]] = {}     # guild -> channel -> members
+        self._users: Dict[int, Dict[int, int]] = {}             # guild -> user -> channel
+
+    def update(self, guild_id: int, user_id: int, channel_id: Optional[int]) -> Optional[int]:
+        """Moves a user to `channel_id` (`None` when leaving voice), returns the previous channel"""
+
+        users = self._users.setdefault(guild_id, {})
+        channels = self._channels.setdefault(guild_id, {})
+
+        previous = users.pop(user_id, None)
+        if previous is not None and (members := channels.get(previous)) is not None:
+            members.discard(user_id)
+            if not members:
+                del channels[previous]
+
+        if channel_id is not None:
+            users[user_id] = channel_id
+            channels.setdefault(channel_id, set()).add(user_id)
+        return previous
+
+    def load(self, guild_id: int, states: Iterable[Tuple[int, Optional[int]]]) -> None:
+        """Replaces a guild's occupancy with `(user_id, channel_id)` pairs, e.g. on guild create"""
+
+        self.remove_guild(guild_id)
+        for user_id, channel_id in states:
+            self.update(guild_id, user_id, channel_id)
+
+    def remove_guild(self, guild_id: int) -> None:
+        self._users.pop(guild_id, None)
+        self._channels.pop(guild_id, None)
+
+    def channel_of(self, guild_id: int, user_id: int) -> Optional[int]:
+        return self._users.get(guild_id, {}).get(user_id)
+
+    def members(self, guild_id: int, channel_id: int) -> Set[int]:
+        return self._channels.get(guild_id, {}).get(channel_id, set())
+
+    def count(self, guild_id: int, channel_id: int) -> int:
+        return len(self.members(guild_id, channel_id))
+
+    def stats(self) -> Dict[str, int]:
+        return {'guilds': len(self._users), 'users': sum(map(len, self._users.values()))}
+
+voice_index = VoiceIndex()
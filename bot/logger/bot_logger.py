@@ -1,5 +1,7 @@
 import os
 
+from bot.config import LOG_FORMAT
+
 path = os.path.join(os.getcwd(), 'logs', 'bot.log')
 os.makedirs(os.path.dirname(path), exist_ok=True)
 
@@ -16,15 +18,15 @@ bot_logging_config = {
 
     'handlers': {
         'console_handler': {
-            'class': 'logging.StreamHandler',
+            'class': 'bot.logger.pipeline.BatchedStreamHandler',
             'formatter': 'console',
             'stream': 'ext://sys.stdout',  # Default is stderr
         },
         'rotating_file_handler': {
-            'class': 'logging.handlers.TimedRotatingFileHandler',
+            'class': 'bot.logger.pipeline.BatchedTimedRotatingFileHandler',
             'encoding': 'utf-8',
             'filename': path,
-            'formatter': 'file',
+            'formatter': 'file' if LOG_FORMAT == 'text' else LOG_FORMAT,
             'backupCount': 10,
             'when': 'midnight',
             'utc': False,
@@ -40,6 +42,9 @@ bot_logging_config = {
                 "%(bold)s%(name)s: "
                 "%(thin)s%(message)s%(reset)s"
         },
+        'json': {
+            '()': 'bot.logger.pipeline.JsonFormatter',
+        },
         'file': {
             'format':
                 "%(asctime)s %(levelname)s %(name)s."
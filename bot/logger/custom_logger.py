@@ -1,6 +1,9 @@
 import os
 import logging.config
 
+from bot.config import LOG_FORMAT
+from bot.logger.pipeline import log_pipeline
+
 log_paths = {}
 loggers = ['track', 'command']
 
@@ -28,30 +31,33 @@ logging.config.dictConfig({
 
     'handlers': {
         'track_logging_handler': {
-            'class': 'logging.FileHandler',
-            'formatter': 'default',
+            'class': 'bot.logger.pipeline.BatchedFileHandler',
+            'formatter': LOG_FORMAT,
             'filename': log_paths['track'],
             'mode': 'a',
             'encoding': 'utf-8'
         },
         'command_logging_handler': {
-            'class': 'logging.FileHandler',
-            'formatter': 'default',
+            'class': 'bot.logger.pipeline.BatchedFileHandler',
+            'formatter': LOG_FORMAT,
             'filename': log_paths['command'],
             'mode': 'a',
             'encoding': 'utf-8'
         },
         'console_handler': {
-            'class': 'logging.StreamHandler',
+            'class': 'bot.logger.pipeline.BatchedStreamHandler',
             'formatter': 'console',
             'stream': 'ext://sys.stdout', 
         },
     },
 
     'formatters': {
-        'default': {
+        'text': {
             'format': '%(asctime)s: %(message)s'
         },
+        'json': {
+            '()': 'bot.logger.pipeline.JsonFormatter',
+        },
         'console': {
             '()': 'colorlog.ColoredFormatter',
             'format': 
@@ -64,4 +70,7 @@ logging.config.dictConfig({
 })
 
 track_logger = logging.getLogger('track_logger')
-command_logger = logging.getLogger('command_logger')
\ No newline at end of file
+command_logger = logging.getLogger('command_logger')
+
+log_pipeline.wrap(track_logger)     # file and console writes happen on the pipeline thread
+log_pipeline.wrap(command_logger)
\ No newline at end of file
@@ -0,0 +1,176 @@
+import sys
+import json
+import atexit
+import logging
+import threading
+import logging.handlers
+from time import sleep, monotonic
+from collections import deque
+from typing import Dict, List, Optional
+
+from bot.config import LOG_QUEUE_SIZE, LOG_FLUSH_INTERVAL
+
+class Batched:
+    """Stream handler mixin, flushed once per batch by the log pipeline instead of after every record"""
+
+    batching = False
+
+    def flush(self) -> None:
+        if not self.batching:
+            super().flush()
+
+    def flush_batch(self) -> None:
+        super().flush()
+
+class BatchedStreamHandler(Batched, logging.StreamHandler):
+    pass
+
+class BatchedFileHandler(Batched, logging.FileHandler):
+    pass
+
+class BatchedTimedRotatingFileHandler(Batched, logging.handlers.TimedRotatingFileHandler):
+    pass
+
+class JsonFormatter(logging.Formatter):
+    """One compact JSON object per record, for log files read by tools"""
+
+    def format(self, record: logging.LogRecord) -> str:
+
+        entry = {'time': round(record.created, 3), 'level': record.levelname, 'logger': record.name,
+            'msg': record.getMessage()}
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, separators=(',', ':'), ensure_ascii=False, default=str)
+
+class PipelineHandler(logging.Handler):
+    """Stands in for a handler on the event loop, its records are written by the pipeline thread"""
+
+    def __init__(self, pipeline: 'LogPipeline', target: logging.Handler) -> None:
+        super().__init__(target.level)
+        self.pipeline = pipeline
+        self.target = target
+        self.dropped = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+
+        # the message is rendered now, its arguments may change before the thread gets to it
+        record.msg, record.args = record.getMessage(), None
+        self.pipeline.put(self, record)
+
+    def flush(self) -> None:
+        self.pipeline.drain()
+
+class LogPipeline:
+    """
+    Moves log writes off the event loop.
+
+    Handlers of wrapped loggers are replaced by `PipelineHandler`s that only
+    append to a bounded buffer. A background thread takes everything
+    buffered every `flush_interval` seconds, writes it to the original
+    handlers and flushes each of them once per batch. Records arriving
+    while the buffer is full are dropped and counted, the thread reports
+    them on the handlers that lost them.
+    """
+
+    def __init__(self, queue_size: int = LOG_QUEUE_SIZE, flush_interval: float = LOG_FLUSH_INTERVAL) -> None:
+        self.queue_size = queue_size
+        self.flush_interval = flush_interval
+        self.written, self.batches = 0, 0
+
+        self._buffer = deque()      # (handler, record)
+        self._wakeup = threading.Event()
+        self._idle = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._handlers: List[PipelineHandler] = []
+        self._reported: Dict[PipelineHandler, int] = {}     # handler -> drops already reported
+
+    def wrap(self, logger: logging.Logger) -> None:
+        """Puts every handler of `logger` behind the pipeline"""
+
+        for index, target in enumerate(logger.handlers):
+            if isinstance(target, PipelineHandler):
+                continue
+            if isinstance(target, Batched):
+                target.batching = True
+            handler = PipelineHandler(self, target)
+            self._handlers.append(handler)
+            logger.handlers[index] = handler
+        self.start()
+
+    def start(self) -> None:
+
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='log-pipeline', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)     # runs before logging shutdown closes the handlers
+
+    def close(self) -> None:
+        """Writes what is buffered and stops the thread, later records are written directly"""
+
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._wakeup.set()
+            thread.join(5)
+        for handler in self._handlers:
+            if isinstance(handler.target, Batched):
+                handler.target.batching = False
+        self._write()
+
+    def put(self, handler: PipelineHandler, record: logging.LogRecord) -> None:
+
+        if self._thread is None:
+            handler.target.handle(record)
+        elif len(self._buffer) >= self.queue_size:
+            handler.dropped += 1
+        else:
+            self._buffer.append((handler, record))
+            if not self._wakeup.is_set():
+                self._wakeup.set()
+
+    def drain(self, timeout: float = 5) -> None:
+        """Waits until the thread wrote everything buffered so far"""
+
+        if self._thread is None or self._thread is threading.current_thread():
+            return
+        deadline = monotonic() + timeout
+        while self._buffer and monotonic() < deadline:
+            self._idle.clear()
+            self._wakeup.set()
+            self._idle.wait(deadline - monotonic())
+
+    def stats(self) -> Dict[str, int]:
+        return {'buffered': len(self._buffer), 'written': self.written, 'batches': self.batches,
+            'dropped': sum(handler.dropped for handler in self._handlers)}
+
+    def _run(self) -> None:
+        while self._thread is not None:
+            self._wakeup.wait()
+            sleep(self.flush_interval)      # lets a batch build up
+            self._wakeup.clear()
+            self._write()
+            self._idle.set()
+
+    def _write(self) -> None:
+
+        targets = set()
+        while self._buffer:
+            handler, record = self._buffer.popleft()
+            handler.target.handle(record)   # errors go to the handler's handleError
+            targets.add(handler.target)
+            self.written += 1
+        for handler in self._handlers:
+            if (dropped := handler.dropped - self._reported.get(handler, 0)) > 0:
+                self._reported[handler] = handler.dropped
+                handler.target.handle(logging.makeLogRecord({'name': __name__, 'levelno': logging.WARNING,
+                    'levelname': 'WARNING', 'msg': f'Log buffer full, dropped {dropped} records'}))
+                targets.add(handler.target)
+        for target in targets:
+            try:
+                target.flush_batch() if isinstance(target, Batched) else target.flush()
+            except Exception as e:
+                print(f'Failed to flush log handler {target}: {e!r}', file=sys.stderr)
+        if targets:
+            self.batches += 1
+
+log_pipeline = LogPipeline()
@@ -0,0 +1,69 @@
+import json
+import asyncio
+from time import sleep
+
+from lavalink import AudioTrack, EndReason
+
+from bot.harness.fake_lavalink import make_track
+from bot.library import analytics
+from bot.library.analytics import PlayAnalytics
+
+def test_paused_time_is_not_listened(monkeypatch):
+
+    now = [1000.0]
+    monkeypatch.setattr(analytics, 'time', lambda: now[0])
+    plays = PlayAnalytics()
+    track = AudioTrack(make_track('a' * 11, 'Song', 'Artist', 300_000), 7)
+
+    plays.start(1, track)
+    now[0] += 30
+    plays.pause(1, True)
+    now[0] += 3600          # paused for an hour
+    plays.pause(1, False)
+    now[0] += 20
+    plays.end(1, EndReason.FINISHED)
+
+    data = make_track('b' * 11, 'Radio', 'Station', 0)
+    data['info']['isStream'] = True
+    stream = AudioTrack(data, 7)
+    plays.start(1, stream, paused=True)
+    now[0] += 600
+    plays.pause(1, False)
+    now[0] += 60
+    plays.pause(1, True)
+    now[0] += 600
+    plays.end(1, EndReason.STOPPED)     # ended while paused
+
+    first, second = (json.loads(line) for line in plays._buffer)
+    assert first['l'] == 50_000 and first['id'] == track.track
+    assert second['l'] == 60_000 and second['end'] == 'stopped'
+    assert plays.guild(1).listened == 110_000
+
+def test_close_waits_for_a_write_cut_off_by_cancellation(tmp_path, monkeypatch):
+
+    async def run() -> None:
+        plays = PlayAnalytics(str(tmp_path / 'plays.jsonl'), flush_interval=3600)
+        write, writes = plays._write, []
+
+        def slow_first_write(data: bytes, state) -> None:
+            writes.append(data)
+            if len(writes) == 1:
+                sleep(0.1)      # a slow disk under the first batch
+            write(data, state)
+
+        monkeypatch.setattr(plays, '_write', slow_first_write)
+        track = AudioTrack(make_track('c' * 11, 'Song', 'Artist', 1000), 7)
+
+        plays.start(1, track)
+        plays.end(1, EndReason.FINISHED)
+        flush = asyncio.ensure_future(plays.flush())
+        await asyncio.sleep(0.02)
+        flush.cancel()              # like close() cancelling the flush loop mid-write
+        plays.start(2, track)
+        plays.end(2, EndReason.FINISHED)
+        await plays.close()
+
+        lines = (tmp_path / 'plays.jsonl').read_text().splitlines()
+        assert [json.loads(line)['g'] for line in lines] == [1, 2]
+
+    asyncio.run(run())
@@ -0,0 +1,30 @@
+import asyncio
+from time import monotonic
+
+from bot.library.autocomplete import AutocompleteEngine
+
+def test_only_keystrokes_behind_a_pending_one_are_debounced():
+
+    async def run() -> None:
+        engine = AutocompleteEngine(debounce=0.2)
+        lookups = []
+
+        def lookup(text: str):
+            async def search() -> str:
+                lookups.append(text)
+                await asyncio.sleep(0.05)
+                return text.upper()
+            return search
+
+        start = monotonic()
+        assert await engine.complete('user', ('search', 'a'), lookup('a')) == 'A'
+        assert monotonic() - start < 0.15   # nothing pending, looked up at once
+
+        # a burst: each keystroke supersedes the pending one, only the last is looked up after the debounce
+        burst = [asyncio.ensure_future(engine.complete('user', ('search', text), lookup(text)))
+            for text in ('ab', 'abc', 'abcd')]
+        results = await asyncio.gather(*burst)
+        assert results == [None, None, 'ABCD'] and lookups[-1] == 'abcd' and 'abc' not in lookups
+        assert engine.stats()['superseded'] >= 2
+
+    asyncio.run(run())
@@ -0,0 +1,75 @@
+import asyncio
+
+import lavalink
+
+from bot.launcher import shard_ranges
+from bot.harness.fake_lavalink import FakeLavalink
+from bot.library.health import NodeHealth
+from bot.library.coordinator import Coordinator, CoordinatorClient
+
+def test_shard_ranges_cover_every_shard_once():
+
+    for shard_count, workers in ((16, 4), (10, 3), (2, 5), (1, 1)):
+        ranges = shard_ranges(shard_count, workers)
+        assert [shard for shards in ranges for shard in shards] == list(range(shard_count))
+        assert max(map(len, ranges)) - min(map(len, ranges)) <= 1
+
+def test_workers_share_node_health_weighted_by_recent_requests(tmp_path):
+
+    async def run() -> None:
+        fakes = [FakeLavalink(f'fake-{i + 1}', latency=0) for i in range(2)]
+        for fake in fakes:
+            await fake.start()
+        coordinator = Coordinator(str(tmp_path / 'coordinator.sock'))
+        await coordinator.start()
+
+        workers = []
+        stats = lambda: {'players': 1}
+        for i in range(2):     # one lavalink client per worker process, like the launcher starts them
+            client = lavalink.Client(user_id=1)
+            for fake in fakes:
+                client.add_node('127.0.0.1', fake.port, 'youshallnotpass', 'us', fake.name)
+            health = NodeHealth(alpha=0.5)
+            health._nodes = client.node_manager.nodes
+            link = CoordinatorClient(interval=3600, health=health)
+            await link.connect(coordinator.path, str(i), stats)
+            workers.append((client, health, link))
+        (_, busy, busy_link), (_, idle, idle_link) = workers
+        slow = workers[0][0].node_manager.nodes[1]
+        await asyncio.sleep(0.05)   # first reports of the report loops, the next ones are sent by the test
+
+        try:
+            for _ in range(9):
+                busy.record('fake-1', 10.0)
+            idle.record('fake-1', 100.0)
+            await busy_link.report(stats)
+            await idle_link.report(stats)
+            assert idle.averages('fake-1') == (19.0, 0.0)   # 9 requests at 10 ms, 1 at 100 ms
+            assert idle.report()['fake-1']['latency_ms'] == 100.0  # local samples stay local
+
+            # the busy worker goes quiet, its old average no longer outweighs the other worker's samples
+            for _ in range(3):
+                idle.record('fake-1', 100.0)
+            await busy_link.report(stats)
+            await idle_link.report(stats)
+            assert busy.averages('fake-1') == idle.averages('fake-1') == (100.0, 0.0)
+            assert busy.stats()['fake-1']['latency_ms'] == 100.0
+
+            # a node only one worker saw failing scores worse on every worker
+            slow_score = busy.score(slow)
+            idle.record('fake-2', None)
+            await idle_link.report(stats)
+            await busy_link.report(stats)
+            assert busy.averages('fake-2') == (0.0, 0.5) and busy.score(slow) > slow_score
+            assert coordinator.handle(None, {'op': 'totals'}) == {'workers': 2, 'players': 2}
+        finally:
+            for client, _, link in workers:
+                await link.close()
+                for node in client.node_manager:
+                    node._transport._destroyed = True
+                await client.close()
+            await coordinator.close()
+            for fake in fakes:
+                await fake.close()
+
+    asyncio.run(run())
@@ -0,0 +1,62 @@
+import asyncio
+import logging
+
+import pytest
+
+from bot.library.dispatch import Dispatcher
+
+class FakeRest:
+
+    def __init__(self) -> None:
+        self.sent = []
+
+    async def create_message(self, channel: int, content: str) -> str:
+        if content == 'fail':
+            raise ValueError('rejected')
+        if content == 'slow':
+            await asyncio.sleep(0.05)
+        self.sent.append(content)
+        return content
+
+def test_close_cancels_queued_operations_and_failures_are_left_to_callers(caplog):
+
+    async def run() -> None:
+        rest = FakeRest()
+        dispatcher = Dispatcher(route_limit=(1, 60))    # one message per channel and minute
+        dispatcher.start(rest)
+        try:
+            assert await dispatcher.create(1, content='first') == 'first'
+            queued = dispatcher.create(1, content='second')    # waits for a route token
+            failed = dispatcher.create(2, content='fail')
+            with caplog.at_level(logging.DEBUG):
+                with pytest.raises(ValueError):
+                    await failed
+            assert not caplog.records and dispatcher.errors == 1
+
+            await asyncio.sleep(0.01)
+            assert dispatcher.stats()['delayed'] == 1
+        finally:
+            await dispatcher.close()
+        assert queued.cancelled() and rest.sent == ['first']
+        assert dispatcher.stats()['depth'] == 0
+
+    asyncio.run(run())
+
+def test_caller_giving_up_does_not_fail_the_call():
+
+    async def run() -> None:
+        errors = []
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context))
+        rest = FakeRest()
+        dispatcher = Dispatcher()
+        dispatcher.start(rest)
+        try:
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(dispatcher.create(1, content='slow'), 0.01)   # cancels the future
+            await asyncio.sleep(0.1)
+            assert rest.sent == ['slow'] and dispatcher.executed == 1 and dispatcher.errors == 0
+        finally:
+            await dispatcher.close()
+        assert not dispatcher._tasks and not errors
+
+    asyncio.run(run())
@@ -0,0 +1,120 @@
+import asyncio
+
+import lavalink
+from lavalink.filters import Timescale
+
+from bot.harness.fake_lavalink import FakeLavalink, make_track
+from bot.library.failover import HealthNodeManager, node_failover
+from bot.library.player import MusicCatPlayer
+
+GUILD_ID, USER_ID = 1 << 22, 1
+
+async def wait_for(condition, timeout: float = 5) -> None:
+
+    async def poll() -> None:
+        while not condition():
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(poll(), timeout)
+
+async def connect(nodes) -> lavalink.Client:
+
+    client = lavalink.Client(user_id=USER_ID, player=MusicCatPlayer)
+    client.node_manager = HealthNodeManager(client, None, False)
+    ready = set()
+
+    async def node_ready(event: lavalink.NodeReadyEvent) -> None:
+        ready.add(event.session_id)
+
+    client.add_event_hook(node_ready, event=lavalink.NodeReadyEvent)
+    for node in nodes:
+        client.add_node('127.0.0.1', node.port, 'youshallnotpass', 'us', node.name)
+    await wait_for(lambda: len(ready) == len(nodes))
+    return client
+
+async def join(client: lavalink.Client, node_name: str, guild_id: int = GUILD_ID) -> MusicCatPlayer:
+
+    node = next(node for node in client.node_manager.nodes if node.name == node_name)
+    player = client.player_manager.create(guild_id, node=node)
+    await client.voice_update_handler({'t': 'VOICE_STATE_UPDATE', 'd': {'guild_id': guild_id,
+        'user_id': USER_ID, 'channel_id': guild_id + 1, 'session_id': 'session'}})
+    await client.voice_update_handler({'t': 'VOICE_SERVER_UPDATE', 'd': {'guild_id': guild_id,
+        'endpoint': 'voice.example', 'token': 'token'}})
+    return player
+
+def test_players_move_to_the_other_node_when_a_node_is_lost():
+
+    async def run() -> None:
+        nodes = [FakeLavalink(f'fake-{i + 1}', latency=0, track_seconds=600) for i in range(2)]
+        for node in nodes:
+            await node.start()
+        lost, other = nodes
+        client = await connect(nodes)
+        try:
+            player = await join(client, lost.name)
+            track = make_track('failover1', 'Failover', 'Tester', 300_000)
+            player.add(track)
+            await player.play()
+            await wait_for(lambda: player.is_playing)
+            await player.seek(60_000)
+            await player.set_volume(50)
+            await player.update_filter(Timescale, speed=1.25)
+            await wait_for(lambda: player.position >= 60_000)
+
+            await lost.close()
+            await wait_for(lambda: str(GUILD_ID) in other.players and other.players[str(GUILD_ID)].track)
+
+            moved = other.players[str(GUILD_ID)]
+            assert player.node.name == other.name
+            assert player.current.identifier == 'failover1'
+            assert moved.track['encoded'] == track['encoded']
+            assert 60_000 <= moved.position < 62_000
+            assert moved.volume == 50
+            assert moved.filters == {'timescale': {'speed': 1.25, 'pitch': 1.0, 'rate': 1.0}}
+            assert moved.voice['endpoint'] == 'voice.example'
+        finally:
+            client.player_manager.players.clear()
+            for node in client.node_manager:
+                node._transport._destroyed = True   # no reconnecting to the closed fake
+            await client.close()
+            await other.close()
+
+    asyncio.run(run())
+
+def test_drained_node_gets_no_players_until_undrained():
+
+    async def run() -> None:
+        fakes = [FakeLavalink(f'fake-{i + 1}', latency=0, track_seconds=600) for i in range(2)]
+        for fake in fakes:
+            await fake.start()
+        drained, other = fakes
+        client = await connect(fakes)
+        manager = client.node_manager
+        node_a, node_b = manager.nodes
+        try:
+            players = [await join(client, drained.name, GUILD_ID * (i + 1)) for i in range(2)]
+            for i, player in enumerate(players):
+                player.add(make_track(f'drain{i}', 'Drain', 'Tester', 300_000))
+                await player.play()
+            await wait_for(lambda: all(player.is_playing for player in players))
+
+            assert await node_failover.drain(manager, node_a) == 2
+            assert drained.requests['destroy_player'] == 2     # told to drop them, it is still alive
+            assert all(player.node is node_b for player in players)
+            await wait_for(lambda: all(other.players.get(str(player.guild_id)) and
+                other.players[str(player.guild_id)].track for player in players))
+            assert not drained.players
+
+            assert manager.find_ideal_node() is node_b     # node A scores better, it has no players
+            node_failover.undrain(node_a)
+            assert manager.find_ideal_node() is node_a
+        finally:
+            node_failover.undrain(node_a)
+            client.player_manager.players.clear()
+            for node in manager:
+                node._transport._destroyed = True
+            await client.close()
+            for fake in fakes:
+                await fake.close()
+
+    asyncio.run(run())
@@ -0,0 +1,65 @@
+import asyncio
+
+import lavalink
+from lavalink import AudioTrack
+
+from bot.harness.fake_lavalink import FakeLavalink
+from bot.library.classes import history
+from bot.library.classes.history import PlayHistory
+
+def test_pop_reads_spilled_tracks_back_newest_first(tmp_path, monkeypatch):
+
+    monkeypatch.setattr(history.history_spill, 'directory', str(tmp_path))
+
+    async def run() -> None:
+        node = FakeLavalink('fake-1', latency=0)
+        await node.start()
+        client = lavalink.Client(user_id=1)
+        client.add_node('127.0.0.1', node.port, 'youshallnotpass', 'us', node.name)
+        try:
+            recent = PlayHistory(1, capacity=3)
+            tracks = [AudioTrack(track, requester=i) for i, track in enumerate(node.tracks('history', 10))]
+            for track in tracks[:6]:
+                recent.append(track)
+            await history.history_spill.flush()     # three on disk
+            for track in tracks[6:]:
+                recent.append(track)                # three more spilled, still buffered
+
+            assert len(recent) == 10
+            popped = [await recent.pop(client) for _ in range(10)]
+            assert [track.track for track in popped] == [track.track for track in reversed(tracks)]
+            assert [track.requester for track in popped] == list(range(9, -1, -1))
+            assert len(recent) == 0
+            assert (tmp_path / '1.jsonl').read_text() == ''
+        finally:
+            await client.close()
+            await node.close()
+
+    asyncio.run(run())
+
+def test_clear_discards_spilled_tracks_on_disk_and_pending(tmp_path, monkeypatch):
+
+    monkeypatch.setattr(history.history_spill, 'directory', str(tmp_path))
+
+    async def run() -> None:
+        tracks = [AudioTrack({'encoded': f'track-{i}', 'info': {'identifier': str(i), 'isSeekable': True,
+            'author': 'author', 'length': 1000, 'isStream': False, 'title': str(i), 'uri': None,
+            'sourceName': 'youtube'}}, requester=i) for i in range(8)]
+        (tmp_path / '2.jsonl').write_text('{"track": "from an earlier run"}\n')
+        recent = PlayHistory(2, capacity=2)
+        for track in tracks[:5]:
+            recent.append(track)
+        await history.history_spill.flush()
+        for track in tracks[5:7]:
+            recent.append(track)                    # one more spilled, still buffered
+        assert (tmp_path / '2.jsonl').read_text().count('\n') == 3
+
+        recent.clear()
+        assert len(recent) == 0 and await history.history_spill.take(recent.path) is None
+        await history.history_spill.flush()
+        assert not (tmp_path / '2.jsonl').exists()
+
+        recent.append(tracks[7])
+        assert len(recent) == 1 and not history.history_spill.stats()['pending']
+
+    asyncio.run(run())
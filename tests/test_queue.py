@@ -0,0 +1,79 @@
+import random
+
+import pytest
+
+from bot.library.classes.queue import TrackQueue
+
+def test_matches_a_list_under_random_operations(monkeypatch):
+
+    monkeypatch.setattr(TrackQueue, 'LOAD', 4)     # small blocks, so splits and merges happen often
+    rng = random.Random(8)
+    queue, expected = TrackQueue(range(20)), list(range(20))
+    serial = 20
+
+    for step in range(5000):
+        version = queue.version
+        op = rng.choice(('append', 'extend', 'insert', 'pop', 'pop_end', 'remove', 'set', 'shuffle', 'clear', 'read'))
+        if op == 'append':
+            queue.append(serial)
+            expected.append(serial)
+            serial += 1
+        elif op == 'extend':
+            tracks = list(range(serial, serial + rng.randrange(0, 12)))
+            serial += len(tracks)
+            queue.extend(tracks)
+            expected.extend(tracks)
+            if not tracks:
+                continue    # nothing changed, the version may stay
+        elif op == 'insert':
+            index = rng.randrange(-len(expected) - 2, len(expected) + 3)
+            queue.insert(index, serial)
+            expected.insert(index, serial)
+            serial += 1
+        elif op in ('pop', 'pop_end', 'remove', 'set') and not expected or op == 'shuffle' and len(expected) < 2:
+            continue
+        elif op == 'pop':
+            index = rng.randrange(-len(expected), len(expected))
+            assert queue.pop(index) == expected.pop(index)
+        elif op == 'pop_end':
+            assert queue.pop() == expected.pop()
+        elif op == 'remove':
+            track = rng.choice(expected)
+            queue.remove(track)
+            expected.remove(track)
+        elif op == 'set':
+            index = rng.randrange(len(expected))
+            queue[index] = expected[index] = serial
+            serial += 1
+        elif op == 'shuffle':
+            seed = rng.random()
+            random.Random(seed).shuffle(queue)      # through __len__, __getitem__ and __setitem__
+            random.Random(seed).shuffle(expected)
+        elif op == 'clear':
+            if rng.random() > 0.05:
+                continue
+            queue.clear()
+            expected.clear()
+        else:
+            start, stop = sorted(rng.randrange(-len(expected) - 2, len(expected) + 3) for _ in range(2))
+            assert queue[start:stop] == expected[start:stop]
+            assert queue[start:stop:2] == expected[start:stop:2]
+            if expected:
+                index = rng.randrange(-len(expected), len(expected))
+                assert queue[index] == expected[index]
+                assert list(queue.iter_from(index % len(expected))) == expected[index % len(expected):]
+            assert queue.version == version, 'reads must not change the version'
+            continue
+
+        assert queue.version > version, f'{op} did not bump the version'
+        assert len(queue) == len(expected) and list(queue) == expected, f'{op} at step {step}'
+
+def test_errors_match_a_list():
+
+    queue = TrackQueue([1, 2])
+    for call in (lambda: queue[2], lambda: queue[-3], lambda: queue.pop(5), lambda: TrackQueue().pop()):
+        with pytest.raises(IndexError):
+            call()
+    with pytest.raises(ValueError):
+        queue.remove(3)
+    assert list(queue) == [1, 2] and bool(queue) and not TrackQueue()